@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+入站请求准入控制
+根据处理中的请求数判断负载压力（已有负载时再参考最近请求的p95延迟），压力升高时逐级降级为更便宜的处理模式：
+先用规则剪枝代替大模型剪枝，再降低关系度数，最后用规则解析代替大模型解析；
+超过硬上限时直接拒绝，避免排队无限增长、所有请求一起超时
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Any, Deque, Dict, Iterator, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceMode(IntEnum):
+    """处理模式，数值越大越便宜"""
+    FULL = 0
+    RULE_PRUNE = 1
+    REDUCED_DEGREE = 2
+    RULE_PARSE = 3
+
+    @property
+    def label(self) -> str:
+        """模式名称（记录在响应中）"""
+        return self.name.lower()
+
+
+class ServiceOverloadedError(Exception):
+    """处理中的请求数超过硬上限，请求被拒绝"""
+
+
+@dataclass
+class AdmissionConfig:
+    """准入控制配置"""
+    # 处理中的请求数达到该值时拒绝新请求，0表示不限制
+    max_in_flight: int = 64
+    # 处理中的请求数达到各阈值时分别降级到 RULE_PRUNE、REDUCED_DEGREE、RULE_PARSE
+    degrade_in_flight: List[int] = field(default_factory=lambda: [16, 32, 48])
+    # 最近请求的p95延迟超过目标的1倍、1.5倍、2倍时分别降级一级、两级、三级，0表示不按延迟降级；
+    # 只在处理中的请求数已达第1个降级阈值时生效，空闲时单个慢请求不会拉低后续请求的模式
+    latency_target_ms: float = 5000.0
+    # 计算p95的时间窗口（秒）
+    latency_window: float = 30.0
+
+    @classmethod
+    def from_env(cls) -> "AdmissionConfig":
+        """根据环境变量创建配置"""
+        thresholds = os.getenv("ADMISSION_DEGRADE_IN_FLIGHT", "16,32,48")
+        return cls(
+            max_in_flight=int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "64")),
+            degrade_in_flight=[int(item) for item in thresholds.split(",") if item.strip()],
+            latency_target_ms=float(os.getenv("ADMISSION_LATENCY_TARGET_MS", "5000")),
+            latency_window=float(os.getenv("ADMISSION_LATENCY_WINDOW", "30"))
+        )
+
+
+class AdmissionController:
+    """按处理中请求数和近期延迟选择处理模式的准入控制器（线程安全）"""
+
+    LATENCY_STEPS = (1.0, 1.5, 2.0)
+
+    def __init__(self, config: AdmissionConfig):
+        self.config = config
+        self.in_flight = 0
+        self._latencies: Deque[Tuple[float, float]] = deque()
+        self._p95_cache: Tuple[float, float] = (0.0, 0.0)
+        self._lock = threading.Lock()
+        self.admitted: Counter = Counter()
+        self.shed = 0
+        self.last_mode = ServiceMode.FULL
+
+    @contextmanager
+    def admit(self) -> Iterator[ServiceMode]:
+        """
+        准入一个请求，在上下文内处理，退出时记录延迟
+
+        Yields:
+            本次请求使用的处理模式
+
+        Raises:
+            ServiceOverloadedError: 处理中的请求数已达硬上限
+        """
+        mode = self._acquire()
+        started = time.monotonic()
+        try:
+            yield mode
+        finally:
+            self._release(time.monotonic() - started)
+
+    def _acquire(self) -> ServiceMode:
+        now = time.monotonic()
+        with self._lock:
+            limit = self.config.max_in_flight
+            if limit and self.in_flight >= limit:
+                self.shed += 1
+                raise ServiceOverloadedError(f"服务过载：当前 {self.in_flight} 个请求处理中，已达上限 {limit}，请稍后重试")
+            in_flight_level = self._in_flight_level()
+            latency_level = self._latency_level(now) if in_flight_level else 0
+            mode = ServiceMode(max(in_flight_level, latency_level))
+            self.in_flight += 1
+            self.admitted[mode.label] += 1
+            if mode != self.last_mode:
+                logger.info(f"处理模式切换: {self.last_mode.label} -> {mode.label} (处理中 {self.in_flight})")
+                self.last_mode = mode
+            return mode
+
+    def _release(self, latency: float):
+        now = time.monotonic()
+        with self._lock:
+            self.in_flight -= 1
+            self._latencies.append((now, latency))
+
+    def _in_flight_level(self) -> int:
+        """按处理中请求数计算的降级级数（调用方持有锁）"""
+        level = sum(1 for threshold in self.config.degrade_in_flight if self.in_flight >= threshold)
+        return min(level, ServiceMode.RULE_PARSE)
+
+    def _latency_level(self, now: float) -> int:
+        """按近期p95延迟计算的降级级数（调用方持有锁）"""
+        target = self.config.latency_target_ms / 1000.0
+        if target <= 0:
+            return 0
+        p95 = self._recent_p95(now)
+        return sum(1 for step in self.LATENCY_STEPS if p95 > target * step)
+
+    def _recent_p95(self, now: float) -> float:
+        """时间窗口内已完成请求的p95延迟，最多每0.5秒重新计算一次（调用方持有锁）"""
+        computed_at, p95 = self._p95_cache
+        if now - computed_at < 0.5:
+            return p95
+        while self._latencies and now - self._latencies[0][0] > self.config.latency_window:
+            self._latencies.popleft()
+        values = sorted(latency for _, latency in self._latencies)
+        p95 = values[min(len(values) - 1, int(len(values) * 0.95))] if values else 0.0
+        self._p95_cache = (now, p95)
+        return p95
+
+    def stats(self) -> Dict[str, Any]:
+        """准入统计：处理中请求数、当前模式、各模式请求数、拒绝数和近期p95延迟"""
+        with self._lock:
+            return {
+                "in_flight": self.in_flight,
+                "mode": self.last_mode.label,
+                "admitted": dict(self.admitted),
+                "shed": self.shed,
+                "recent_p95_ms": round(self._recent_p95(time.monotonic()) * 1000, 1)
+            }
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+品类分区与品类快照管理
+每个品类（手机、笔记本电脑、平板、家电等）在同一个Neo4j库中拥有独立的子图：
+根节点为 `{品类}购物决策`，子图内所有节点都带有 `category` 属性作为分区键。
+服务按需加载品类快照，长时间未使用的品类会被淘汰，内存只随活跃品类增长。
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from price_index import PriceIndex
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CATEGORY = "手机"
+
+
+@dataclass(frozen=True)
+class CategoryConfig:
+    """品类配置"""
+    name: str
+    root_name: str
+    data_file: str
+
+
+def load_category_configs() -> Dict[str, CategoryConfig]:
+    """
+    从环境变量读取品类配置
+
+    GRAPH_CATEGORIES 格式为 `品类:数据文件`，多个品类用分号分隔，例如：
+    `手机:data.txt;笔记本电脑:data_laptop.txt`
+
+    Returns:
+        品类名到品类配置的映射
+    """
+    spec = os.getenv("GRAPH_CATEGORIES", f"{DEFAULT_CATEGORY}:data.txt")
+    configs = {}
+    for item in spec.split(";"):
+        item = item.strip()
+        if not item:
+            continue
+        name, _, data_file = item.partition(":")
+        name = name.strip()
+        configs[name] = CategoryConfig(
+            name=name,
+            root_name=f"{name}购物决策",
+            data_file=data_file.strip() or f"data_{name}.txt"
+        )
+    if not configs:
+        configs[DEFAULT_CATEGORY] = CategoryConfig(DEFAULT_CATEGORY, f"{DEFAULT_CATEGORY}购物决策", "data.txt")
+    return configs
+
+
+@dataclass
+class CategorySnapshot:
+    """品类快照：品类核心决策子图、品类相关关系和因子名称表"""
+    category: str
+    root_name: str
+    core_rows: List[Tuple[Any, Any, Any]]
+    factor_names: List[str]
+    product_relations: Dict[str, Any] = field(default_factory=lambda: {"nodes": {}, "relations": []})
+    # 来自编译图谱时为内容哈希，来自Neo4j时为导入器写在根节点上的导入版本（旧数据没有时为None）
+    graph_version: Optional[str] = None
+    loaded_at: float = field(default_factory=time.monotonic)
+    # 上次确认图谱版本未变化的时刻
+    checked_at: float = field(default_factory=time.monotonic)
+    last_used: float = field(default_factory=time.monotonic)
+    _price_index: Optional[PriceIndex] = field(default=None, repr=False)
+
+    def find_factors(self, keyword: str, limit: int = 5) -> List[str]:
+        """在快照内按关键词查找因子名称"""
+        return [name for name in self.factor_names if keyword in name][:limit]
+
+    def price_index(self) -> PriceIndex:
+        """品类内预算档位因子的价格区间索引，首次使用时构建"""
+        if self._price_index is None:
+            self._price_index = PriceIndex(self.factor_names)
+        return self._price_index
+
+
+class CategorySnapshotCache:
+    """按品类懒加载的快照缓存，按LRU和空闲时间淘汰"""
+
+    def __init__(self, max_categories: int = 4, idle_ttl: float = 600.0, pinned: Tuple[str, ...] = ()):
+        self.max_categories = max_categories
+        self.idle_ttl = idle_ttl
+        # 常驻品类（通常是默认品类）加载后保持预热，不参与淘汰
+        self.pinned = set(pinned)
+        self._snapshots: "OrderedDict[str, CategorySnapshot]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.evictions = 0
+
+    def get(self, category: str, loader: Callable[[str], CategorySnapshot]) -> CategorySnapshot:
+        """
+        获取品类快照，首次使用时调用loader加载
+
+        Args:
+            category: 品类名称
+            loader: 加载快照的函数
+
+        Returns:
+            品类快照
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._evict_idle(now)
+            snapshot = self._snapshots.get(category)
+            if snapshot is not None:
+                snapshot.last_used = now
+                self._snapshots.move_to_end(category)
+                return snapshot
+
+        # 在锁外加载，避免慢查询阻塞其他品类
+        snapshot = loader(category)
+        with self._lock:
+            existing = self._snapshots.get(category)
+            if existing is not None:
+                existing.last_used = now
+                return existing
+            self._snapshots[category] = snapshot
+            self.loads += 1
+            evictable = [c for c in self._snapshots if c not in self.pinned and c != category]
+            while len(self._snapshots) > self.max_categories and evictable:
+                evicted = evictable.pop(0)
+                del self._snapshots[evicted]
+                self.evictions += 1
+                logger.info(f"淘汰品类快照: {evicted}")
+        logger.info(f"加载品类快照: {category} ({len(snapshot.factor_names)} 个因子)")
+        return snapshot
+
+    def invalidate(self, category: Optional[str] = None):
+        """使某个品类（或全部品类）的快照失效"""
+        with self._lock:
+            if category is None:
+                self._snapshots.clear()
+            else:
+                self._snapshots.pop(category, None)
+
+    def active_categories(self) -> List[str]:
+        """当前驻留内存的品类"""
+        with self._lock:
+            return list(self._snapshots.keys())
+
+    def _evict_idle(self, now: float):
+        """淘汰空闲超时的品类快照"""
+        idle = [c for c, s in self._snapshots.items()
+                if c not in self.pinned and now - s.last_used > self.idle_ttl]
+        for category in idle:
+            del self._snapshots[category]
+            self.evictions += 1
+            logger.info(f"品类快照空闲超时，已淘汰: {category}")
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+多轮对话会话
+用户常在上一轮的基础上逐步细化查询（`适合学生的手机` → `再加上拍照好` → `预算3000`），
+如果每一轮都从头解析、检索和剪枝，追问和首轮一样慢。会话保存上一轮的解析结果、每个种子的关系，
+以及按来源（品类基础关系、各个种子）划分的剪枝结果；追问时比较前后两轮的种子集合，
+只检索、剪枝新增的种子，移除的种子直接丢弃，其余部分原样复用后重新组装报告，
+追问的耗时与变化量而不是查询的总规模成正比
+"""
+
+import copy
+import re
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+SeedKey = Tuple[str, str, str]
+
+# 品类核心关系和品类相关关系的剪枝结果（与种子无关）
+BASE_PIECE = "base"
+
+# 追问中表示去掉某个条件的说法
+REMOVAL_WORDS = ("不要", "不用", "不需要", "去掉", "不考虑", "不在乎", "不看重")
+
+
+@dataclass
+class SeedDiff:
+    """相邻两轮的种子变化"""
+    added: List[SeedKey] = field(default_factory=list)
+    removed: List[SeedKey] = field(default_factory=list)
+    kept: List[SeedKey] = field(default_factory=list)
+
+    def summary(self) -> str:
+        """变化摘要（用于日志）"""
+        return f"新增 {len(self.added)}, 移除 {len(self.removed)}, 复用 {len(self.kept)}"
+
+
+def diff_seeds(previous: Iterable[SeedKey], current: List[SeedKey]) -> SeedDiff:
+    """
+    比较前后两轮的种子
+
+    Args:
+        previous: 上一轮的种子
+        current: 本轮的种子（保持解析结果中的顺序）
+    """
+    previous = list(previous)
+    previous_set = set(previous)
+    current_set = set(current)
+    return SeedDiff(
+        added=[seed_key for seed_key in current if seed_key not in previous_set],
+        removed=[seed_key for seed_key in previous if seed_key not in current_set],
+        kept=[seed_key for seed_key in current if seed_key in previous_set]
+    )
+
+
+def merge_follow_up_parse(previous: Dict[str, Any], delta: Dict[str, Any], query: str,
+                          categories: Iterable[str]) -> Dict[str, Any]:
+    """
+    将追问的规则解析结果合并到上一轮的解析结果中（大模型解析失败或过载降级时使用）
+
+    追问里出现的新条件加入，`不要拍照`、`去掉续航` 这类说法移除对应条件；
+    追问明确提到品类或价格时覆盖上一轮的取值，否则保持不变
+
+    Args:
+        previous: 上一轮的解析结果
+        delta: 追问文本单独的规则解析结果
+        query: 追问文本
+        categories: 已配置的品类
+    """
+    merged = copy.deepcopy(previous)
+    if any(category in query for category in categories):
+        merged["product_category"] = delta["product_category"]
+    if delta.get("price_range"):
+        merged["price_range"] = delta["price_range"]
+
+    for key in ("user_groups", "explicit_needs", "implicit_needs", "usage_scenarios"):
+        items = merged.get(key, [])
+        items = [item for item in items if not _mentions_removal(query, item)]
+        items.extend(item for item in delta.get(key, [])
+                     if item not in items and not _mentions_removal(query, item))
+        merged[key] = items
+    return merged
+
+
+def _mentions_removal(query: str, item: str) -> bool:
+    """追问中是否要求去掉某个条件，如 `不要拍照`、`去掉续航`"""
+    return any(re.search(f"{word}.{{0,2}}{re.escape(item)}", query) for word in REMOVAL_WORDS)
+
+
+@dataclass
+class ConversationSession:
+    """多轮对话会话的状态，由 KnowledgeGraphService.start_session() 创建"""
+    session_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    # 各轮的原始查询
+    turns: List[str] = field(default_factory=list)
+    # 上一轮的解析结果（已合并之前各轮的条件）
+    parsed_query: Optional[Dict[str, Any]] = None
+    category: Optional[str] = None
+    # 种子关系所属的图谱版本，版本变化时会话状态失效
+    graph_version: Optional[str] = None
+    # 种子 -> 种子关系
+    seed_results: Dict[SeedKey, Dict[str, Any]] = field(default_factory=dict)
+    # BASE_PIECE或种子 -> 该部分关系的剪枝结果
+    pruned_pieces: Dict[Any, Dict[str, List[str]]] = field(default_factory=dict)
+    # 上一轮的图谱查询结果和种子变化
+    query_result: Optional[Any] = None
+    last_diff: Optional[SeedDiff] = None
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+
+    @property
+    def query(self) -> str:
+        """合并各轮后的完整查询文本"""
+        return "，".join(self.turns)
+
+    def query_with(self, turn: str) -> str:
+        """加上尚未记录的本轮输入后的完整查询文本"""
+        return "，".join(self.turns + [turn])
+
+    def reset(self):
+        """清空检索和剪枝状态（品类或图谱版本变化时），保留对话轮次和解析结果"""
+        self.category = None
+        self.graph_version = None
+        self.seed_results.clear()
+        self.pruned_pieces.clear()
+        self.query_result = None
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Cypher查询注册表
+服务使用的所有Cypher语句都在这里按名称登记，只通过参数传值：
+查询文本固定不变，Neo4j可以复用执行计划缓存，也不存在拼接注入的问题。
+检索查询只投影报告用到的字段（elementId、名称、标签和关系类型）为扁平的行，不返回完整的节点和关系对象，
+减少Bolt传输量和驱动端构造Node/Relationship对象的开销；列顺序即服务端按位置解码的顺序。
+每条查询附带一组示例参数，供 profile_queries.py 在本地库上做PROFILE回归检查
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, List
+
+# 产品分类相关的固定因子（品类无关），作为参数传入查询
+PRODUCT_CATEGORY_FACTORS: List[str] = [
+    '品牌知名度', '品牌口碑', '技术实力', '生态系统',
+    '处理器性能', '内存配置', '存储容量', '系统优化',
+    '价格区间', '性价比', '优惠活动', '购买时机'
+]
+
+
+@dataclass(frozen=True)
+class CypherQuery:
+    """注册的Cypher查询"""
+    name: str
+    text: str
+    description: str
+    sample_params: Dict[str, Any] = field(default_factory=dict)
+    # 整个分区导出类的离线查询本身就要扫描全部节点，不参与PROFILE回归检查
+    profiled: bool = True
+
+
+_SAMPLE_CATEGORY = {"category": "手机"}
+
+QUERIES: Dict[str, CypherQuery] = {query.name: query for query in [
+    CypherQuery(
+        name="category_core",
+        description="品类根节点下的阶段和因子（核心决策子图）",
+        text="""
+        MATCH (root:Decision {category: $category, name: $root_name})-[:INCLUDES]->(stage:Stage)-[:CONTAINS]->(factor:Factor)
+        WHERE stage.category = $category AND factor.category = $category
+        RETURN elementId(root) AS root_id, root.name AS root_name,
+               elementId(stage) AS stage_id, stage.name AS stage_name,
+               elementId(factor) AS factor_id, factor.name AS factor_name
+        """,
+        sample_params={**_SAMPLE_CATEGORY, "root_name": "手机购物决策"}
+    ),
+    CypherQuery(
+        name="category_graph_version",
+        description="品类根节点上的导入版本（每次导入完成时由导入器写入）",
+        text="""
+        MATCH (root:Decision {category: $category, name: $root_name})
+        RETURN root.graph_version AS graph_version
+        """,
+        sample_params={**_SAMPLE_CATEGORY, "root_name": "手机购物决策"}
+    ),
+    CypherQuery(
+        name="category_factor_names",
+        description="品类分区内的全部因子名称",
+        text="""
+        MATCH (factor:Factor {category: $category})
+        RETURN factor.name as name
+        """,
+        sample_params=_SAMPLE_CATEGORY
+    ),
+    CypherQuery(
+        name="category_product_relations",
+        description="产品分类相关因子及其一度关系",
+        text="""
+        MATCH (factor:Factor {category: $category})
+        WHERE factor.name IN $factor_names OR factor.name CONTAINS $category
+        OPTIONAL MATCH (factor)-[r]-(related {category: $category})
+        RETURN elementId(factor) AS factor_id, factor.name AS factor_name, type(r) AS type,
+               elementId(related) AS related_id, related.name AS related_name, labels(related)[0] AS related_label
+        LIMIT $limit
+        """,
+        sample_params={**_SAMPLE_CATEGORY, "factor_names": PRODUCT_CATEGORY_FACTORS, "limit": 50}
+    ),
+    CypherQuery(
+        name="node_relations_degree1",
+        description="种子节点在品类分区内的一度关系",
+        text="""
+        MATCH (center:Factor {category: $category, name: $node_name})-[r]-(neighbor {category: $category})
+        RETURN elementId(center) AS center_id, elementId(neighbor) AS neighbor_id, neighbor.name AS neighbor_name,
+               labels(neighbor)[0] AS neighbor_label, type(r) AS type, 1 AS degree, center.name AS via
+        LIMIT $limit
+        """,
+        sample_params={**_SAMPLE_CATEGORY, "node_name": "学生群体", "limit": 10}
+    ),
+    CypherQuery(
+        name="node_relations_degree2",
+        description="种子节点在品类分区内的二度关系（近的关系优先）",
+        text="""
+        MATCH p = (center:Factor {category: $category, name: $node_name})-[*1..2]-(neighbor)
+        WHERE all(n IN nodes(p) WHERE n.category = $category)
+        WITH DISTINCT center, relationships(p)[-1] as r, neighbor, length(p) as degree, nodes(p)[-2].name as via
+        RETURN elementId(center) AS center_id, elementId(neighbor) AS neighbor_id, neighbor.name AS neighbor_name,
+               labels(neighbor)[0] AS neighbor_label, type(r) AS type, degree, via
+        ORDER BY degree
+        LIMIT $limit
+        """,
+        sample_params={**_SAMPLE_CATEGORY, "node_name": "学生群体", "limit": 15}
+    ),
+    CypherQuery(
+        name="node_relations_degree3",
+        description="种子节点在品类分区内的三度关系（近的关系优先）",
+        text="""
+        MATCH p = (center:Factor {category: $category, name: $node_name})-[*1..3]-(neighbor)
+        WHERE length(p) <= $max_degree AND all(n IN nodes(p) WHERE n.category = $category)
+        WITH DISTINCT center, relationships(p)[-1] as r, neighbor, length(p) as degree, nodes(p)[-2].name as via
+        RETURN elementId(center) AS center_id, elementId(neighbor) AS neighbor_id, neighbor.name AS neighbor_name,
+               labels(neighbor)[0] AS neighbor_label, type(r) AS type, degree, via
+        ORDER BY degree
+        LIMIT $limit
+        """,
+        sample_params={**_SAMPLE_CATEGORY, "node_name": "学生群体", "max_degree": 3, "limit": 20}
+    ),
+    CypherQuery(
+        name="node_relations_by_degree",
+        description="多度数对比：一次遍历到最大度数，按度数由低到高返回，便于按度数切分",
+        text="""
+        MATCH p = (center:Factor {category: $category, name: $node_name})-[*1..3]-(neighbor)
+        WHERE length(p) <= $max_degree AND all(n IN nodes(p) WHERE n.category = $category)
+        WITH DISTINCT center, relationships(p)[-1] as r, neighbor, length(p) as degree, nodes(p)[-2].name as via
+        RETURN elementId(center) AS center_id, elementId(neighbor) AS neighbor_id, neighbor.name AS neighbor_name,
+               labels(neighbor)[0] AS neighbor_label, type(r) AS type, degree, via
+        ORDER BY degree
+        LIMIT $limit
+        """,
+        sample_params={**_SAMPLE_CATEGORY, "node_name": "学生群体", "max_degree": 3, "limit": 20}
+    ),
+    CypherQuery(
+        name="node_relations_ranked",
+        description="种子节点的多度关系按分层关键词相关性打分，只返回分数最高的top_k行（权重见relevance.py）",
+        text="""
+        MATCH p = (center:Factor {category: $category, name: $node_name})-[*1..3]-(neighbor)
+        WHERE length(p) <= $max_degree AND all(n IN nodes(p) WHERE n.category = $category)
+        WITH DISTINCT center, relationships(p)[-1] as r, neighbor, length(p) as degree, nodes(p)[-2].name as via
+        WITH center, r, neighbor, degree, via,
+             $base_score + reduce(total = 0, keyword IN $keywords |
+                 total + CASE WHEN neighbor.name CONTAINS keyword.word THEN keyword.weight ELSE 0 END) AS score
+        WHERE score > 0
+        RETURN elementId(center) AS center_id, elementId(neighbor) AS neighbor_id, neighbor.name AS neighbor_name,
+               labels(neighbor)[0] AS neighbor_label, type(r) AS type, degree, via, score
+        ORDER BY score DESC, degree, neighbor_name
+        LIMIT $top_k
+        """,
+        sample_params={
+            **_SAMPLE_CATEGORY, "node_name": "学生群体", "max_degree": 2, "base_score": 3, "top_k": 6,
+            "keywords": [{"word": "续航", "weight": 10}, {"word": "性能", "weight": 5}, {"word": "性价比", "weight": 3}]
+        }
+    ),
+    CypherQuery(
+        name="adaptive_seed_hop",
+        description="自适应度数扩展：种子节点的第一跳",
+        text="""
+        MATCH (source:Factor {category: $category, name: $node_name})-[r]-(neighbor {category: $category})
+        RETURN elementId(source) AS source_id, source.name AS source_name, labels(source)[0] AS source_label,
+               type(r) AS type, elementId(neighbor) AS neighbor_id, neighbor.name AS neighbor_name,
+               labels(neighbor)[0] AS neighbor_label
+        LIMIT $limit
+        """,
+        sample_params={**_SAMPLE_CATEGORY, "node_name": "学生群体", "limit": 20}
+    ),
+    CypherQuery(
+        name="adaptive_frontier_hop",
+        description="自适应度数扩展：从上一跳新发现的节点继续扩展一跳，跳过已访问节点",
+        text="""
+        UNWIND $frontier_ids AS frontier_id
+        MATCH (source)-[r]-(neighbor {category: $category})
+        WHERE elementId(source) = frontier_id AND NOT elementId(neighbor) IN $visited_ids
+        RETURN elementId(source) AS source_id, source.name AS source_name, labels(source)[0] AS source_label,
+               type(r) AS type, elementId(neighbor) AS neighbor_id, neighbor.name AS neighbor_name,
+               labels(neighbor)[0] AS neighbor_label
+        LIMIT $limit
+        """,
+        sample_params={**_SAMPLE_CATEGORY, "frontier_ids": [], "visited_ids": [], "limit": 20}
+    ),
+    CypherQuery(
+        name="graph_export_nodes",
+        description="导出品类分区内的全部节点（图谱编译用）",
+        text="""
+        MATCH (n)
+        WHERE n.category = $category
+        RETURN n.name AS name, labels(n)[0] AS label
+        """,
+        sample_params=_SAMPLE_CATEGORY,
+        profiled=False
+    ),
+    CypherQuery(
+        name="graph_export_edges",
+        description="导出品类分区内的全部关系（图谱编译用）",
+        text="""
+        MATCH (a)-[r]->(b)
+        WHERE a.category = $category AND b.category = $category
+        RETURN a.name AS source, type(r) AS type, b.name AS target
+        """,
+        sample_params=_SAMPLE_CATEGORY,
+        profiled=False
+    ),
+]}
+
+
+def get_query(name: str) -> CypherQuery:
+    """按名称获取注册的查询，未注册时抛出KeyError"""
+    return QUERIES[name]
@@ -0,0 +1,556 @@
+#!/usr/bin/env python3
+"""
+编译后的二进制图谱文件
+将某个品类的图谱（data.txt中的Cypher、`.jsonl` 记录格式文件或Neo4j中的数据）编译为带版本的二进制文件：
+字符串表、CSR邻接数组（出边和入边）、关系类型编码和标签编码。
+服务通过mmap只读加载，多个工作进程共享同一份物理内存，启动耗时与图谱规模无关；
+文件内容的SHA-256哈希同时作为图谱版本号
+
+用法：
+    python graph_artifact.py compile                       # 编译全部已配置品类的data文件
+    python graph_artifact.py compile --source neo4j        # 从Neo4j导出并编译
+    python graph_artifact.py info graph_artifacts/手机.graph
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+import time
+from array import array
+from typing import Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"EGGRAPH\0"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<8sIIIIII32s")
+SECTION_ENTRY = struct.Struct("<QQ")
+SECTIONS = [
+    "string_offsets", "string_data", "node_names", "node_labels", "name_index",
+    "out_offsets", "out_targets", "out_types", "in_offsets", "in_sources", "in_types",
+    "label_names", "reltype_names", "meta"
+]
+# 各段的元素类型，None表示原始字节
+SECTION_FORMATS = {
+    "string_offsets": "I", "node_names": "I", "name_index": "I",
+    "out_offsets": "I", "out_targets": "I", "in_offsets": "I", "in_sources": "I",
+    "label_names": "I", "reltype_names": "I",
+    "node_labels": "B", "out_types": "B", "in_types": "B",
+    "string_data": None, "meta": None
+}
+
+DEFAULT_ARTIFACT_DIR = "graph_artifacts"
+
+NODE_PATTERN = re.compile(r'MERGE \((\w+):(\w+) \{name:\s*"([^"]*)"[^}]*\}\)')
+EDGE_PATTERN = re.compile(r'MERGE \((\w+)\)-\[:(\w+)\]->\((\w+)\)')
+
+Edge = Tuple[str, str, str]
+
+
+def strip_line_comment(line: str) -> str:
+    """去掉字符串字面量之外的 // 行尾注释"""
+    quote = None
+    for index, ch in enumerate(line):
+        if quote:
+            if ch == quote:
+                quote = None
+        elif ch in ('"', "'"):
+            quote = ch
+        elif line.startswith('//', index):
+            return line[:index].rstrip()
+    return line
+
+
+def read_cypher_statements(path: str) -> List[str]:
+    """
+    读取data.txt风格的Cypher文件，按分号切分为语句（去掉注释和末尾分号）
+
+    Raises:
+        OSError: 文件不存在或无法读取
+    """
+    statements = []
+    current_statement = ""
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            # 去掉行尾注释，否则拼接成一行后会把后续语句一起注释掉
+            line = strip_line_comment(line.strip())
+            if not line or line.startswith("//"):
+                continue
+            current_statement += line + " "
+            if line.endswith(";"):
+                statement = current_statement.strip().rstrip(";")
+                if statement:
+                    statements.append(statement)
+                current_statement = ""
+    # 最后一条语句可能没有分号结尾
+    if current_statement.strip():
+        statements.append(current_statement.strip())
+    return statements
+
+
+def parse_cypher_graph(statements: List[str]) -> Tuple[List[Tuple[str, str]], List[Edge]]:
+    """
+    从data.txt风格的MERGE语句中提取节点和关系
+
+    Returns:
+        ([(节点名, 标签)], [(起点名, 关系类型, 终点名)])
+    """
+    nodes: Dict[str, str] = {}
+    variables: Dict[str, str] = {}
+    edges: List[Edge] = []
+    for statement in statements:
+        for var, label, name in NODE_PATTERN.findall(statement):
+            variables[var] = name
+            nodes.setdefault(name, label)
+        for source, rel_type, target in EDGE_PATTERN.findall(statement):
+            if source in variables and target in variables:
+                edges.append((variables[source], rel_type, variables[target]))
+    return list(nodes.items()), list(dict.fromkeys(edges))
+
+
+def read_graph_records(path: str) -> Tuple[List[Tuple[str, str]], List[Edge]]:
+    """
+    读取记录格式（JSON Lines）的图谱文件：`{"name", "label"}` 为节点，`{"source", "type", "target"}` 为关系
+
+    Returns:
+        ([(节点名, 标签)], [(起点名, 关系类型, 终点名)])
+    """
+    nodes: Dict[str, str] = {}
+    edges: List[Edge] = []
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if "label" in record:
+                nodes.setdefault(record["name"], record["label"])
+            else:
+                edges.append((record["source"], record["type"], record["target"]))
+    return list(nodes.items()), list(dict.fromkeys(edges))
+
+
+def write_graph_records(path: str, nodes: List[Tuple[str, str]], edges: List[Edge]):
+    """按记录格式（JSON Lines）写入图谱，节点在前、关系在后"""
+    with open(path, "w", encoding="utf-8") as file:
+        for name, label in nodes:
+            file.write(json.dumps({"name": name, "label": label}, ensure_ascii=False) + "\n")
+        for source, rel_type, target in edges:
+            file.write(json.dumps({"source": source, "type": rel_type, "target": target},
+                                  ensure_ascii=False) + "\n")
+
+
+def load_graph_file(path: str) -> Tuple[List[Tuple[str, str]], List[Edge]]:
+    """读取品类数据文件：`.jsonl` 为记录格式，其余按data.txt风格的Cypher解析"""
+    if path.endswith(".jsonl"):
+        return read_graph_records(path)
+    return parse_cypher_graph(read_cypher_statements(path))
+
+
+def compile_graph(nodes: List[Tuple[str, str]], edges: List[Edge], meta: Dict[str, str]) -> bytes:
+    """
+    将节点和关系编译为二进制图谱
+
+    Args:
+        nodes: [(节点名, 标签)]
+        edges: [(起点名, 关系类型, 终点名)]
+        meta: 写入文件的元信息（品类、来源等）
+
+    Returns:
+        二进制文件内容
+    """
+    strings: Dict[str, int] = {}
+
+    def intern(value: str) -> int:
+        if value not in strings:
+            strings[value] = len(strings)
+        return strings[value]
+
+    labels = sorted({label for _, label in nodes})
+    rel_types = sorted({rel_type for _, rel_type, _ in edges})
+    label_codes = {label: code for code, label in enumerate(labels)}
+    type_codes = {rel_type: code for code, rel_type in enumerate(rel_types)}
+    if len(labels) > 255 or len(rel_types) > 255:
+        raise ValueError("标签或关系类型超过255种，无法使用单字节编码")
+
+    node_index = {name: index for index, (name, _) in enumerate(nodes)}
+    node_names = array("I", (intern(name) for name, _ in nodes))
+    node_labels = array("B", (label_codes[label] for _, label in nodes))
+    label_names = array("I", (intern(label) for label in labels))
+    reltype_names = array("I", (intern(rel_type) for rel_type in rel_types))
+
+    encoded_names = [name.encode("utf-8") for name, _ in nodes]
+    name_index = array("I", sorted(range(len(nodes)), key=lambda i: encoded_names[i]))
+
+    def build_csr(pairs: List[Tuple[int, int, int]]) -> Tuple[array, array, array]:
+        pairs.sort()
+        offsets = array("I", [0] * (len(nodes) + 1))
+        for owner, _, _ in pairs:
+            offsets[owner + 1] += 1
+        for i in range(len(nodes)):
+            offsets[i + 1] += offsets[i]
+        return (offsets, array("I", (other for _, other, _ in pairs)),
+                array("B", (code for _, _, code in pairs)))
+
+    out_pairs = [(node_index[s], node_index[t], type_codes[r]) for s, r, t in edges]
+    in_pairs = [(node_index[t], node_index[s], type_codes[r]) for s, r, t in edges]
+    out_offsets, out_targets, out_types = build_csr(out_pairs)
+    in_offsets, in_sources, in_types = build_csr(in_pairs)
+
+    string_offsets = array("I", [0])
+    string_data = bytearray()
+    for value in strings:
+        string_data += value.encode("utf-8")
+        string_offsets.append(len(string_data))
+
+    payloads = {
+        "string_offsets": string_offsets.tobytes(), "string_data": bytes(string_data),
+        "node_names": node_names.tobytes(), "node_labels": node_labels.tobytes(),
+        "name_index": name_index.tobytes(),
+        "out_offsets": out_offsets.tobytes(), "out_targets": out_targets.tobytes(),
+        "out_types": out_types.tobytes(),
+        "in_offsets": in_offsets.tobytes(), "in_sources": in_sources.tobytes(),
+        "in_types": in_types.tobytes(),
+        "label_names": label_names.tobytes(), "reltype_names": reltype_names.tobytes(),
+        "meta": json.dumps(meta, ensure_ascii=False, sort_keys=True).encode("utf-8")
+    }
+
+    digest = hashlib.sha256()
+    body = bytearray()
+    table = []
+    offset = HEADER.size + SECTION_ENTRY.size * len(SECTIONS)
+    for name in SECTIONS:
+        data = payloads[name]
+        digest.update(name.encode("ascii") + struct.pack("<Q", len(data)) + data)
+        # 每段按8字节对齐，便于直接在mmap上做类型转换
+        padding = (-offset) % 8
+        body += b"\0" * padding
+        offset += padding
+        table.append(SECTION_ENTRY.pack(offset, len(data)))
+        body += data
+        offset += len(data)
+
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, len(nodes), len(edges), len(strings),
+                         len(labels), len(rel_types), digest.digest())
+    return header + b"".join(table) + bytes(body)
+
+
+def write_artifact(path: str, data: bytes):
+    """原子写入编译结果，正在读取旧文件的进程不受影响"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    with open(tmp_path, "wb") as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, path)
+
+
+class CompiledGraph:
+    """通过mmap只读加载的编译图谱"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, format_version, self.node_count, self.edge_count, _,
+         self.label_count, self.reltype_count, digest) = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or format_version != FORMAT_VERSION:
+            self.close()
+            raise ValueError(f"不是有效的图谱文件或版本不兼容: {path}")
+        self.content_hash = digest.hex()
+
+        view = memoryview(self._mm)
+        self._views = []
+        sections = {}
+        for index, name in enumerate(SECTIONS):
+            offset, length = SECTION_ENTRY.unpack_from(self._mm, HEADER.size + index * SECTION_ENTRY.size)
+            section = view[offset:offset + length]
+            if SECTION_FORMATS[name]:
+                section = section.cast(SECTION_FORMATS[name])
+            self._views.append(section)
+            sections[name] = section
+        self._views.append(view)
+        self._sections = sections
+
+        self.meta = json.loads(bytes(sections["meta"]).decode("utf-8"))
+        self.labels = [self._string(i) for i in sections["label_names"]]
+        self.rel_types = [self._string(i) for i in sections["reltype_names"]]
+
+    @property
+    def version(self) -> str:
+        """图谱版本（内容哈希前16位）"""
+        return self.content_hash[:16]
+
+    def _string(self, index: int) -> str:
+        offsets = self._sections["string_offsets"]
+        return bytes(self._sections["string_data"][offsets[index]:offsets[index + 1]]).decode("utf-8")
+
+    def name(self, node: int) -> str:
+        """节点名称"""
+        return self._string(self._sections["node_names"][node])
+
+    def label(self, node: int) -> str:
+        """节点标签"""
+        return self.labels[self._sections["node_labels"][node]]
+
+    def find(self, name: str) -> Optional[int]:
+        """按名称二分查找节点，不存在时返回None"""
+        target = name.encode("utf-8")
+        name_index = self._sections["name_index"]
+        node_names = self._sections["node_names"]
+        offsets = self._sections["string_offsets"]
+        data = self._sections["string_data"]
+        low, high = 0, len(name_index)
+        while low < high:
+            mid = (low + high) // 2
+            string_index = node_names[name_index[mid]]
+            current = bytes(data[offsets[string_index]:offsets[string_index + 1]])
+            if current < target:
+                low = mid + 1
+            else:
+                high = mid
+        if low < len(name_index) and self.name(name_index[low]) == name:
+            return name_index[low]
+        return None
+
+    def nodes_with_label(self, label: str) -> Iterator[int]:
+        """指定标签的全部节点"""
+        if label not in self.labels:
+            return iter(())
+        code = self.labels.index(label)
+        node_labels = self._sections["node_labels"]
+        return (node for node in range(self.node_count) if node_labels[node] == code)
+
+    def out_edges(self, node: int) -> Iterator[Tuple[int, str]]:
+        """出边：(终点, 关系类型)"""
+        offsets = self._sections["out_offsets"]
+        targets = self._sections["out_targets"]
+        types = self._sections["out_types"]
+        for i in range(offsets[node], offsets[node + 1]):
+            yield targets[i], self.rel_types[types[i]]
+
+    def in_edges(self, node: int) -> Iterator[Tuple[int, str]]:
+        """入边：(起点, 关系类型)"""
+        offsets = self._sections["in_offsets"]
+        sources = self._sections["in_sources"]
+        types = self._sections["in_types"]
+        for i in range(offsets[node], offsets[node + 1]):
+            yield sources[i], self.rel_types[types[i]]
+
+    def neighbors(self, node: int) -> Iterator[Tuple[int, str, int]]:
+        """无向邻居：(邻居, 关系类型, 边编号)，边编号用于路径上的关系去重"""
+        offsets = self._sections["out_offsets"]
+        targets = self._sections["out_targets"]
+        types = self._sections["out_types"]
+        for i in range(offsets[node], offsets[node + 1]):
+            yield targets[i], self.rel_types[types[i]], (node, targets[i], types[i])
+        offsets = self._sections["in_offsets"]
+        sources = self._sections["in_sources"]
+        types = self._sections["in_types"]
+        for i in range(offsets[node], offsets[node + 1]):
+            yield sources[i], self.rel_types[types[i]], (sources[i], node, types[i])
+
+    def expand(self, node: int, max_degree: int, limit: Optional[int],
+               shallow_first: bool = False) -> List[Tuple[str, int, int, int]]:
+        """
+        与变长路径查询等价的展开：枚举长度不超过max_degree、关系不重复的路径，
+        返回去重后的 (最后一跳关系类型, 邻居, 路径长度, 最后一跳的起点)，最多limit条（None表示不限）
+
+        shallow_first为True时先枚举全部路径再按长度排序截取（对应 ORDER BY degree LIMIT）
+        """
+        rows: List[Tuple[str, int, int, int]] = []
+        seen = set()
+        cap = None if shallow_first else limit
+
+        def walk(current: int, depth: int, used: set):
+            for neighbor, rel_type, edge_id in self.neighbors(current):
+                if cap is not None and len(rows) >= cap:
+                    return
+                if edge_id in used:
+                    continue
+                row = (edge_id, neighbor, depth + 1)
+                if row not in seen:
+                    seen.add(row)
+                    rows.append((rel_type, neighbor, depth + 1, current))
+                if depth + 1 < max_degree:
+                    walk(neighbor, depth + 1, used | {edge_id})
+
+        walk(node, 0, frozenset())
+        if shallow_first:
+            rows.sort(key=lambda row: row[2])
+        return rows[:limit]
+
+    def verify(self) -> bool:
+        """重新计算内容哈希并与文件头比对"""
+        digest = hashlib.sha256()
+        for name in SECTIONS:
+            data = self._sections[name].tobytes()
+            digest.update(name.encode("ascii") + struct.pack("<Q", len(data)) + data)
+        return digest.hexdigest() == self.content_hash
+
+    def close(self):
+        """释放mmap"""
+        for view in getattr(self, "_views", []):
+            view.release()
+        self._views = []
+        if not self._mm.closed:
+            self._mm.close()
+        self._file.close()
+
+
+class GraphArtifactStore:
+    """按品类懒加载编译图谱，文件不存在时返回None；文件被替换（重新编译）后加载新文件"""
+
+    # 被替换的图谱延迟关闭的秒数，留给仍在使用旧图谱的请求完成
+    retire_grace = 60.0
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        # 品类 -> (文件标识, 图谱)，文件标识为 (inode, 修改时间, 大小)，加载失败时图谱为None
+        self._graphs: Dict[str, Tuple[Tuple[int, int, int], Optional[CompiledGraph]]] = {}
+        # (替换时刻, 旧图谱)
+        self._retired: List[Tuple[float, CompiledGraph]] = []
+        self._lock = threading.Lock()
+
+    def path_for(self, category: str) -> str:
+        """品类对应的图谱文件路径"""
+        return os.path.join(self.directory, f"{category}.graph")
+
+    def get(self, category: str) -> Optional[CompiledGraph]:
+        """
+        获取品类的编译图谱
+
+        每次都比对文件标识：文件被原子替换后加载新文件，旧图谱在 retire_grace 秒后关闭；
+        文件不存在的结果不缓存，之后编译出的文件会被发现
+        """
+        path = self.path_for(category)
+        try:
+            stat = os.stat(path)
+            identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            identity = None
+
+        with self._lock:
+            self._close_retired()
+            cached = self._graphs.get(category)
+            if cached is not None and cached[0] == identity:
+                return cached[1]
+            if cached is not None:
+                del self._graphs[category]
+                if cached[1] is not None:
+                    self._retired.append((time.monotonic(), cached[1]))
+                    logger.info(f"编译图谱已变化，{self.retire_grace:.0f} 秒后关闭旧图谱: {path} (版本 {cached[1].version})")
+            if identity is None:
+                return None
+
+            graph = None
+            try:
+                graph = CompiledGraph(path)
+                logger.info(f"已加载编译图谱: {path} (版本 {graph.version}, {graph.node_count} 个节点)")
+            except (OSError, ValueError) as e:
+                logger.warning(f"加载编译图谱失败，回退到Neo4j: {e}")
+            # 加载失败的文件按文件标识记住，替换后再重新加载
+            self._graphs[category] = (identity, graph)
+            return graph
+
+    def _close_retired(self):
+        """关闭超过宽限期的旧图谱（调用方持有锁）"""
+        now = time.monotonic()
+        while self._retired and now - self._retired[0][0] >= self.retire_grace:
+            _, graph = self._retired.pop(0)
+            graph.close()
+
+    def close(self):
+        """关闭全部已加载的图谱"""
+        with self._lock:
+            for _, graph in self._graphs.values():
+                if graph is not None:
+                    graph.close()
+            for _, graph in self._retired:
+                graph.close()
+            self._graphs.clear()
+            self._retired = []
+
+
+def export_from_neo4j(category: str) -> Tuple[List[Tuple[str, str]], List[Edge]]:
+    """从Neo4j导出某个品类分区的节点和关系（只读事务，从导入写入的因果书签开始读取）"""
+    from dotenv import load_dotenv
+    from cypher_queries import get_query
+    from neo4j_settings import Neo4jSettings
+
+    load_dotenv()
+    settings = Neo4jSettings.from_env()
+    driver = settings.create_driver()
+
+    def export(tx, query_name: str) -> List[tuple]:
+        return [tuple(row) for row in tx.run(get_query(query_name).text, {"category": category}).values()]
+
+    try:
+        with driver.session(**settings.read_session_kwargs(settings.create_bookmark_manager())) as session:
+            nodes = session.execute_read(export, "graph_export_nodes")
+            edges = session.execute_read(export, "graph_export_edges")
+    finally:
+        driver.close()
+    return nodes, edges
+
+
+def main():
+    """主函数"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="图谱编译工具")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    compile_parser = subparsers.add_parser("compile", help="编译图谱")
+    compile_parser.add_argument("categories", nargs="*", help="要编译的品类，默认全部已配置品类")
+    compile_parser.add_argument("--source", choices=["data", "neo4j"], default="data")
+    compile_parser.add_argument("--output-dir", default=os.getenv("GRAPH_ARTIFACT_DIR", DEFAULT_ARTIFACT_DIR))
+    info_parser = subparsers.add_parser("info", help="查看图谱文件信息")
+    info_parser.add_argument("path")
+    args = parser.parse_args()
+
+    if args.command == "info":
+        graph = CompiledGraph(args.path)
+        print(json.dumps({
+            "version": graph.version, "content_hash": graph.content_hash, "meta": graph.meta,
+            "nodes": graph.node_count, "edges": graph.edge_count,
+            "labels": graph.labels, "relation_types": graph.rel_types,
+            "verified": graph.verify()
+        }, ensure_ascii=False, indent=2))
+        graph.close()
+        return
+
+    from category_graph import load_category_configs
+
+    configs = load_category_configs()
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    for category in args.categories or list(configs.keys()):
+        if category not in configs:
+            logger.error(f"未配置的品类: {category}")
+            sys.exit(1)
+        if args.source == "neo4j":
+            nodes, edges = export_from_neo4j(category)
+            source = "neo4j"
+        else:
+            nodes, edges = load_graph_file(os.path.join(base_dir, configs[category].data_file))
+            source = configs[category].data_file
+        if not nodes:
+            logger.error(f"品类 {category} 没有可编译的节点")
+            sys.exit(1)
+
+        data = compile_graph(nodes, edges, {"category": category, "source": source})
+        path = os.path.join(args.output_dir, f"{category}.graph")
+        write_artifact(path, data)
+        graph = CompiledGraph(path)
+        logger.info(f"已编译 {category}: {graph.node_count} 个节点, {graph.edge_count} 条关系, "
+                    f"{len(data)} 字节, 版本 {graph.version} -> {path}")
+        graph.close()
+
+
+if __name__ == "__main__":
+    main()
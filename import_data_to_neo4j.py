@@ -1,16 +1,31 @@
 #!/usr/bin/env python3
 """
 Neo4j数据导入脚本
-将data.txt中的Cypher语句导入到Neo4j数据库中
+将data.txt中的Cypher语句（或 `.jsonl` 记录格式的节点和关系）导入到Neo4j数据库中
 """
 
+import argparse
 import os
+import re
 import sys
+import json
 import logging
-from neo4j import GraphDatabase
-from typing import List, Optional
+import random
+import threading
+import time
+import uuid
+import zlib
+from collections import defaultdict
+from dataclasses import replace
+from concurrent.futures import ThreadPoolExecutor
+from neo4j.exceptions import TransientError
+from typing import Dict, List, Optional, Set, Tuple
 from dotenv import load_dotenv
 
+from category_graph import load_category_configs
+from graph_artifact import Edge, parse_cypher_graph, read_cypher_statements, read_graph_records
+from neo4j_settings import Neo4jSettings, save_bookmarks
+
 # 加载环境变量
 load_dotenv()
 
@@ -21,12 +36,95 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# 节点模式中的名称属性，如 (a1:Stage {name: "明确需求"})
+NODE_NAME_PATTERN = re.compile(r'\{name:\s*"([^"]*)"\}')
+
+# 品类分区键索引，服务端按 (category, name) 定位节点
+CATEGORY_INDEX_LABELS = ["Decision", "Stage", "Factor"]
+
+# 标签和关系类型无法参数化，拼接前校验为合法标识符
+IDENTIFIER_PATTERN = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def node_bucket(name: str, buckets: int) -> int:
+    """按节点名称的稳定哈希分桶"""
+    return zlib.crc32(name.encode("utf-8")) % buckets
+
+
+def schedule_relationship_rounds(edges: List[Edge], buckets: int) -> List[List[List[Edge]]]:
+    """
+    将关系划分为若干轮，同一轮内的各分区互不共享节点，可以并发写入而不会争抢节点锁
+
+    节点按名称分桶，关系按两端所在的桶对 {i, j} 归入分区；同一轮只安排桶互不相交的分区：
+    第一轮是所有桶内分区 {i, i}，其余各轮按循环赛（圆周法）排程两两配对
+
+    Returns:
+        [[分区内的关系列表, ...], ...]，外层为轮次
+    """
+    cells: Dict[Tuple[int, int], List[Edge]] = defaultdict(list)
+    for edge in edges:
+        a, b = node_bucket(edge[0], buckets), node_bucket(edge[2], buckets)
+        cells[(min(a, b), max(a, b))].append(edge)
+
+    rounds = [[cells[(i, i)] for i in range(buckets) if cells.get((i, i))]]
+    players: List[Optional[int]] = list(range(buckets)) + ([None] if buckets % 2 else [])
+    for _ in range(len(players) - 1):
+        round_cells = []
+        for i in range(len(players) // 2):
+            a, b = players[i], players[-1 - i]
+            if a is not None and b is not None and cells.get((min(a, b), max(a, b))):
+                round_cells.append(cells[(min(a, b), max(a, b))])
+        rounds.append(round_cells)
+        players = [players[0], players[-1]] + players[1:-1]
+    return [round_cells for round_cells in rounds if round_cells]
+
+
+class ImportProgress:
+    """并行导入的进度、吞吐和重试统计（线程安全）"""
+
+    def __init__(self, phase: str, total: int, log_interval: float = 2.0):
+        self.phase = phase
+        self.total = total
+        self.done = 0
+        self.retries = 0
+        self.started = time.monotonic()
+        self.log_interval = log_interval
+        self._last_log = self.started
+        self._lock = threading.Lock()
+
+    def advance(self, rows: int):
+        """记录完成的行数，定期输出进度"""
+        with self._lock:
+            self.done += rows
+            now = time.monotonic()
+            if now - self._last_log >= self.log_interval or self.done >= self.total:
+                self._last_log = now
+                logger.info(f"{self.phase}: {self.done}/{self.total} ({self.rate():.0f} 行/秒, 重试 {self.retries} 次)")
+
+    def retry(self):
+        """记录一次死锁/瞬时错误重试"""
+        with self._lock:
+            self.retries += 1
+
+    def rate(self) -> float:
+        """平均吞吐（行/秒）"""
+        return self.done / max(time.monotonic() - self.started, 1e-6)
+
+    def summary(self) -> dict:
+        """统计摘要"""
+        return {
+            "rows": self.done,
+            "seconds": round(time.monotonic() - self.started, 2),
+            "rows_per_second": round(self.rate(), 1),
+            "retries": self.retries
+        }
+
 
 class Neo4jImporter:
     """Neo4j数据导入器"""
     
     def __init__(self, uri: str = "bolt://localhost:7687", 
-                 username: str = "neo4j", password: str = "password"):
+                 username: str = "neo4j", password: str = "password", database: Optional[str] = None):
         """
         初始化Neo4j连接
         
@@ -34,21 +132,27 @@ class Neo4jImporter:
             uri: Neo4j连接URI
             username: 用户名
             password: 密码
+            database: 数据库名称，None时使用服务端默认数据库
         """
         self.uri = uri
         self.username = username
         self.password = password
+        self.database = database
+        # 连接池、重试时间等其余配置与服务一致，来自环境变量
+        self.settings = replace(Neo4jSettings.from_env(), uri=uri, username=username,
+                                password=password, database=database)
         self.driver = None
+        # 所有会话共用一个书签管理器，导入结束时的书签即覆盖全部写入的因果书签
+        self.bookmark_manager = None
         
     def connect(self) -> bool:
         """建立数据库连接"""
         try:
-            self.driver = GraphDatabase.driver(
-                self.uri, 
-                auth=(self.username, self.password)
-            )
+            self.driver = self.settings.create_driver()
+            # 从空书签开始，只记录本次导入的写入
+            self.bookmark_manager = self.settings.create_bookmark_manager([])
             # 测试连接
-            with self.driver.session() as session:
+            with self._session() as session:
                 result = session.run("RETURN 1 as test")
                 test_value = result.single()["test"]
                 if test_value == 1:
@@ -61,6 +165,16 @@ class Neo4jImporter:
             logger.error(f"连接Neo4j失败: {e}")
             return False
     
+    def _session(self):
+        """使用配置的数据库和共用书签管理器的写会话"""
+        return self.driver.session(**self.settings.write_session_kwargs(self.bookmark_manager))
+    
+    def bookmarks(self) -> List[str]:
+        """到目前为止全部写入的因果书签，供服务的读事务使用（见 NEO4J_BOOKMARKS_FILE）"""
+        if self.bookmark_manager is None:
+            return []
+        return sorted(self.bookmark_manager.get_bookmarks())
+    
     def close(self):
         """关闭数据库连接"""
         if self.driver:
@@ -70,7 +184,7 @@ class Neo4jImporter:
     def clear_database(self) -> bool:
         """清空数据库"""
         try:
-            with self.driver.session() as session:
+            with self._session() as session:
                 # 删除所有关系
                 session.run("MATCH ()-[r]-() DELETE r")
                 # 删除所有节点
@@ -81,6 +195,83 @@ class Neo4jImporter:
             logger.error(f"清空数据库失败: {e}")
             return False
     
+    def clear_category(self, category: str) -> bool:
+        """清空某个品类分区的数据，不影响其他品类"""
+        try:
+            with self._session() as session:
+                session.run(
+                    "MATCH (n {category: $category}) DETACH DELETE n",
+                    category=category
+                ).consume()
+                logger.info(f"已清空品类分区: {category}")
+                return True
+        except Exception as e:
+            logger.error(f"清空品类分区失败: {e}")
+            return False
+    
+    def stamp_graph_version(self, category: str) -> Optional[str]:
+        """
+        在品类根节点上写入新的导入版本，服务据此发现重新导入并使品类快照和各级缓存失效
+        
+        Args:
+            category: 品类名称
+            
+        Returns:
+            写入的版本，品类没有根节点或写入失败时返回None
+        """
+        version = uuid.uuid4().hex
+        try:
+            with self._session() as session:
+                stamped = session.run(
+                    "MATCH (root:Decision {category: $category}) SET root.graph_version = $version "
+                    "RETURN count(root) AS stamped",
+                    category=category, version=version
+                ).single()["stamped"]
+        except Exception as e:
+            logger.error(f"写入品类 {category} 的导入版本失败: {e}")
+            return None
+        if not stamped:
+            logger.warning(f"品类 {category} 没有Decision根节点，未写入导入版本")
+            return None
+        logger.info(f"品类 {category} 的导入版本: {version}")
+        return version
+    
+    def create_category_indexes(self) -> bool:
+        """为品类分区键创建复合索引"""
+        try:
+            with self._session() as session:
+                for label in CATEGORY_INDEX_LABELS:
+                    # 标签无法参数化，索引DDL只能拼接固定的标签名
+                    session.run(
+                        f"CREATE INDEX {label.lower()}_category_name IF NOT EXISTS "
+                        f"FOR (n:{label}) ON (n.category, n.name)"
+                    ).consume()
+                    session.run(
+                        f"CREATE INDEX {label.lower()}_category IF NOT EXISTS "
+                        f"FOR (n:{label}) ON (n.category)"
+                    ).consume()
+                session.run("CALL db.awaitIndexes()").consume()
+                logger.info("已创建品类分区索引")
+                return True
+        except Exception as e:
+            logger.error(f"创建品类分区索引失败: {e}")
+            return False
+    
+    def tag_category(self, statements: List[str], category: str) -> List[str]:
+        """
+        将品类写入语句中每个节点的MERGE键，使各品类子图互不合并
+        
+        Args:
+            statements: Cypher语句列表
+            category: 品类名称
+            
+        Returns:
+            带品类分区键的Cypher语句列表
+        """
+        category_literal = json.dumps(category, ensure_ascii=False)
+        replacement = lambda m: f'{{name: "{m.group(1)}", category: {category_literal}}}'
+        return [NODE_NAME_PATTERN.sub(replacement, statement) for statement in statements]
+    
     def read_cypher_file(self, file_path: str) -> List[str]:
         """
         读取Cypher文件并解析语句
@@ -91,34 +282,8 @@ class Neo4jImporter:
         Returns:
             Cypher语句列表
         """
-        statements = []
-        current_statement = ""
-        
         try:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                for line in file:
-                    line = line.strip()
-                    
-                    # 跳过空行和注释行
-                    if not line or line.startswith('//'):
-                        continue
-                    
-                    # 累积语句
-                    current_statement += line + " "
-                    
-                    # 如果以分号结尾，则认为是一个完整的语句
-                    if line.endswith(';'):
-                        # 移除末尾的分号和多余空格
-                        statement = current_statement.strip().rstrip(';')
-                        if statement:
-                            statements.append(statement)
-                        current_statement = ""
-                
-                # 处理最后一个语句（如果没有分号结尾）
-                if current_statement.strip():
-                    statement = current_statement.strip()
-                    statements.append(statement)
-                    
+            statements = read_cypher_statements(file_path)
         except FileNotFoundError:
             logger.error(f"文件不存在: {file_path}")
             return []
@@ -140,7 +305,7 @@ class Neo4jImporter:
             执行是否成功
         """
         try:
-            with self.driver.session() as session:
+            with self._session() as session:
                 result = session.run(statement)
                 # 消费结果以确保语句完全执行
                 result.consume()
@@ -180,6 +345,166 @@ class Neo4jImporter:
         logger.info(f"导入完成: {success_count}/{total_statements} 条语句成功")
         return success_count == total_statements
     
+    def import_parallel(self, statements: List[str], category: str, workers: int = 4,
+                        batch_size: int = 500, max_retries: int = 5) -> dict:
+        """
+        并行导入一个品类
+        
+        先按标签分批并发MERGE全部节点（每个节点只出现在一个批次中），再按
+        schedule_relationship_rounds 的轮次并发写入关系：同一轮内的工作线程不会锁住同一个节点，
+        遇到死锁等瞬时错误时按指数退避重试
+        
+        Args:
+            statements: data文件中的Cypher语句（未带品类分区键）
+            category: 品类名称
+            workers: 并发会话数
+            batch_size: 每个事务写入的行数
+            max_retries: 单个批次的最大重试次数
+            
+        Returns:
+            节点和关系两个阶段的吞吐及重试统计
+        """
+        nodes, edges = parse_cypher_graph(statements)
+        return self.import_graph(nodes, edges, category, workers=workers, batch_size=batch_size,
+                                 max_retries=max_retries)
+    
+    def import_graph(self, nodes: List[Tuple[str, str]], edges: List[Edge], category: str, workers: int = 4,
+                     batch_size: int = 500, max_retries: int = 5) -> dict:
+        """
+        并行导入已解析的节点和关系（data文件解析结果、`.jsonl` 记录或合成图谱）
+        
+        Args:
+            nodes: [(节点名, 标签)]
+            edges: [(起点名, 关系类型, 终点名)]
+            category: 品类名称
+            workers: 并发会话数
+            batch_size: 每个事务写入的行数
+            max_retries: 单个批次的最大重试次数
+            
+        Returns:
+            节点和关系两个阶段的吞吐及重试统计
+        """
+        labels = dict(nodes)
+        for identifier in set(labels.values()) | {rel_type for _, rel_type, _ in edges}:
+            if not IDENTIFIER_PATTERN.match(identifier):
+                raise ValueError(f"非法的标签或关系类型: {identifier}")
+        
+        # 1. 节点：按标签分组后切成批次，批次之间互不重叠
+        node_progress = ImportProgress(f"[{category}] 节点", len(nodes))
+        node_batches = []
+        by_label: Dict[str, List[str]] = defaultdict(list)
+        for name, label in nodes:
+            by_label[label].append(name)
+        for label, names in by_label.items():
+            query = f"UNWIND $names AS name MERGE (n:{label} {{name: name, category: $category}})"
+            for i in range(0, len(names), batch_size):
+                node_batches.append((query, {"names": names[i:i + batch_size], "category": category}))
+        
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(self._write_batch, query, params, len(params["names"]),
+                                   node_progress, max_retries)
+                       for query, params in node_batches]
+            for future in futures:
+                future.result()
+        
+        # 2. 关系：按轮次写入，每一轮内的分区互不共享节点
+        edge_progress = ImportProgress(f"[{category}] 关系", len(edges))
+        rounds = schedule_relationship_rounds(edges, max(2, workers * 2))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for round_cells in rounds:
+                futures = [pool.submit(self._write_relationship_cell, cell, labels, category,
+                                       batch_size, edge_progress, max_retries)
+                           for cell in round_cells]
+                for future in futures:
+                    future.result()
+        
+        stats = {"nodes": node_progress.summary(), "relationships": edge_progress.summary(),
+                 "rounds": len(rounds)}
+        logger.info(f"[{category}] 并行导入完成: {stats}")
+        return stats
+    
+    def _write_relationship_cell(self, cell: List[Edge], labels: Dict[str, str], category: str,
+                                 batch_size: int, progress: ImportProgress, max_retries: int):
+        """顺序写入一个分区内的关系，按 (起点标签, 关系类型, 终点标签) 分组批量MERGE"""
+        groups: Dict[Tuple[str, str, str], List[dict]] = defaultdict(list)
+        for source, rel_type, target in cell:
+            groups[(labels[source], rel_type, labels[target])].append({"source": source, "target": target})
+        for (source_label, rel_type, target_label), rows in groups.items():
+            query = (
+                f"UNWIND $rows AS row "
+                f"MATCH (a:{source_label} {{category: $category, name: row.source}}) "
+                f"MATCH (b:{target_label} {{category: $category, name: row.target}}) "
+                f"MERGE (a)-[:{rel_type}]->(b)"
+            )
+            for i in range(0, len(rows), batch_size):
+                batch = rows[i:i + batch_size]
+                self._write_batch(query, {"rows": batch, "category": category}, len(batch),
+                                  progress, max_retries)
+    
+    def _write_batch(self, query: str, params: dict, rows: int, progress: ImportProgress,
+                     max_retries: int):
+        """在独立会话的显式事务中写入一个批次，死锁等瞬时错误时退避重试"""
+        for attempt in range(max_retries + 1):
+            try:
+                with self._session() as session:
+                    with session.begin_transaction() as tx:
+                        tx.run(query, params).consume()
+                        tx.commit()
+                progress.advance(rows)
+                return
+            except TransientError as e:
+                if attempt == max_retries:
+                    raise
+                progress.retry()
+                delay = 0.05 * (2 ** attempt) * (1 + random.random())
+                logger.warning(f"批次写入遇到瞬时错误，{delay:.2f}秒后重试: {e.code}")
+                time.sleep(delay)
+    
+    def category_fingerprint(self, category: str) -> Tuple[Set[Tuple[str, str]], Set[Tuple[str, str, str]]]:
+        """品类分区的全部节点 (标签, 名称) 和关系 (起点, 类型, 终点)"""
+        nodes = set()
+        edges = set()
+        with self._session() as session:
+            for label in CATEGORY_INDEX_LABELS:
+                result = session.run(
+                    f"MATCH (n:{label} {{category: $category}}) RETURN n.name AS name", category=category
+                )
+                nodes.update((label, record["name"]) for record in result)
+                result = session.run(
+                    f"MATCH (a:{label} {{category: $category}})-[r]->(b) WHERE b.category = $category "
+                    f"RETURN a.name AS source, type(r) AS type, b.name AS target",
+                    category=category
+                )
+                edges.update((record["source"], record["type"], record["target"]) for record in result)
+        return nodes, edges
+    
+    def verify_against_single_threaded(self, statements: List[str], category: str) -> bool:
+        """
+        将同一份数据单线程导入临时分区，与并行导入的结果逐条对比
+        
+        Returns:
+            两次导入的节点和关系完全一致时返回True
+        """
+        reference = f"{category}__verify"
+        self.clear_category(reference)
+        try:
+            self.import_statements(self.tag_category(statements, reference))
+            expected_nodes, expected_edges = self.category_fingerprint(reference)
+            actual_nodes, actual_edges = self.category_fingerprint(category)
+        finally:
+            self.clear_category(reference)
+        
+        ok = True
+        for kind, expected, actual in (("节点", expected_nodes, actual_nodes), ("关系", expected_edges, actual_edges)):
+            missing, extra = expected - actual, actual - expected
+            if missing or extra:
+                ok = False
+                logger.error(f"[{category}] 并行导入的{kind}与单线程导入不一致: "
+                             f"缺少 {len(missing)} 个 {sorted(missing)[:5]}，多出 {len(extra)} 个 {sorted(extra)[:5]}")
+            else:
+                logger.info(f"[{category}] {kind}与单线程导入一致: {len(actual)} 个")
+        return ok
+    
     def verify_import(self) -> dict:
         """
         验证导入结果
@@ -190,7 +515,7 @@ class Neo4jImporter:
         stats = {}
         
         try:
-            with self.driver.session() as session:
+            with self._session() as session:
                 # 统计节点数量
                 result = session.run("MATCH (n) RETURN count(n) as node_count")
                 stats['total_nodes'] = result.single()["node_count"]
@@ -226,6 +551,14 @@ class Neo4jImporter:
                     rel_types[rel_type] = count
                 stats['relationship_types'] = rel_types
                 
+                # 统计各品类分区的节点数量
+                result = session.run("""
+                    MATCH (n) WHERE n.category IS NOT NULL
+                    RETURN n.category as category, count(n) as count
+                    ORDER BY count DESC
+                """)
+                stats['categories'] = {record["category"]: record["count"] for record in result}
+                
         except Exception as e:
             logger.error(f"验证导入结果失败: {e}")
             return {}
@@ -253,6 +586,10 @@ class Neo4jImporter:
         rel_types = stats.get('relationship_types', {})
         for rel_type, count in rel_types.items():
             print(f"  {rel_type}: {count}")
+        
+        print(f"\n品类分区分布:")
+        for category, count in stats.get('categories', {}).items():
+            print(f"  {category}: {count}")
         print("="*50)
 
 
@@ -262,17 +599,35 @@ def main():
     NEO4J_URI = os.getenv("NEO4J_URI", "bolt://localhost:7687")
     NEO4J_USERNAME = os.getenv("NEO4J_USERNAME", "neo4j")
     NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD", "password")
-    DATA_FILE = os.path.join(os.path.dirname(__file__), "data.txt")
+    NEO4J_DATABASE = os.getenv("NEO4J_DATABASE") or None
+    BASE_DIR = os.path.dirname(__file__)
+    
+    parser = argparse.ArgumentParser(description="将品类数据文件导入Neo4j")
+    parser.add_argument("categories", nargs="*", help="只重新导入这些品类，默认导入全部已配置品类")
+    parser.add_argument("--parallel", type=int, default=0, metavar="N",
+                        help="使用N个并发会话并行导入，0为单线程逐条执行")
+    parser.add_argument("--batch-size", type=int, default=500, help="并行导入时每个事务的行数")
+    parser.add_argument("--verify", action="store_true", help="并行导入后与单线程导入结果对比")
+    parser.add_argument("--bookmarks-file", default=os.getenv("NEO4J_BOOKMARKS_FILE"),
+                        help="导入完成后写入因果书签的文件，服务设置相同的NEO4J_BOOKMARKS_FILE后从这些书签开始读取")
+    args = parser.parse_args()
     
-    logger.info(f"连接配置: URI={NEO4J_URI}, 用户名={NEO4J_USERNAME}")
+    logger.info(f"连接配置: URI={NEO4J_URI}, 用户名={NEO4J_USERNAME}, 数据库={NEO4J_DATABASE or '默认'}")
     
-    # 检查数据文件是否存在
-    if not os.path.exists(DATA_FILE):
-        logger.error(f"数据文件不存在: {DATA_FILE}")
-        sys.exit(1)
+    # 命令行指定品类时只重新导入这些品类，否则导入全部已配置品类
+    categories = load_category_configs()
+    selected = args.categories or list(categories.keys())
+    for name in selected:
+        if name not in categories:
+            logger.error(f"未配置的品类: {name}，请检查GRAPH_CATEGORIES")
+            sys.exit(1)
+        data_file = os.path.join(BASE_DIR, categories[name].data_file)
+        if not os.path.exists(data_file):
+            logger.error(f"数据文件不存在: {data_file}")
+            sys.exit(1)
     
     # 创建导入器实例
-    importer = Neo4jImporter(NEO4J_URI, NEO4J_USERNAME, NEO4J_PASSWORD)
+    importer = Neo4jImporter(NEO4J_URI, NEO4J_USERNAME, NEO4J_PASSWORD, NEO4J_DATABASE)
     
     try:
         # 连接数据库
@@ -280,26 +635,62 @@ def main():
             logger.error("无法连接到Neo4j数据库，请检查连接配置")
             sys.exit(1)
         
-        # 清空数据库
-        logger.info("清空现有数据库...")
-        if not importer.clear_database():
-            logger.error("清空数据库失败")
-            sys.exit(1)
+        # 清空现有数据：全量导入清空整库，指定品类时只清空对应分区
+        if args.categories:
+            for name in selected:
+                if not importer.clear_category(name):
+                    logger.error(f"清空品类分区失败: {name}")
+                    sys.exit(1)
+        else:
+            logger.info("清空现有数据库...")
+            if not importer.clear_database():
+                logger.error("清空数据库失败")
+                sys.exit(1)
         
-        # 读取Cypher语句
-        statements = importer.read_cypher_file(DATA_FILE)
-        if not statements:
-            logger.error("没有读取到有效的Cypher语句")
-            sys.exit(1)
+        importer.create_category_indexes()
         
-        # 导入数据
-        success = importer.import_statements(statements)
+        success = True
+        for name in selected:
+            config = categories[name]
+            logger.info(f"导入品类: {name} ({config.data_file})")
+            
+            # 记录格式（如合成图谱）没有Cypher语句，直接按节点和关系并行导入
+            if config.data_file.endswith(".jsonl"):
+                nodes, edges = read_graph_records(os.path.join(BASE_DIR, config.data_file))
+                stats = importer.import_graph(nodes, edges, name, workers=max(args.parallel, 1),
+                                              batch_size=args.batch_size)
+                print(f"\n{name} 并行导入: 节点 {stats['nodes']}, 关系 {stats['relationships']}")
+                if args.verify:
+                    logger.warning(f"品类 {name} 为记录格式，不支持与单线程导入对比")
+                importer.stamp_graph_version(name)
+                continue
+            
+            # 读取Cypher语句
+            statements = importer.read_cypher_file(os.path.join(BASE_DIR, config.data_file))
+            if not statements:
+                logger.error(f"品类 {name} 没有读取到有效的Cypher语句")
+                sys.exit(1)
+            
+            # 导入数据（节点按品类分区）
+            if args.parallel:
+                stats = importer.import_parallel(statements, name, workers=args.parallel,
+                                                 batch_size=args.batch_size)
+                print(f"\n{name} 并行导入: 节点 {stats['nodes']}, 关系 {stats['relationships']}")
+                if args.verify:
+                    success = importer.verify_against_single_threaded(statements, name) and success
+            else:
+                success = importer.import_statements(importer.tag_category(statements, name)) and success
+            importer.stamp_graph_version(name)
         
         if success:
             logger.info("数据导入成功!")
         else:
             logger.warning("部分语句导入失败，请检查日志")
         
+        if args.bookmarks_file:
+            save_bookmarks(args.bookmarks_file, importer.bookmarks())
+            logger.info(f"已写入因果书签: {args.bookmarks_file}")
+        
         # 验证并显示统计信息
         stats = importer.verify_import()
         importer.print_statistics(stats)
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+增量JSON解析
+在大模型流式输出的过程中逐段解析JSON对象，每个顶层字段的值一结束就立即产出，
+不必等待整个对象生成完毕
+"""
+
+import json
+from typing import Any, List, Optional, Tuple
+
+
+class IncrementalJSONParser:
+    """增量解析JSON对象的顶层字段"""
+
+    def __init__(self):
+        self._text = ""
+        self._pos = 0
+        self._started = False
+        self._done = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._segment_start = 0
+
+    @property
+    def done(self) -> bool:
+        """顶层对象是否已经结束"""
+        return self._done
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """
+        输入一段新文本，返回本次新完成的顶层字段
+
+        Args:
+            chunk: 新到达的文本片段
+
+        Returns:
+            (字段名, 字段值) 列表，按出现顺序排列
+        """
+        self._text += chunk
+        fields = []
+        while self._pos < len(self._text) and not self._done:
+            index = self._pos
+            ch = self._text[index]
+            self._pos += 1
+
+            # 跳过对象开始前的说明文字或代码块标记
+            if not self._started:
+                if ch == "{":
+                    self._started = True
+                    self._depth = 1
+                    self._segment_start = index + 1
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+
+            if ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    field = self._complete_segment(self._text[self._segment_start:index])
+                    if field:
+                        fields.append(field)
+                    self._done = True
+            elif ch == "," and self._depth == 1:
+                field = self._complete_segment(self._text[self._segment_start:index])
+                if field:
+                    fields.append(field)
+                self._segment_start = index + 1
+        return fields
+
+    def _complete_segment(self, segment: str) -> Optional[Tuple[str, Any]]:
+        """解析一个 `"key": value` 片段，格式不完整时忽略"""
+        if not segment.strip():
+            return None
+        try:
+            pair = json.loads("{" + segment + "}")
+        except json.JSONDecodeError:
+            return None
+        if len(pair) != 1:
+            return None
+        return next(iter(pair.items()))
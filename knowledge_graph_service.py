@@ -5,21 +5,36 @@
 """
 
 import asyncio
+import hashlib
 import json
 import logging
+import math
 import os
 import re
-from typing import Dict, List, Any, Tuple
-from dataclasses import dataclass
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Any, Optional, Tuple, Union
+from dataclasses import asdict, dataclass, field
 
-from neo4j import GraphDatabase
-import httpx
-from dotenv import load_dotenv
+from admission import AdmissionConfig, AdmissionController, ServiceMode
+from conversation import BASE_PIECE, ConversationSession, diff_seeds, merge_follow_up_parse
+from category_graph import (
+    DEFAULT_CATEGORY, CategorySnapshot, CategorySnapshotCache, load_category_configs
+)
+from cypher_queries import PRODUCT_CATEGORY_FACTORS, get_query
+from graph_artifact import DEFAULT_ARTIFACT_DIR, CompiledGraph, GraphArtifactStore
+from llm_client import HedgedLLMClient
+from llm_scheduler import Priority
+from neo4j_settings import Neo4jSettings
+from parse_batcher import ParseBatchConfig, ParseBatcher
+from materialized_answers import MaterializedAnswers, MaterializedAnswerStore, union_relations
+from pipeline import PipelineDAG, PipelineStage
+from price_index import parse_price_range
+from relation_cache import RelationCache, SharedCache
+from relevance import RelevanceRanking
+from response_formatters import FORMATTERS, ReportOutput, build_report, format_report
 
-# 加载环境变量
-load_dotenv()
-
-logging.basicConfig(level=logging.INFO)
+# neo4j、httpx和dotenv在首次使用时才导入，导入本模块不产生连接或全局日志配置
 logger = logging.getLogger(__name__)
 
 
@@ -39,6 +54,10 @@ class GraphRelation:
     to_node: str
     relation_type: str
     properties: Dict[str, Any]
+    # 距种子节点的度数，品类核心关系等非种子关系为0
+    degree: int = 0
+    # 最后一跳的起点名称（一度关系即中心节点），用于排除经由无关节点到达的关系
+    via: str = ""
 
 
 @dataclass
@@ -47,32 +66,321 @@ class QueryResult:
     nodes: List[GraphNode]
     relations: List[GraphRelation]
     context: str
+    # 每个种子实际使用的关系度数
+    seed_degrees: Dict[str, int] = field(default_factory=dict)
+
+
+@dataclass
+class AdaptiveDegreeConfig:
+    """自适应度数配置：逐跳扩展，达到预算或新增节点过少时停止"""
+    seed_budget: int = 20
+    global_budget: int = 60
+    min_new_nodes: int = 2
+    max_degree: int = 3
+
+    @classmethod
+    def from_env(cls) -> "AdaptiveDegreeConfig":
+        """根据环境变量创建配置"""
+        return cls(
+            seed_budget=int(os.getenv("ADAPTIVE_SEED_BUDGET", "20")),
+            global_budget=int(os.getenv("ADAPTIVE_GLOBAL_BUDGET", "60")),
+            min_new_nodes=int(os.getenv("ADAPTIVE_MIN_NEW_NODES", "2")),
+            max_degree=int(os.getenv("ADAPTIVE_MAX_DEGREE", "3"))
+        )
 
 
 class KnowledgeGraphService:
     """事理图谱服务"""
     
-    def __init__(self, max_degree: int = 2):
-        # 从环境变量读取Neo4j配置
-        neo4j_uri = os.getenv("NEO4J_URI", "bolt://localhost:7687")
-        neo4j_user = os.getenv("NEO4J_USERNAME", "neo4j")
-        neo4j_password = os.getenv("NEO4J_PASSWORD", "password")
+    def __init__(self, max_degree: int = 2, default_category: str = DEFAULT_CATEGORY,
+                 adaptive_degree: Optional[AdaptiveDegreeConfig] = None, ranked_retrieval: bool = False):
+        # 加载环境变量
+        from dotenv import load_dotenv
+        load_dotenv()
         
-        self.driver = GraphDatabase.driver(neo4j_uri, auth=(neo4j_user, neo4j_password))
+        # 从环境变量读取Neo4j配置（路由、数据库、连接池、拉取批量、书签），驱动在首次访问时创建
+        self.neo4j = Neo4jSettings.from_env()
+        self._driver = None
+        self._bookmark_manager = None
+        self._driver_lock = threading.Lock()
         
-        # 从环境变量读取LLM配置
-        self.llm_api_key = os.getenv("LLM_API_KEY")
-        self.llm_base_url = os.getenv("LLM_BASE_URL", "https://openrouter.ai/api/v1")
-        self.llm_model = os.getenv("LLM_MODEL", "deepseek/deepseek-chat-v3-0324:free")
+        # 从环境变量读取LLM配置（支持多端点对冲和熔断）
+        self.llm_client = HedgedLLMClient.from_env()
         
         # 配置关系度数
         self.max_degree = max_degree
-        logger.info(f"设置最大关系度数为: {max_degree}")
+        # 自适应模式下max_degree不再固定，每个种子按局部密度逐跳扩展
+        self.adaptive_degree = adaptive_degree
+        if adaptive_degree:
+            logger.info(f"使用自适应关系度数: {adaptive_degree}")
+        else:
+            logger.info(f"设置最大关系度数为: {max_degree}")
+        # 排序检索：种子关系由数据库按分层关键词打分，只返回每个类别分数最高的行（自适应模式下不生效）
+        self.ranked_retrieval = ranked_retrieval and not adaptive_degree
+        
+        # 品类配置：每个品类是图谱中带category属性的独立子图，快照按需加载
+        self.categories = load_category_configs()
+        self.default_category = default_category
+        self.snapshot_cache = CategorySnapshotCache(
+            max_categories=int(os.getenv("CATEGORY_SNAPSHOT_MAX", "4")),
+            idle_ttl=float(os.getenv("CATEGORY_SNAPSHOT_TTL", "600")),
+            pinned=(default_category,)
+        )
+        # 每隔该秒数确认一次品类的图谱版本（Neo4j根节点上的导入版本或编译图谱的内容哈希），变化时重新加载快照
+        self.graph_version_check_interval = float(os.getenv("GRAPH_VERSION_CHECK_INTERVAL", "5"))
+        
+        # 已编译的品类图谱通过mmap加载，存在时读路径不再访问Neo4j
+        self.graph_artifacts = GraphArtifactStore(os.getenv("GRAPH_ARTIFACT_DIR", DEFAULT_ARTIFACT_DIR))
+        # 与图谱版本绑定的预计算种子关系和剪枝结果（materialized_answers.py 生成），为None时不使用
+        self.materialized_answers: Optional[MaterializedAnswerStore] = MaterializedAnswerStore(
+            self.graph_artifacts.directory
+        )
+        # 种子关系读穿透缓存，按估算字节数LRU淘汰，图谱版本变化时失效
+        self.seed_cache = RelationCache(
+            max_bytes=int(os.getenv("SEED_CACHE_MAX_BYTES", str(16 * 1024 * 1024))),
+            sizeof=self._seed_relations_size
+        )
+        # 解析和剪枝结果的进程内缓存（L1）
+        self.result_cache = RelationCache(
+            max_bytes=int(os.getenv("RESULT_CACHE_MAX_BYTES", str(4 * 1024 * 1024))),
+            sizeof=lambda value: len(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+        )
+        # 同机多进程共享的缓存层（L2），设置SHARED_CACHE_PATH时启用；
+        # 没有导入版本的Neo4j数据无法跨进程比较版本，共享条目按SHARED_CACHE_TTL过期
+        shared_cache_path = os.getenv("SHARED_CACHE_PATH")
+        self.shared_cache: Optional[SharedCache] = SharedCache(
+            shared_cache_path,
+            max_bytes=int(os.getenv("SHARED_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+        ) if shared_cache_path else None
+        self.shared_cache_ttl = float(os.getenv("SHARED_CACHE_TTL", "600"))
+        # 入站准入控制：过载时逐级降级处理模式，超过硬上限时拒绝
+        self.admission = AdmissionController(AdmissionConfig.from_env())
+        # 解析请求的动态微批，设置PARSE_BATCH_WINDOW_MS时启用
+        parse_batch_config = ParseBatchConfig.from_env()
+        self.parse_batcher: Optional[ParseBatcher] = ParseBatcher(
+            self._llm_parse_batch, self._llm_complete_parse, parse_batch_config
+        ) if parse_batch_config.enabled else None
+        
+        # 解析提示词随品类配置变化，品类配置即解析结果的版本
+        self._parse_version = f"parse:{default_category}:{'|'.join(self.categories)}"
+        
+    @property
+    def driver(self):
+        """Neo4j驱动，首次访问时才导入neo4j并创建"""
+        if self._driver is None:
+            with self._driver_lock:
+                if self._driver is None:
+                    if self._bookmark_manager is None:
+                        self._bookmark_manager = self.neo4j.create_bookmark_manager()
+                    self._driver = self.neo4j.create_driver()
+        return self._driver
+    
+    @driver.setter
+    def driver(self, driver):
+        self._driver = driver
+    
+    def use_bookmarks(self, bookmarks: Iterable[str]):
+        """
+        之后的读事务从给定的因果书签开始（如同一进程内刚完成的导入），
+        集群中尚未同步到这些书签的成员会等待同步后再执行读取
+        """
+        self._bookmark_manager = self.neo4j.create_bookmark_manager(bookmarks)
+    
+    def _read_session(self):
+        """只读会话：按路由表分散到集群的只读成员，使用配置的数据库、拉取批量和书签"""
+        return self.driver.session(**self.neo4j.read_session_kwargs(self._bookmark_manager))
+        
+    async def warm_up(self, categories: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        预热：建立Neo4j和大模型端点的连接，加载品类快照
         
+        应在处理请求的同一个事件循环中调用，HTTP连接池绑定事件循环
+        
+        Args:
+            categories: 需要预加载快照的品类，默认只加载默认品类
+            
+        Returns:
+            各步骤耗时（毫秒）和端点连接情况
+        """
+        timings: Dict[str, Any] = {}
+        categories = categories or [self.default_category]
+        
+        # 所有品类都由编译图谱提供时读路径不需要Neo4j
+        needs_neo4j = any(self.graph_artifacts.get(category) is None for category in categories)
+        llm_task = asyncio.ensure_future(self.llm_client.warm_up())
+        
+        started = time.perf_counter()
+        if needs_neo4j:
+            await asyncio.to_thread(self.driver.verify_connectivity)
+            timings["neo4j_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        
+        started = time.perf_counter()
+        for category in categories:
+            await asyncio.to_thread(self._get_category_snapshot, category)
+        timings["snapshots_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        
+        timings["llm_endpoints_ms"] = await llm_task
+        logger.info(f"预热完成: {timings}")
+        return timings
+        
+    async def aclose(self):
+        """关闭大模型客户端的HTTP连接池，再关闭数据库连接和各缓存（在处理请求的事件循环中调用）"""
+        await self.llm_client.aclose()
+        self.close()
+    
     def close(self):
-        """关闭数据库连接"""
-        if self.driver:
-            self.driver.close()
+        """关闭数据库连接（大模型客户端的连接池需要 aclose 关闭）"""
+        if self._driver is not None:
+            self._driver.close()
+        self.graph_artifacts.close()
+        if self.shared_cache is not None:
+            self.shared_cache.close()
+
+    async def handle_query(self, query: str, format: str = "markdown") -> ReportOutput:
+        """
+        经过准入控制处理一个完整请求：解析、检索图谱、剪枝并生成报告
+        
+        负载升高时按准入控制选择的模式降级：rule_prune 用规则剪枝代替大模型剪枝，
+        reduced_degree 再将关系度数降低一度，rule_parse 再用规则解析代替大模型解析。
+        使用的模式记录在报告数据的 mode 字段中
+        
+        Args:
+            query: 用户查询
+            format: 输出格式，见 generate_response
+            
+        Raises:
+            ServiceOverloadedError: 处理中的请求数已达硬上限
+        """
+        with self.admission.admit() as mode:
+            if mode >= ServiceMode.REDUCED_DEGREE:
+                if mode >= ServiceMode.RULE_PARSE:
+                    parsed_query = self._simple_fallback_parse(query)
+                else:
+                    parsed_query = await self.parse_query(query)
+                degree = max(1, self.max_degree - 1)
+                views = await asyncio.to_thread(self.query_graph, parsed_query, None, [degree])
+                query_result = views[degree]
+            else:
+                parsed_query, query_result = await self.parse_and_query_graph(query)
+            return await self.generate_response(query, query_result, parsed_query, format=format, mode=mode)
+
+    def start_session(self) -> ConversationSession:
+        """创建多轮对话会话，之后的每一轮（包括首轮）都用 session_turn 处理"""
+        return ConversationSession()
+
+    async def session_turn(self, session: ConversationSession, query: str,
+                           format: str = "markdown") -> ReportOutput:
+        """
+        处理多轮对话中的一轮（首轮或追问）
+        
+        追问以上一轮的解析结果为上下文解析出完整条件，再比较前后两轮的种子：只检索和剪枝新增的种子，
+        移除的种子直接丢弃，其余种子的关系和剪枝结果原样复用，重新组装图谱结果和报告。
+        品类或图谱版本变化时会话状态失效，本轮按首轮处理。请求经过准入控制：rule_prune 及更低档位
+        用规则剪枝新增部分，rule_parse 用规则解析追问并合并到上一轮的条件中。
+        本轮成功后才记入会话的轮次和解析结果，失败的一轮不会成为下一轮的上下文
+        
+        Args:
+            session: start_session() 创建的会话
+            query: 本轮的用户输入，如 `再加上拍照好`
+            format: 输出格式，见 generate_response
+            
+        Raises:
+            ServiceOverloadedError: 处理中的请求数已达硬上限
+        """
+        if format not in FORMATTERS:
+            raise ValueError(f"不支持的输出格式: {format}，可选: {', '.join(FORMATTERS)}")
+        
+        with self.admission.admit() as mode:
+            parsed_query = await self._parse_turn(session, query, mode)
+            conversation_query = session.query_with(query)
+            
+            category = self._resolve_category(parsed_query)
+            snapshot = await asyncio.to_thread(self._get_category_snapshot, category)
+            graph_version = self._snapshot_version(snapshot)
+            if session.category != category or session.graph_version != graph_version:
+                if session.category is not None:
+                    logger.info(f"会话 {session.session_id} 的品类或图谱版本变化，重新检索")
+                session.reset()
+                session.category = category
+                session.graph_version = graph_version
+            
+            # 只检索新增的种子，移除的种子连同其剪枝结果一起丢弃
+            seed_keys = self._seed_keys(parsed_query, snapshot)
+            diff = diff_seeds(session.seed_results, seed_keys)
+            for seed_key in diff.removed:
+                session.seed_results.pop(seed_key, None)
+                session.pruned_pieces.pop(seed_key, None)
+            # 排序检索时新增种子按本轮的关键词排序，复用的种子保持原来的结果
+            ranking = self._relevance_ranking(parsed_query)
+            fetched = await asyncio.gather(
+                *(asyncio.to_thread(self._fetch_seed_relations, *seed_key, ranking) for seed_key in diff.added)
+            )
+            session.seed_results.update(zip(diff.added, fetched))
+            seed_results = {seed_key: session.seed_results[seed_key] for seed_key in seed_keys}
+            query_result = self._assemble_query_result(snapshot, parsed_query, seed_results)
+            
+            relevant_relations = await self._prune_session(session, snapshot, conversation_query, parsed_query,
+                                                           query_result, seed_keys,
+                                                           allow_llm=mode < ServiceMode.RULE_PRUNE)
+            
+            session.turns.append(query)
+            session.parsed_query = parsed_query
+            session.query_result = query_result
+            session.last_diff = diff
+            session.updated_at = time.time()
+            logger.info(f"会话 {session.session_id} 第 {len(session.turns)} 轮: 种子{diff.summary()}")
+            
+            report = build_report(session.query, parsed_query, category, relevant_relations, mode=mode.label)
+            return format_report(report, format)
+
+    async def _parse_turn(self, session: ConversationSession, query: str, mode: ServiceMode) -> Dict[str, Any]:
+        """解析会话中的一轮：首轮与单次查询相同，追问带上一轮的解析结果作为上下文"""
+        previous = session.parsed_query
+        if previous is None:
+            if mode >= ServiceMode.RULE_PARSE:
+                return self._simple_fallback_parse(query)
+            return await self.parse_query(query)
+        
+        if mode < ServiceMode.RULE_PARSE:
+            parsed_query = await self._llm_parse_query(query, context=previous)
+            if parsed_query:
+                return parsed_query
+            logger.warning("大模型解析追问失败，使用规则解析并合并上一轮的条件")
+        return merge_follow_up_parse(previous, self._simple_fallback_parse(query), query, self.categories)
+
+    async def _prune_session(self, session: ConversationSession, snapshot: CategorySnapshot,
+                             conversation_query: str, parsed_query: Dict[str, Any], query_result: QueryResult,
+                             seed_keys: List[Tuple[str, str, str]], allow_llm: bool) -> Dict[str, List[str]]:
+        """
+        按部分剪枝会话的关系：品类基础关系和每个种子的关系分别剪枝并保存在会话中，
+        只剪枝还没有结果的部分，再对各部分取并集，只保留本轮关系中存在的因子
+        """
+        all_relations = self._organize_relations_by_category(query_result.relations)
+        composed = self._compose_materialized_pruning(all_relations, parsed_query)
+        if composed:
+            logger.info("使用预计算剪枝结果")
+            return composed
+        
+        pending = {}
+        if BASE_PIECE not in session.pruned_pieces:
+            # 基础关系不带价格条件，价格变化时不需要重新剪枝（不相关的档位在最后一步过滤掉）
+            base_result = self._assemble_query_result(snapshot, {**parsed_query, "price_range": ""}, {})
+            pending[BASE_PIECE] = self._organize_relations_by_category(base_result.relations)
+        for seed_key in seed_keys:
+            if seed_key not in session.pruned_pieces:
+                pending[seed_key] = self._organize_relations_by_category(session.seed_results[seed_key]["relations"])
+        
+        pruned = await asyncio.gather(*(
+            self._prune_uncomposed(conversation_query, relations, parsed_query, allow_llm) if relations
+            else asyncio.sleep(0, result={})
+            for relations in pending.values()
+        ))
+        session.pruned_pieces.update(zip(pending, pruned))
+        if pending:
+            logger.info(f"会话剪枝了 {len(pending)} 个部分，复用 {len(seed_keys) + 1 - len(pending)} 个")
+        
+        pieces = [session.pruned_pieces[BASE_PIECE]] + [session.pruned_pieces[seed_key] for seed_key in seed_keys]
+        return self._restrict_to_relations(union_relations(pieces), all_relations)
 
     async def parse_query(self, query: str) -> Dict[str, Any]:
         """使用大模型解析用户查询，提取关键信息"""
@@ -86,16 +394,124 @@ class KnowledgeGraphService:
         logger.warning("大模型解析失败，使用简单规则解析")
         return self._simple_fallback_parse(query)
 
-    async def _llm_parse_query(self, query: str) -> Dict[str, Any]:
-        """使用大模型解析查询"""
-        prompt = f"""
-请分析以下手机购买查询，提取关键信息。请返回JSON格式，字段必须完全按照以下格式：
+    async def parse_and_query_graph(self, query: str) -> Tuple[Dict[str, Any], QueryResult]:
+        """
+        流式解析查询并检索图谱
+        
+        请求按依赖关系组织为流水线：品类快照（核心决策子图）与查询无关，和大模型解析
+        同时在时刻0启动；大模型输出中的user_groups、explicit_needs数组一结束，就在后台
+        线程中检索对应的种子节点关系，与模型继续生成其余字段的过程重叠
+        
+        Args:
+            query: 用户查询
+            
+        Returns:
+            (解析结果, 图谱查询结果)
+        """
+        prefetch_tasks = {}
+        current_category = [self.default_category]
+        
+        def on_field(key: str, value: Any):
+            # 排序检索的关键词取决于完整的解析结果，不能提前检索
+            if self.ranked_retrieval:
+                return
+            if key == "product_category" and value in self.categories:
+                current_category[0] = value
+            elif key in ("user_groups", "explicit_needs") and isinstance(value, list):
+                kind = "user_group" if key == "user_groups" else "need"
+                for name in value:
+                    seed_key = (kind, current_category[0], name)
+                    if isinstance(name, str) and seed_key not in prefetch_tasks:
+                        prefetch_tasks[seed_key] = asyncio.ensure_future(
+                            asyncio.to_thread(self._fetch_seed_relations, *seed_key)
+                        )
+        
+        async def parse_stage() -> Dict[str, Any]:
+            parsed_query = await self._llm_parse_query(query, on_field=on_field)
+            if not parsed_query:
+                logger.warning("大模型解析失败，使用简单规则解析")
+                parsed_query = self._simple_fallback_parse(query)
+            return parsed_query
+        
+        async def snapshot_stage() -> CategorySnapshot:
+            # 绝大多数查询属于默认品类，先行加载（已预热时直接命中内存）
+            return await asyncio.to_thread(self._get_category_snapshot, self.default_category)
+        
+        async def seeds_stage(parse: Dict[str, Any]) -> Dict[Tuple[str, str, str], Dict[str, Any]]:
+            # 收集提前检索的结果；与最终解析结果不一致的种子被忽略，缺失的种子并发补查
+            # 预算档位种子需要品类快照中的价格索引，快照在线程中获取，避免冷加载或版本确认阻塞事件循环
+            snapshot = await asyncio.to_thread(self._get_category_snapshot, self._resolve_category(parse))
+            seed_keys = self._seed_keys(parse, snapshot)
+            seed_results = {}
+            for seed_key in seed_keys:
+                task = prefetch_tasks.get(seed_key)
+                if task is None:
+                    continue
+                try:
+                    seed_results[seed_key] = await task
+                except Exception as e:
+                    logger.warning(f"提前检索种子节点失败: {seed_key} {e}")
+            if seed_results:
+                logger.info(f"解析过程中提前检索了 {len(seed_results)} 个种子节点")
+            
+            missing = [seed_key for seed_key in seed_keys if seed_key not in seed_results]
+            ranking = self._relevance_ranking(parse)
+            fetched = await asyncio.gather(
+                *(asyncio.to_thread(self._fetch_seed_relations, *seed_key, ranking) for seed_key in missing)
+            )
+            seed_results.update(zip(missing, fetched))
+            return seed_results
+        
+        async def graph_stage(parse: Dict[str, Any], snapshot: CategorySnapshot,
+                              seeds: Dict[Tuple[str, str, str], Dict[str, Any]]) -> QueryResult:
+            category = self._resolve_category(parse)
+            if snapshot.category != category:
+                snapshot = await asyncio.to_thread(self._get_category_snapshot, category)
+            return self._assemble_query_result(snapshot, parse, seeds)
+        
+        dag = PipelineDAG([
+            PipelineStage("parse", parse_stage),
+            PipelineStage("snapshot", snapshot_stage),
+            PipelineStage("seeds", seeds_stage, ("parse",)),
+            PipelineStage("graph", graph_stage, ("parse", "snapshot", "seeds")),
+        ])
+        try:
+            results = await dag.run()
+        finally:
+            for task in prefetch_tasks.values():
+                task.cancel()
+        logger.info(f"流水线阶段耗时: {dag.timing_summary()}")
+        return results["parse"], results["graph"]
 
-查询：{query}
+    async def _llm_parse_query(self, query: str,
+                               on_field: Optional[Callable[[str, Any], None]] = None,
+                               context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        使用大模型解析查询，提供on_field时使用流式输出逐字段回调
+        
+        Args:
+            context: 多轮对话中上一轮的解析结果；提供时query是追问，返回合并后的完整解析结果
+        """
+        cache_key = query if context is None else json.dumps([query, context], ensure_ascii=False, sort_keys=True)
+        cached = self._cached_result("parse", None, cache_key)
+        if cached is not None:
+            logger.info("解析结果命中缓存")
+            return cached
+        
+        # 首轮查询可以与同一窗口内的其他查询合并为一次调用；追问带有上下文，单独解析
+        if context is None and self.parse_batcher is not None:
+            parsed_query = await self.parse_batcher.submit(query, on_field)
+        else:
+            parsed_query = await self._llm_complete_parse(query, on_field, context)
+        if parsed_query:
+            self._store_result("parse", None, cache_key, parsed_query)
+        return parsed_query
 
-请返回JSON格式：
-{{
-    "product_category": "手机",
+    def _parse_output_format(self) -> str:
+        """解析结果的JSON格式和注意事项（单条和批量解析共用）"""
+        category_options = "、".join(self.categories.keys())
+        return f"""{{
+    "product_category": "商品品类，只能是以下之一：{category_options}，无法判断时填{self.default_category}",
     "price_range": "价格范围（如：3000元左右、2000-3000元）",
     "user_groups": ["用户群体列表，如：学生、上班族、老年人、游戏玩家、摄影爱好者、商务人士"],
     "explicit_needs": ["明确提到的需求，如：续航、拍照、性能、大屏、护眼、轻薄、性价比"],
@@ -110,58 +526,94 @@ class KnowledgeGraphService:
 4. 隐含需求要合理推断，比如学生关注性价比和续航
 5. 必须返回有效的JSON格式
 """
+
+    async def _llm_complete_parse(self, query: str,
+                                  on_field: Optional[Callable[[str, Any], None]] = None,
+                                  context: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """单条查询的大模型解析（不经过缓存），提供on_field时使用流式输出逐字段回调"""
+        follow_up = ""
+        if context is not None:
+            follow_up = f"""
+这是多轮对话中的追问，上一轮的解析结果：
+{json.dumps(context, ensure_ascii=False)}
+请在上一轮的基础上返回更新后的完整结果：追问中新增的条件加入，明确要求去掉的条件删除，没有提到的条件保持不变。
+"""
+        prompt = f"""
+请分析以下购物查询，提取关键信息。请返回JSON格式，字段必须完全按照以下格式：
+
+查询：{query}
+{follow_up}
+请返回JSON格式：
+{self._parse_output_format()}"""
+        
+        return await self.llm_client.complete(
+            prompt, self._extract_parse_result, max_tokens=800, temperature=0.1, timeout=15.0,
+            on_field=on_field, priority=Priority.INTERACTIVE
+        )
+
+    async def _llm_parse_batch(self, queries: List[str]) -> Optional[List[Optional[Dict[str, Any]]]]:
+        """
+        一次调用解析多条查询，模型按顺序返回JSON数组
+        
+        Returns:
+            与queries一一对应的解析结果（校验失败的元素为None），数组整体无效时返回None
+        """
+        numbered = "\n".join(f"{index}. {' '.join(query.split())}" for index, query in enumerate(queries, 1))
+        prompt = f"""
+请分析以下{len(queries)}条购物查询，分别提取每条查询的关键信息。
+
+查询列表：
+{numbered}
+
+请返回JSON数组，数组长度必须为{len(queries)}，按查询列表的顺序排列，第i个元素是第i条查询的结果，每个元素的格式为：
+{self._parse_output_format()}"""
+        
+        return await self.llm_client.complete(
+            prompt, lambda content: self._extract_batch_parse_results(content, len(queries)),
+            max_tokens=300 * len(queries) + 200, temperature=0.1, timeout=15.0 + len(queries),
+            priority=Priority.INTERACTIVE
+        )
+
+    def _extract_batch_parse_results(self, content: str, count: int) -> Optional[List[Optional[Dict[str, Any]]]]:
+        """从大模型输出中提取批量解析结果，逐个元素校验"""
+        array_start = content.find('[')
+        array_end = content.rfind(']') + 1
+        if array_start < 0 or array_end <= array_start:
+            logger.warning("批量解析的返回中未找到JSON数组")
+            return None
         
         try:
-            async with httpx.AsyncClient(timeout=15.0) as client:
-                headers = {
-                    "Authorization": f"Bearer {self.llm_api_key}",
-                    "Content-Type": "application/json"
-                }
-                
-                data = {
-                    "model": self.llm_model,
-                    "messages": [{"role": "user", "content": prompt}],
-                    "max_tokens": 800,
-                    "temperature": 0.1
-                }
-                
-                response = await client.post(
-                    f"{self.llm_base_url}/chat/completions",
-                    headers=headers,
-                    json=data
-                )
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    content = result["choices"][0]["message"]["content"].strip()
-                    
-                    # 尝试提取JSON
-                    json_start = content.find('{')
-                    json_end = content.rfind('}') + 1
-                    if json_start >= 0 and json_end > json_start:
-                        json_str = content[json_start:json_end]
-                        parsed_result = json.loads(json_str)
-                        
-                        # 验证结果格式
-                        if self._validate_parse_result(parsed_result):
-                            logger.info(f"大模型解析成功: {parsed_result}")
-                            return parsed_result
-                        else:
-                            logger.warning("大模型返回格式不正确")
-                            return None
-                    else:
-                        logger.warning("大模型返回中未找到JSON")
-                        return None
-                else:
-                    logger.error(f"大模型API调用失败: {response.status_code}")
-                    return None
-                    
+            items = json.loads(content[array_start:array_end])
         except json.JSONDecodeError as e:
-            logger.error(f"大模型返回JSON解析失败: {e}")
+            logger.error(f"批量解析返回JSON解析失败: {e}")
             return None
-        except Exception as e:
-            logger.error(f"大模型API调用异常: {e}")
+        
+        if not isinstance(items, list) or len(items) != count:
+            logger.warning(f"批量解析返回的元素数量不符: 期望 {count} 个")
+            return None
+        return [item if isinstance(item, dict) and self._validate_parse_result(item) else None for item in items]
+
+    def _extract_parse_result(self, content: str) -> Optional[Dict[str, Any]]:
+        """从大模型输出中提取并校验解析结果"""
+        # 尝试提取JSON
+        json_start = content.find('{')
+        json_end = content.rfind('}') + 1
+        if json_start < 0 or json_end <= json_start:
+            logger.warning("大模型返回中未找到JSON")
+            return None
+        
+        try:
+            parsed_result = json.loads(content[json_start:json_end])
+        except json.JSONDecodeError as e:
+            logger.error(f"大模型返回JSON解析失败: {e}")
             return None
+        
+        # 验证结果格式
+        if isinstance(parsed_result, dict) and self._validate_parse_result(parsed_result):
+            logger.info(f"大模型解析成功: {parsed_result}")
+            return parsed_result
+        logger.warning("大模型返回格式不正确")
+        return None
 
     def _validate_parse_result(self, result: Dict[str, Any]) -> bool:
         """验证解析结果格式"""
@@ -187,7 +639,7 @@ class KnowledgeGraphService:
     def _simple_fallback_parse(self, query: str) -> Dict[str, Any]:
         """简单的降级解析（保底方案）"""
         result = {
-            "product_category": "手机",
+            "product_category": self.default_category,
             "price_range": "",
             "user_groups": [],
             "explicit_needs": [],
@@ -195,6 +647,12 @@ class KnowledgeGraphService:
             "usage_scenarios": []
         }
         
+        # 简单的品类识别
+        for category in self.categories:
+            if category in query:
+                result["product_category"] = category
+                break
+        
         # 简单的价格提取
         price_match = re.search(r'(\d+)元', query)
         if price_match:
@@ -219,109 +677,485 @@ class KnowledgeGraphService:
         
         return result
 
-    def query_graph(self, parsed_query: Dict[str, Any]) -> QueryResult:
-        """查询图谱数据，以品类为中心获取相关关系"""
+    def query_graph(self, parsed_query: Dict[str, Any],
+                    prefetched: Optional[Dict[Tuple[str, str, str], Dict[str, Any]]] = None,
+                    degrees: Optional[Iterable[int]] = None) -> Union[QueryResult, Dict[int, QueryResult]]:
+        """
+        查询图谱数据，以品类为中心获取相关关系
         
-        with self.driver.session() as session:
-            all_nodes = {}
-            all_relations = []
-            
-            # 1. 首先获取手机购物决策的核心关系
-            phone_relations = self._get_phone_category_relations(session)
-            all_nodes.update(phone_relations['nodes'])
-            all_relations.extend(phone_relations['relations'])
-            
-            # 2. 默认检索产品分类相关的关系
-            product_category = parsed_query.get("product_category", "手机")
-            if product_category:
-                category_relations = self._get_product_category_relations(session, product_category)
-                all_nodes.update(category_relations['nodes'])
-                all_relations.extend(category_relations['relations'])
-            
-            # 3. 获取用户群体相关的关系
-            for user_group in parsed_query.get("user_groups", []):
-                user_group_name = self._map_user_group(user_group)
-                if user_group_name:
-                    user_relations = self._get_node_relations(session, user_group_name)
-                    all_nodes.update(user_relations['nodes'])
-                    all_relations.extend(user_relations['relations'])
+        Args:
+            parsed_query: 解析后的查询
+            prefetched: 已提前检索的种子节点关系，键为 (种子类型, 品类, 名称)
+            degrees: 需要对比的度数集合（1-3）。提供时只遍历一次到最大度数，
+                按关系记录的度数过滤出各度数的结果
             
-            # 4. 获取明确需求相关的关系
-            for need in parsed_query.get("explicit_needs", []):
-                need_nodes = self._find_need_nodes(session, need)
-                for need_node in need_nodes:
-                    need_relations = self._get_node_relations(session, need_node)
-                    all_nodes.update(need_relations['nodes'])
-                    all_relations.extend(need_relations['relations'])
+        Returns:
+            图谱查询结果；提供degrees时返回 {度数: 图谱查询结果}
+        """
+        
+        category = self._resolve_category(parsed_query)
+        if degrees is not None:
+            return self._query_graph_degrees(parsed_query, category, degrees)
+        prefetched = prefetched or {}
+        
+        # 品类快照按需加载，核心决策子图和品类相关关系已预先计算
+        snapshot = self._get_category_snapshot(category)
+        
+        seed_results = {}
+        ranking = self._relevance_ranking(parsed_query)
+        with self._read_session() as session:
+            for seed_key in self._seed_keys(parsed_query, snapshot):
+                seed_relations = prefetched.get(seed_key)
+                if seed_relations is None:
+                    seed_relations = self._get_seed_relations(session, snapshot, *seed_key, ranking=ranking)
+                seed_results[seed_key] = seed_relations
+        
+        return self._assemble_query_result(snapshot, parsed_query, seed_results)
+    
+    def _query_graph_degrees(self, parsed_query: Dict[str, Any], category: str,
+                             degrees: Iterable[int]) -> Dict[int, QueryResult]:
+        """一次遍历到最大度数，再按度数切分出各度数的结果"""
+        degrees = sorted(set(degrees))
+        if not degrees or degrees[0] < 1 or degrees[-1] > 3:
+            raise ValueError(f"度数必须在1-3之间: {degrees}")
+        
+        snapshot = self._get_category_snapshot(category)
+        seed_results = {}
+        with self._read_session() as session:
+            for seed_key in self._seed_keys(parsed_query, snapshot):
+                seed_results[seed_key] = self._get_seed_relations(session, snapshot, *seed_key,
+                                                                  degree=degrees[-1])
+        # 每个度数的视图都由按度数切分后的种子关系重新组装，预算档位的去重和截取与单独按该度数查询时看到的节点一致
+        return {
+            degree: self._assemble_query_result(
+                snapshot, parsed_query,
+                {seed_key: self._slice_seed_relations(seed_relations, degree)
+                 for seed_key, seed_relations in seed_results.items()},
+                degree
+            )
+            for degree in degrees
+        }
+    
+    def _slice_seed_relations(self, seed_relations: Dict[str, Any], degree: int) -> Dict[str, Any]:
+        """
+        从最大度数的种子关系中切分出指定度数的种子关系
+        
+        种子关系按度数由低到高排列，每个中心节点保留度数不超过degree的前N条
+        （N与单独按该度数查询时的LIMIT一致）
+        """
+        limit = self._degree_limit(degree)
+        kept_per_center: Dict[str, int] = {}
+        relations = []
+        for relation in seed_relations['relations']:
+            if relation.degree > degree:
+                continue
+            kept = kept_per_center.get(relation.from_node, 0)
+            if self.adaptive_degree or kept < limit:
+                kept_per_center[relation.from_node] = kept + 1
+                relations.append(relation)
+        
+        centers = {relation.from_node for relation in seed_relations['relations']}
+        kept_names = centers | {name for relation in relations for name in (relation.from_node, relation.to_node)}
+        return {
+            "nodes": {node_id: node for node_id, node in seed_relations['nodes'].items() if node.name in kept_names},
+            "relations": relations,
+            "degree": min(seed_relations.get('degree', 0), degree)
+        }
+    
+    def _degree_limit(self, degree: int) -> int:
+        """单个节点按度数查询时的关系数上限"""
+        return {1: 10, 2: 15}.get(degree, 20)
+    
+    def _assemble_query_result(self, snapshot: CategorySnapshot, parsed_query: Dict[str, Any],
+                               seed_results: Dict[Tuple[str, str, str], Dict[str, Any]],
+                               degree: Optional[int] = None) -> QueryResult:
+        """合并品类核心关系和各种子节点关系，degree为多度数对比时该视图的度数"""
+        all_nodes = {}
+        all_relations = []
+        
+        # 1. 首先获取品类购物决策的核心关系
+        core_relations = self._get_category_core_relations(snapshot, degree)
+        all_nodes.update(core_relations['nodes'])
+        all_relations.extend(core_relations['relations'])
+        
+        # 2. 默认检索产品分类相关的关系
+        all_nodes.update(snapshot.product_relations['nodes'])
+        all_relations.extend(snapshot.product_relations['relations'])
+        
+        # 3. 用户群体、明确需求和预算档位相关的关系
+        band_weights = self._price_band_weights(parsed_query, snapshot)
+        top_weight = max(band_weights.values(), default=1.0)
+        seed_degrees = {}
+        seed_relation_lists = []
+        for seed_key in self._seed_keys(parsed_query, snapshot):
+            seed_relations = seed_results.get(seed_key)
+            if seed_relations:
+                relations = seed_relations['relations']
+                if seed_key[0] == "price_band":
+                    # 档位种子只补充尚未出现的直接关系（典型配置等），按重叠比例保留，重叠最多的档位保留全部；
+                    # 二度以上会经由预算范围扩散到其他档位，对价格约束没有帮助
+                    present = {node.name for node in all_nodes.values()}
+                    relations = [relation for relation in relations
+                                 if relation.degree <= 1 and relation.to_node not in present]
+                    keep = math.ceil(len(relations) * band_weights[seed_key[2]] / top_weight)
+                    relations = relations[:keep]
+                    kept_names = {name for relation in relations for name in (relation.from_node, relation.to_node)}
+                    all_nodes.update({node_id: node for node_id, node in seed_relations['nodes'].items()
+                                      if node.name in kept_names})
+                else:
+                    all_nodes.update(seed_relations['nodes'])
+                seed_relation_lists.append(relations)
+                seed_degrees[seed_key[2]] = seed_relations.get('degree', 0)
+        
+        if self.adaptive_degree:
+            all_relations.extend(self._apply_global_budget(seed_relation_lists, self.adaptive_degree.global_budget))
+        else:
+            for relations in seed_relation_lists:
+                all_relations.extend(relations)
+        
+        # 4. 有价格约束时排除不相关的预算档位，以及经由这些档位才到达的关系
+        if band_weights:
+            excluded = snapshot.price_index().band_names - set(band_weights)
+            all_relations = [relation for relation in all_relations
+                             if relation.from_node not in excluded and relation.to_node not in excluded
+                             and relation.via not in excluded]
+            all_nodes = {node_id: node for node_id, node in all_nodes.items() if node.name not in excluded}
         
         return QueryResult(
             nodes=list(all_nodes.values()),
             relations=all_relations,
-            context=""
+            context="",
+            seed_degrees=seed_degrees
         )
     
-    def _get_phone_category_relations(self, session) -> Dict[str, Any]:
-        """获取手机品类相关的核心关系"""
+    def _apply_global_budget(self, seed_relation_lists: List[List[GraphRelation]],
+                             budget: int) -> List[GraphRelation]:
+        """
+        在全部种子之间轮流选取关系，直到达到全局预算
+        
+        每个种子的关系按扩展的先后（度数由低到高）排列，轮流选取相当于全局广度优先，
+        预算不足时优先舍弃各种子的远端关系
+        """
+        selected = []
+        position = 0
+        while len(selected) < budget:
+            progressed = False
+            for relations in seed_relation_lists:
+                if position < len(relations) and len(selected) < budget:
+                    selected.append(relations[position])
+                    progressed = True
+            if not progressed:
+                break
+            position += 1
+        return selected
+    
+    def _seed_keys(self, parsed_query: Dict[str, Any], snapshot: CategorySnapshot) -> List[Tuple[str, str, str]]:
+        """查询中的种子节点：先用户群体，后明确需求，最后是与价格范围重叠的预算档位（只做计算，不访问图谱）"""
+        category = snapshot.category
+        seed_keys = []
+        for user_group in parsed_query.get("user_groups", []):
+            seed_keys.append(("user_group", category, user_group))
+        for need in parsed_query.get("explicit_needs", []):
+            seed_keys.append(("need", category, need))
+        for band in self._price_band_weights(parsed_query, snapshot):
+            seed_keys.append(("price_band", category, band))
+        return list(dict.fromkeys(seed_keys))
+    
+    def _price_band_weights(self, parsed_query: Dict[str, Any], snapshot: CategorySnapshot) -> Dict[str, float]:
+        """解析出的价格范围所覆盖的预算档位及其权重（重叠比例），无法识别价格时为空"""
+        price_range = parsed_query.get("price_range")
+        interval = parse_price_range(price_range) if isinstance(price_range, str) else None
+        if interval is None:
+            return {}
+        return snapshot.price_index().weights(interval)
+    
+    def _get_seed_relations(self, session, snapshot: CategorySnapshot, kind: str,
+                            category: str, name: str, degree: Optional[int] = None,
+                            ranking: Optional[RelevanceRanking] = None) -> Dict[str, Any]:
+        """获取单个种子节点的关系，degree和ranking见 _get_node_relations；预算档位种子直接以档位因子为中心"""
+        if degree is None and ranking is None:
+            answers = self._get_materialized_answers(snapshot)
+            if answers is not None:
+                materialized = answers.get_seed_relations(kind, name)
+                if materialized is not None:
+                    return self._seed_relations_from_dict(materialized)
+        if kind == "user_group":
+            return self._get_user_group_relations(session, name, category, degree, ranking)
+        if kind == "price_band":
+            return self._get_node_relations(session, name, category, degree, ranking)
+        return self._get_need_relations(session, snapshot, name, category, degree, ranking)
+    
+    def _get_user_group_relations(self, session, user_group: str, category: str,
+                                  degree: Optional[int] = None,
+                                  ranking: Optional[RelevanceRanking] = None) -> Dict[str, Any]:
+        """获取用户群体种子节点的关系"""
+        user_group_name = self._map_user_group(user_group)
+        if not user_group_name:
+            return {"nodes": {}, "relations": []}
+        return self._get_node_relations(session, user_group_name, category, degree, ranking)
+    
+    def _get_need_relations(self, session, snapshot: CategorySnapshot, need: str,
+                            category: str, degree: Optional[int] = None,
+                            ranking: Optional[RelevanceRanking] = None) -> Dict[str, Any]:
+        """获取明确需求匹配到的所有节点的关系"""
         nodes = {}
         relations = []
+        used_degree = 0
+        for need_node in self._find_need_nodes(snapshot, need):
+            need_relations = self._get_node_relations(session, need_node, category, degree, ranking)
+            nodes.update(need_relations['nodes'])
+            relations.extend(need_relations['relations'])
+            used_degree = max(used_degree, need_relations.get('degree', 0))
+        return {"nodes": nodes, "relations": relations, "degree": used_degree}
+    
+    def _get_materialized_answers(self, snapshot: CategorySnapshot) -> Optional[MaterializedAnswers]:
+        """品类的预计算结果，仅当与当前图谱版本和度数配置一致时可用"""
+        if self.materialized_answers is None or self.adaptive_degree or snapshot.graph_version is None:
+            return None
+        answers = self.materialized_answers.get(snapshot.category)
+        if answers is None:
+            return None
+        if answers.graph_version != snapshot.graph_version or answers.max_degree != self.max_degree:
+            logger.debug(f"预计算结果已过期: 图谱版本 {answers.graph_version}/{snapshot.graph_version}, "
+                         f"度数 {answers.max_degree}/{self.max_degree}")
+            return None
+        return answers
+    
+    def _seed_relations_to_dict(self, seed_relations: Dict[str, Any]) -> Dict[str, Any]:
+        """将种子关系转换为可JSON序列化的字典"""
+        return {
+            "nodes": {node_id: asdict(node) for node_id, node in seed_relations["nodes"].items()},
+            "relations": [asdict(relation) for relation in seed_relations["relations"]],
+            "degree": seed_relations.get("degree", 0)
+        }
+    
+    def _seed_relations_from_dict(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """从预计算的字典还原种子关系"""
+        return {
+            "nodes": {node_id: GraphNode(**node) for node_id, node in data["nodes"].items()},
+            "relations": [GraphRelation(**relation) for relation in data["relations"]],
+            "degree": data.get("degree", 0)
+        }
+    
+    def _fetch_seed_relations(self, kind: str, category: str, name: str,
+                              ranking: Optional[RelevanceRanking] = None) -> Dict[str, Any]:
+        """使用独立会话检索单个种子节点的关系，可在后台线程中运行"""
+        snapshot = self._get_category_snapshot(category)
+        with self._read_session() as session:
+            return self._get_seed_relations(session, snapshot, kind, category, name, ranking=ranking)
+    
+    def _relevance_ranking(self, parsed_query: Dict[str, Any]) -> Optional[RelevanceRanking]:
+        """排序检索模式下查询的打分规则，未启用时为None"""
+        if not self.ranked_retrieval:
+            return None
+        return RelevanceRanking.from_parsed_query(parsed_query, self._resolve_category(parsed_query))
+    
+    def _resolve_category(self, parsed_query: Dict[str, Any]) -> str:
+        """确定查询所属品类，未知品类回退到默认品类"""
+        category = parsed_query.get("product_category") or self.default_category
+        if category not in self.categories:
+            logger.warning(f"未配置的品类: {category}，使用默认品类 {self.default_category}")
+            category = self.default_category
+        return category
+    
+    def _get_category_snapshot(self, category: str, revalidate: bool = True) -> CategorySnapshot:
+        """
+        获取品类快照，冷品类在首次使用时加载，图谱重新导入或重新编译后重新加载
         
-        # 根据度数配置调整查询限制
-        limit = 30 if self.max_degree <= 2 else 50
+        Args:
+            revalidate: 是否按 GRAPH_VERSION_CHECK_INTERVAL 确认图谱版本（需要访问图谱）；
+                在事件循环中读取本次请求已加载的快照时传False
+        """
+        snapshot = self.snapshot_cache.get(category, self._load_category_snapshot)
+        if revalidate and self._snapshot_outdated(snapshot):
+            logger.info(f"品类 {category} 的图谱版本已变化，重新加载快照")
+            self.snapshot_cache.invalidate(category)
+            snapshot = self.snapshot_cache.get(category, self._load_category_snapshot)
+        return snapshot
+    
+    def _snapshot_outdated(self, snapshot: CategorySnapshot) -> bool:
+        """按 GRAPH_VERSION_CHECK_INTERVAL 节流，确认快照的图谱版本是否仍是当前版本"""
+        now = time.monotonic()
+        if now - snapshot.checked_at < self.graph_version_check_interval:
+            return False
+        snapshot.checked_at = now
+        try:
+            current = self._current_graph_version(snapshot.category, snapshot.root_name)
+        except Exception as e:
+            logger.warning(f"确认品类 {snapshot.category} 的图谱版本失败，继续使用当前快照: {e}")
+            return False
+        return current != snapshot.graph_version
+    
+    def _current_graph_version(self, category: str, root_name: str) -> Optional[str]:
+        """图谱当前的版本：编译图谱的内容哈希，或Neo4j根节点上的导入版本"""
+        graph = self.graph_artifacts.get(category)
+        if graph is not None:
+            return graph.version
+        with self._read_session() as session:
+            return self._neo4j_graph_version(session, category, root_name)
+    
+    def _neo4j_graph_version(self, session, category: str, root_name: str) -> Optional[str]:
+        """导入器写在品类根节点上的导入版本，没有时（导入器写入版本之前的数据）为None"""
+        rows = self._run_query(session, "category_graph_version", category=category, root_name=root_name)
+        version = rows[0][0] if rows else None
+        return f"neo4j:{version}" if version else None
+    
+    def _load_category_snapshot(self, category: str) -> CategorySnapshot:
+        """从数据库加载品类的核心决策子图、品类相关关系和因子名称表"""
+        root_name = self.categories[category].root_name
+        
+        graph = self.graph_artifacts.get(category)
+        if graph is not None:
+            return self._load_snapshot_from_artifact(graph, category, root_name)
+        
+        with self._read_session() as session:
+            # 先读版本再读数据：读取期间发生的导入会在下次确认版本时重新加载
+            graph_version = self._neo4j_graph_version(session, category, root_name)
+            rows = self._run_query(session, "category_core", root_name=root_name, category=category)
+            core_rows = [
+                (
+                    self._projected_node(root_id, decision_name, "Decision", category),
+                    self._projected_node(stage_id, stage_name, "Stage", category),
+                    self._projected_node(factor_id, factor_name, "Factor", category)
+                )
+                for root_id, decision_name, stage_id, stage_name, factor_id, factor_name in rows
+            ]
+            
+            rows = self._run_query(session, "category_factor_names", category=category)
+            factor_names = [name for name, in rows]
+            
+            # 品类相关关系与具体查询无关，随快照一起预先计算
+            product_relations = self._get_product_category_relations(session, category)
         
-        # 查询手机购物决策的主要阶段和因子
-        query_cypher = f"""
-        MATCH (root:Decision {{name: "手机购物决策"}})-[:INCLUDES]->(stage:Stage)-[:CONTAINS]->(factor:Factor)
-        RETURN root, stage, factor
-        LIMIT {limit}
+        return CategorySnapshot(
+            category=category,
+            root_name=root_name,
+            core_rows=core_rows,
+            factor_names=factor_names,
+            product_relations=product_relations,
+            graph_version=graph_version
+        )
+    
+    def _load_snapshot_from_artifact(self, graph: CompiledGraph, category: str, root_name: str) -> CategorySnapshot:
+        """从编译图谱构建品类快照"""
+        core_rows = []
+        root = graph.find(root_name)
+        if root is not None:
+            for stage, rel_type in graph.out_edges(root):
+                if rel_type != "INCLUDES" or graph.label(stage) != "Stage":
+                    continue
+                for factor, factor_rel in graph.out_edges(stage):
+                    if factor_rel == "CONTAINS" and graph.label(factor) == "Factor":
+                        core_rows.append((
+                            self._artifact_node(graph, root),
+                            self._artifact_node(graph, stage),
+                            self._artifact_node(graph, factor)
+                        ))
+        
+        factor_nodes = list(graph.nodes_with_label("Factor"))
+        
+        # 与 category_product_relations 查询一致：相关因子及其一度关系，最多50行
+        nodes = {}
+        relations = []
+        rows = 0
+        for factor in factor_nodes:
+            name = graph.name(factor)
+            if name not in PRODUCT_CATEGORY_FACTORS and category not in name:
+                continue
+            factor_node = self._artifact_node(graph, factor)
+            nodes[factor_node.id] = factor_node
+            neighbors = list(graph.neighbors(factor)) or [None]
+            for neighbor in neighbors:
+                if rows >= 50:
+                    break
+                rows += 1
+                if neighbor is not None:
+                    related_node = self._artifact_node(graph, neighbor[0])
+                    nodes[related_node.id] = related_node
+                    relations.append(GraphRelation(
+                        from_node=factor_node.name,
+                        to_node=related_node.name,
+                        relation_type=self._simplify_relation_type(neighbor[1]),
+                        properties={}
+                    ))
+            if rows >= 50:
+                break
+        
+        return CategorySnapshot(
+            category=category,
+            root_name=root_name,
+            core_rows=core_rows,
+            factor_names=[graph.name(factor) for factor in factor_nodes],
+            product_relations={"nodes": nodes, "relations": relations},
+            graph_version=graph.version
+        )
+    
+    def _artifact_node(self, graph: CompiledGraph, index: int) -> GraphNode:
+        """将编译图谱中的节点转换为图谱节点"""
+        name = graph.name(index)
+        return GraphNode(
+            id=f"{graph.version}:{index}",
+            name=name,
+            labels=[graph.label(index)],
+            properties={"name": name, "category": graph.meta.get("category")}
+        )
+    
+    def _run_query(self, session, query_name: str, **params) -> List[List[Any]]:
         """
+        在托管读事务中按名称执行注册表中的查询，所有取值都以参数传入
         
-        result = session.run(query_cypher)
+        瞬时错误（死锁、切主、集群成员不可用）由驱动在 NEO4J_MAX_RETRY_TIME 内自动重试，
+        因此结果必须在事务函数内全部取回
+        
+        Returns:
+            全部行，每行按查询RETURN的列顺序排列
+        """
+        query = get_query(query_name).text
+        return session.execute_read(lambda tx: tx.run(query, params).values())
+    
+    def _projected_node(self, node_id: str, name: Optional[str], label: Optional[str], category: str) -> GraphNode:
+        """
+        由查询投影出的字段构造图谱节点
+        
+        节点只有name和category两个属性，与编译图谱节点的属性一致，不需要取回完整的Node对象
+        """
+        name = name or ""
+        return GraphNode(
+            id=node_id,
+            name=name,
+            labels=[label] if label else [],
+            properties={"name": name, "category": category}
+        )
+    
+    def _get_category_core_relations(self, snapshot: CategorySnapshot,
+                                     degree: Optional[int] = None) -> Dict[str, Any]:
+        """获取品类相关的核心关系（来自品类快照），degree为结果对应的度数，默认为实例的max_degree"""
+        nodes = {}
+        relations = []
         
-        for record in result:
-            root = record["root"]
-            stage = record["stage"]  
-            factor = record["factor"]
+        # 根据度数配置调整查询限制
+        limit = 30 if (degree or self.max_degree) <= 2 else 50
+        
+        for root_node, stage_node, factor_node in snapshot.core_rows[:limit]:
+            nodes[root_node.id] = root_node
+            nodes[stage_node.id] = stage_node
+            nodes[factor_node.id] = factor_node
             
-            if root and stage and factor:
-                # 添加节点
-                root_node = GraphNode(
-                    id=str(root.element_id),
-                    name=root.get('name', ''),
-                    labels=list(root.labels),
-                    properties=dict(root)
-                )
-                stage_node = GraphNode(
-                    id=str(stage.element_id),
-                    name=stage.get('name', ''),
-                    labels=list(stage.labels),
-                    properties=dict(stage)
-                )
-                factor_node = GraphNode(
-                    id=str(factor.element_id),
-                    name=factor.get('name', ''),
-                    labels=list(factor.labels),
-                    properties=dict(factor)
-                )
-                
-                nodes[root_node.id] = root_node
-                nodes[stage_node.id] = stage_node
-                nodes[factor_node.id] = factor_node
-                
-                # 添加关系
-                relation1 = GraphRelation(
-                    from_node="手机",
-                    to_node=stage_node.name,
-                    relation_type="需要关注",
-                    properties={}
-                )
-                relation2 = GraphRelation(
-                    from_node=stage_node.name,
-                    to_node=factor_node.name,
-                    relation_type="涉及",
-                    properties={}
-                )
-                
-                relations.extend([relation1, relation2])
+            # 添加关系
+            relation1 = GraphRelation(
+                from_node=snapshot.category,
+                to_node=stage_node.name,
+                relation_type="需要关注",
+                properties={}
+            )
+            relation2 = GraphRelation(
+                from_node=stage_node.name,
+                to_node=factor_node.name,
+                relation_type="涉及",
+                properties={}
+            )
+            
+            relations.extend([relation1, relation2])
         
         return {"nodes": nodes, "relations": relations}
     
@@ -330,127 +1164,325 @@ class KnowledgeGraphService:
         nodes = {}
         relations = []
         
-        # 查询与产品分类相关的所有Factor节点（如：手机相关的品牌、型号等）
-        query_cypher = f"""
-        MATCH (factor:Factor)
-        WHERE factor.name CONTAINS '{product_category}' 
-           OR factor.name IN ['品牌知名度', '品牌口碑', '技术实力', '生态系统', 
-                              '处理器性能', '内存配置', '存储容量', '系统优化',
-                              '价格区间', '性价比', '优惠活动', '购买时机']
-        OPTIONAL MATCH (factor)-[r]-(related)
-        RETURN factor, r, related
-        LIMIT 50
-        """
-        
-        result = session.run(query_cypher)
+        # 查询与产品分类相关的所有Factor节点（如：手机相关的品牌、型号等），仅限该品类分区
+        rows = self._run_query(
+            session, "category_product_relations",
+            category=product_category, factor_names=PRODUCT_CATEGORY_FACTORS, limit=50
+        )
         
-        for record in result:
-            factor = record["factor"]
-            rel = record.get("r")
-            related = record.get("related")
+        for factor_id, factor_name, rel_type, related_id, related_name, related_label in rows:
+            # 添加产品分类相关的Factor节点
+            factor_node = self._projected_node(factor_id, factor_name, "Factor", product_category)
+            nodes[factor_node.id] = factor_node
             
-            if factor:
-                # 添加产品分类相关的Factor节点
-                factor_node = GraphNode(
-                    id=str(factor.element_id),
-                    name=factor.get('name', ''),
-                    labels=list(factor.labels),
-                    properties=dict(factor)
-                )
-                nodes[factor_node.id] = factor_node
+            # 添加相关节点和关系（OPTIONAL MATCH未匹配时为空）
+            if rel_type and related_id:
+                related_node = self._projected_node(related_id, related_name, related_label, product_category)
+                nodes[related_node.id] = related_node
                 
-                # 添加相关节点和关系
-                if rel and related:
-                    related_node = GraphNode(
-                        id=str(related.element_id),
-                        name=related.get('name', ''),
-                        labels=list(related.labels),
-                        properties=dict(related)
-                    )
-                    nodes[related_node.id] = related_node
-                    
-                    relation = GraphRelation(
-                        source=factor_node.id,
-                        target=related_node.id,
-                        type=rel.type,
-                        properties=dict(rel)
-                    )
-                    relations.append(relation)
+                relation = GraphRelation(
+                    from_node=factor_node.name,
+                    to_node=related_node.name,
+                    relation_type=self._simplify_relation_type(rel_type),
+                    properties={}
+                )
+                relations.append(relation)
         
         return {"nodes": nodes, "relations": relations}
     
-    def _get_node_relations(self, session, node_name: str) -> Dict[str, Any]:
-        """获取特定节点的多度关系"""
+    def _get_node_relations(self, session, node_name: str, category: str,
+                            degree: Optional[int] = None,
+                            ranking: Optional[RelevanceRanking] = None) -> Dict[str, Any]:
+        """
+        获取特定节点在品类分区内的多度关系（经过种子关系缓存）
+        
+        Args:
+            degree: 多度数对比时的遍历度数，未提供时使用实例的max_degree；
+                结果总是按度数由低到高截取，供 _slice_seed_relations 切分出与单独查询相同的低度数视图
+            ranking: 排序检索的打分规则；提供时（且未指定degree）只取回相关性分数最高的top_k条关系
+        """
+        if degree is not None or self.adaptive_degree:
+            ranking = None
+        # 以该节点为中心的打分参数相同的查询共享缓存条目
+        ranking_key = json.dumps(ranking.cypher_params(node_name), ensure_ascii=False) if ranking else None
+        key = (node_name, degree or self.max_degree, degree is not None, ranking_key)
+        return self.seed_cache.get(
+            category, self._graph_version(category), key,
+            lambda: self._load_node_relations_shared(session, node_name, category, degree, ranking)
+        )
+    
+    def _load_node_relations_shared(self, session, node_name: str, category: str,
+                                    degree: Optional[int] = None,
+                                    ranking: Optional[RelevanceRanking] = None) -> Dict[str, Any]:
+        """先查多进程共享缓存，未命中时查询图谱并写入共享缓存"""
+        if self.shared_cache is None:
+            return self._load_node_relations(session, node_name, category, degree, ranking)
+        
+        _, shared_version, ttl = self._result_versions(category)
+        adaptive = asdict(self.adaptive_degree) if self.adaptive_degree else None
+        ranked = ranking.cypher_params(node_name) if ranking else None
+        key = json.dumps([node_name, degree or self.max_degree, degree is not None, adaptive, ranked],
+                         ensure_ascii=False)
+        cached = self.shared_cache.get(f"seed:{category}", shared_version, key)
+        if cached is not None:
+            return self._seed_relations_from_dict(cached)
+        
+        seed_relations = self._load_node_relations(session, node_name, category, degree, ranking)
+        self.shared_cache.put(f"seed:{category}", shared_version, key,
+                              self._seed_relations_to_dict(seed_relations), ttl)
+        return seed_relations
+    
+    def _result_versions(self, category: Optional[str]) -> Tuple[str, str, Optional[float]]:
+        """
+        缓存条目的版本
+        
+        Returns:
+            (进程内缓存版本, 共享缓存版本, 共享条目存活时间)；category为None时为解析结果的版本
+        """
+        if category is None:
+            return self._parse_version, self._parse_version, None
+        # 剪枝结果的缓存在事件循环中读写，使用本次请求已加载的快照，不确认图谱版本
+        snapshot = self._get_category_snapshot(category, revalidate=False)
+        if snapshot.graph_version:
+            return snapshot.graph_version, snapshot.graph_version, None
+        # 没有导入版本时快照加载时刻只在本进程内有意义，共享条目改为按时间过期
+        return self._snapshot_version(snapshot), "neo4j", self.shared_cache_ttl
+    
+    def _cached_result(self, partition: str, category: Optional[str], key: str) -> Optional[Any]:
+        """依次查询进程内缓存和共享缓存，共享缓存命中时回填进程内缓存"""
+        version, shared_version, _ = self._result_versions(category)
+        value = self.result_cache.lookup(partition, version, key)
+        if value is None and self.shared_cache is not None:
+            value = self.shared_cache.get(partition, shared_version, key)
+            if value is not None:
+                self.result_cache.put(partition, version, key, value)
+        return value
+    
+    def _store_result(self, partition: str, category: Optional[str], key: str, value: Any):
+        """写入进程内缓存和共享缓存"""
+        version, shared_version, ttl = self._result_versions(category)
+        self.result_cache.put(partition, version, key, value)
+        if self.shared_cache is not None:
+            self.shared_cache.put(partition, shared_version, key, value, ttl)
+    
+    def _graph_version(self, category: str) -> str:
+        """
+        品类当前的图谱版本
+        
+        编译图谱使用内容哈希，Neo4j使用导入器写在根节点上的导入版本；
+        没有导入版本的旧数据以品类快照的加载时刻代替，快照重新加载即视为新版本
+        """
+        return self._snapshot_version(self._get_category_snapshot(category))
+    
+    def _snapshot_version(self, snapshot: CategorySnapshot) -> str:
+        """快照对应的图谱版本，见 _graph_version"""
+        return snapshot.graph_version or f"neo4j@{snapshot.loaded_at:.6f}"
+    
+    def _seed_relations_size(self, seed_relations: Dict[str, Any]) -> int:
+        """估算种子关系占用的字节数（按JSON序列化后的长度）"""
+        return len(json.dumps(self._seed_relations_to_dict(seed_relations), ensure_ascii=False).encode("utf-8"))
+    
+    def _load_node_relations(self, session, node_name: str, category: str,
+                             degree: Optional[int] = None,
+                             ranking: Optional[RelevanceRanking] = None) -> Dict[str, Any]:
+        """从编译图谱或Neo4j查询节点的多度关系，参数见 _get_node_relations"""
         nodes = {}
         relations = []
         
-        # 根据max_degree构建不同的查询
-        if self.max_degree == 1:
-            query_cypher = """
-            MATCH (center {name: $node_name})-[r]-(neighbor)
-            RETURN center, r, neighbor, 1 as degree
-            LIMIT 10
-            """
-        elif self.max_degree == 2:
-            query_cypher = """
-            MATCH p = (center {name: $node_name})-[*1..2]-(neighbor)
-            WHERE length(p) <= 2
-            WITH center, relationships(p)[-1] as r, neighbor, length(p) as degree
-            RETURN DISTINCT center, r, neighbor, degree
-            LIMIT 15
-            """
+        if self.adaptive_degree:
+            return self._get_adaptive_node_relations(session, node_name, category)
+        
+        max_degree = degree or self.max_degree
+        graph = self.graph_artifacts.get(category)
+        if graph is not None:
+            return self._get_node_relations_from_artifact(graph, node_name, max_degree, ranking=ranking)
+        
+        # 根据max_degree选择不同的查询，路径上的节点都必须属于同一品类
+        params = {"node_name": node_name, "category": category, "limit": self._degree_limit(max_degree)}
+        if ranking is not None:
+            # 打分和截取在数据库中完成，只传输分数最高的top_k行
+            query_name = "node_relations_ranked"
+            params = {"node_name": node_name, "category": category, "max_degree": max_degree,
+                      **ranking.cypher_params(node_name)}
+        elif degree is not None:
+            query_name = "node_relations_by_degree"
+            params["max_degree"] = max_degree
+        elif max_degree == 1:
+            query_name = "node_relations_degree1"
+        elif max_degree == 2:
+            query_name = "node_relations_degree2"
         else:  # max_degree >= 3
-            query_cypher = """
-            MATCH p = (center {name: $node_name})-[*1..3]-(neighbor)
-            WHERE length(p) <= $max_degree
-            WITH center, relationships(p)[-1] as r, neighbor, length(p) as degree
-            RETURN DISTINCT center, r, neighbor, degree
-            LIMIT 20
-            """
+            query_name = "node_relations_degree3"
+            params["max_degree"] = max_degree
         
         # 执行查询
-        params = {"node_name": node_name}
-        if self.max_degree >= 3:
-            params["max_degree"] = self.max_degree
+        rows = self._run_query(session, query_name, **params)
+        
+        center_node = None
+        # 排序查询在末尾多返回一列分数，这里不需要
+        for row in rows:
+            center_id, neighbor_id, neighbor_name, neighbor_label, rel_type, relation_degree, via = row[:7]
+            # 添加节点（中心节点即种子节点，每行相同）
+            if center_node is None:
+                center_node = self._projected_node(center_id, node_name, "Factor", category)
+                nodes[center_node.id] = center_node
+            neighbor_node = self._projected_node(neighbor_id, neighbor_name, neighbor_label, category)
+            nodes[neighbor_node.id] = neighbor_node
             
-        result = session.run(query_cypher, **params)
+            # 添加关系（包含度数信息）
+            relation_name = self._simplify_relation_type(rel_type)
+            relation = GraphRelation(
+                from_node=center_node.name,
+                to_node=neighbor_node.name,
+                relation_type=f"{relation_name}({relation_degree}度)",
+                properties={},
+                degree=relation_degree,
+                via=via or center_node.name
+            )
+            relations.append(relation)
+        
+        logger.info(f"节点 {node_name} 的 {max_degree} 度关系: {len(relations)} 个关系")
+        return {"nodes": nodes, "relations": relations, "degree": max_degree if relations else 0}
+    
+    def _get_node_relations_from_artifact(self, graph: CompiledGraph, node_name: str, max_degree: int,
+                                          ranking: Optional[RelevanceRanking] = None) -> Dict[str, Any]:
+        """在编译图谱上展开节点的多度关系，行数限制和排序与Cypher查询一致（先按度数由低到高排序再截取）"""
+        nodes = {}
+        relations = []
+        
+        center = graph.find(node_name)
+        if center is not None and graph.label(center) == "Factor":
+            center_node = self._artifact_node(graph, center)
+            if ranking is not None:
+                # 与 node_relations_ranked 一致：全部路径打分，按分数、度数、名称排序取top_k
+                scored = []
+                for row in graph.expand(center, max_degree, None, shallow_first=True):
+                    name = graph.name(row[1])
+                    score = ranking.score(name, node_name)
+                    if score > 0:
+                        scored.append(((-score, row[2], name), row))
+                scored.sort(key=lambda item: item[0])
+                rows = [row for _, row in scored[:ranking.top_k(node_name)]]
+            else:
+                rows = graph.expand(center, max_degree, self._degree_limit(max_degree), shallow_first=True)
+            for rel_type, neighbor, degree, via in rows:
+                neighbor_node = self._artifact_node(graph, neighbor)
+                nodes[center_node.id] = center_node
+                nodes[neighbor_node.id] = neighbor_node
+                relations.append(GraphRelation(
+                    from_node=center_node.name,
+                    to_node=neighbor_node.name,
+                    relation_type=f"{self._simplify_relation_type(rel_type)}({degree}度)",
+                    properties={},
+                    degree=degree,
+                    via=graph.name(via)
+                ))
+        
+        logger.info(f"节点 {node_name} 的 {max_degree} 度关系: {len(relations)} 个关系（编译图谱）")
+        return {"nodes": nodes, "relations": relations, "degree": max_degree if relations else 0}
+    
+    def _get_adaptive_node_relations(self, session, node_name: str, category: str) -> Dict[str, Any]:
+        """
+        自适应度数：从种子节点逐跳广度优先扩展
+        
+        每一跳只扩展上一跳新发现的节点；达到单种子预算、最大度数，或某一跳新增节点数
+        低于阈值时停止。稀疏种子会扩展得更远，稠密种子在较低度数就用完预算
         
-        for record in result:
-            center = record["center"]
-            r = record["r"]
-            neighbor = record["neighbor"]
-            degree = record.get("degree", 1)
+        Returns:
+            节点、关系（按度数由低到高排列）和实际使用的度数
+        """
+        config = self.adaptive_degree
+        budget = min(config.seed_budget, config.global_budget)
+        graph = self.graph_artifacts.get(category)
+        
+        nodes = {}
+        relations = []
+        center_node = None
+        visited = set()
+        frontier: List[GraphNode] = []
+        degree = 0
+        
+        while degree < config.max_degree and len(relations) < budget:
+            limit = budget - len(relations)
+            if graph is not None:
+                rows = self._artifact_hop(graph, node_name, frontier, visited, limit)
+            else:
+                rows = self._neo4j_hop(session, category, node_name, frontier, visited, limit)
+            if not rows:
+                break
             
-            if center is not None and r is not None and neighbor is not None:
-                # 添加节点
-                center_node = GraphNode(
-                    id=str(center.element_id),
-                    name=center.get('name', ''),
-                    labels=list(center.labels), 
-                    properties=dict(center)
-                )
-                neighbor_node = GraphNode(
-                    id=str(neighbor.element_id),
-                    name=neighbor.get('name', ''),
-                    labels=list(neighbor.labels),
-                    properties=dict(neighbor)
-                )
-                
+            degree += 1
+            if center_node is None:
+                center_node = rows[0][0]
                 nodes[center_node.id] = center_node
+                visited.add(center_node.id)
+            
+            new_nodes = []
+            for source_node, rel_type, neighbor_node in rows:
+                if neighbor_node.id in visited:
+                    continue
+                visited.add(neighbor_node.id)
                 nodes[neighbor_node.id] = neighbor_node
-                
-                # 添加关系（包含度数信息）
-                relation_name = self._simplify_relation_type(r.type)
-                relation = GraphRelation(
+                new_nodes.append(neighbor_node)
+                relations.append(GraphRelation(
                     from_node=center_node.name,
                     to_node=neighbor_node.name,
-                    relation_type=f"{relation_name}({degree}度)",
-                    properties=dict(r)
-                )
-                relations.append(relation)
+                    relation_type=f"{self._simplify_relation_type(rel_type)}({degree}度)",
+                    properties={},
+                    degree=degree,
+                    via=source_node.name
+                ))
+            
+            # 边际收益过低：继续扩展只会带来少量新信息
+            if len(new_nodes) < config.min_new_nodes:
+                break
+            frontier = new_nodes
         
-        logger.info(f"节点 {node_name} 的 {self.max_degree} 度关系: {len(relations)} 个关系")
-        return {"nodes": nodes, "relations": relations}
+        logger.info(f"节点 {node_name} 自适应扩展到 {degree} 度: {len(relations)} 个关系")
+        return {"nodes": nodes, "relations": relations, "degree": degree}
+    
+    def _neo4j_hop(self, session, category: str, node_name: str, frontier: List[GraphNode],
+                   visited: set, limit: int) -> List[Tuple[GraphNode, str, GraphNode]]:
+        """在Neo4j上扩展一跳，frontier为空时从种子节点出发"""
+        if not frontier:
+            rows = self._run_query(session, "adaptive_seed_hop",
+                                   category=category, node_name=node_name, limit=limit)
+        else:
+            rows = self._run_query(session, "adaptive_frontier_hop", category=category,
+                                   frontier_ids=[node.id for node in frontier],
+                                   visited_ids=list(visited), limit=limit)
+        return [
+            (
+                self._projected_node(source_id, source_name, source_label, category),
+                rel_type,
+                self._projected_node(neighbor_id, neighbor_name, neighbor_label, category)
+            )
+            for source_id, source_name, source_label, rel_type, neighbor_id, neighbor_name, neighbor_label
+            in rows
+        ]
+    
+    def _artifact_hop(self, graph: CompiledGraph, node_name: str, frontier: List[GraphNode],
+                      visited: set, limit: int) -> List[Tuple[GraphNode, str, GraphNode]]:
+        """在编译图谱上扩展一跳，frontier为空时从种子节点出发"""
+        if not frontier:
+            center = graph.find(node_name)
+            if center is None or graph.label(center) != "Factor":
+                return []
+            sources = [center]
+        else:
+            sources = [int(node.id.rsplit(":", 1)[1]) for node in frontier]
+        
+        rows = []
+        for source in sources:
+            source_node = self._artifact_node(graph, source)
+            for neighbor, rel_type, _ in graph.neighbors(source):
+                neighbor_node = self._artifact_node(graph, neighbor)
+                if neighbor_node.id in visited:
+                    continue
+                rows.append((source_node, rel_type, neighbor_node))
+                if len(rows) >= limit:
+                    return rows
+        return rows
     
     def _map_user_group(self, user_group: str) -> str:
         """映射用户群体名称"""
@@ -464,17 +1496,9 @@ class KnowledgeGraphService:
         }
         return mapping.get(user_group, user_group)
     
-    def _find_need_nodes(self, session, need: str) -> List[str]:
-        """查找需求相关的节点"""
-        query_cypher = """
-        MATCH (n:Factor)
-        WHERE n.name CONTAINS $need
-        RETURN n.name as name
-        LIMIT 5
-        """
-        
-        result = session.run(query_cypher, need=need)
-        return [record["name"] for record in result]
+    def _find_need_nodes(self, snapshot: CategorySnapshot, need: str) -> List[str]:
+        """在品类快照中查找需求相关的节点"""
+        return snapshot.find_factors(need, limit=5)
     
     def _simplify_relation_type(self, relation_type: str) -> str:
         """简化关系类型名称"""
@@ -489,98 +1513,35 @@ class KnowledgeGraphService:
         return mapping.get(relation_type, relation_type)
 
     async def generate_response(self, query: str, query_result: QueryResult, 
-                              parsed_query: Dict[str, Any]) -> str:
-        """生成三层需求的深度研究报告"""
+                              parsed_query: Dict[str, Any], format: str = "markdown",
+                              mode: ServiceMode = ServiceMode.FULL) -> ReportOutput:
+        """
+        生成三层需求的深度研究报告
+        
+        Args:
+            query: 用户查询
+            query_result: 图谱查询结果
+            parsed_query: 解析后的查询
+            format: 输出格式，markdown（默认）、dict、json（紧凑）或 msgpack
+            mode: 处理模式，rule_prune 及更低档位不调用大模型剪枝
+            
+        Returns:
+            Markdown和JSON为字符串，dict为字典，msgpack为字节串
+        """
+        if format not in FORMATTERS:
+            raise ValueError(f"不支持的输出格式: {format}，可选: {', '.join(FORMATTERS)}")
         
         # 1. 先获取所有关系，然后剪枝
         all_relations = self._organize_relations_by_category(query_result.relations)
         
         # 2. 基于query进行剪枝
-        relevant_relations = await self._prune_relations(query, all_relations, parsed_query)
-        
-        # 3. 生成分层的自然语言描述
-        response_parts = []
-        response_parts.append(f"# 手机购买深度研究报告")
-        response_parts.append(f"**查询**: {query}")
-        
-        # === 第一层：最相关需求 ===
-        response_parts.append(f"\n## 🎯 最相关需求匹配")
-        
-        # 用户群体特别关注
-        user_groups = parsed_query.get("user_groups", [])
-        for user_group in user_groups:
-            if user_group in relevant_relations:
-                group_concerns = relevant_relations[user_group]
-                if group_concerns:
-                    response_parts.append(f"\n**{user_group}群体关注点**:")
-                    for concern in group_concerns[:8]:  # 增加显示数量
-                        response_parts.append(f"• {concern}")
-        
-        # 明确需求匹配
-        explicit_needs = parsed_query.get("explicit_needs", [])
-        for need in explicit_needs:
-            # 寻找相关类别
-            related_categories = []
-            for category, items in relevant_relations.items():
-                if need in category or any(need in item for item in items):
-                    related_categories.append(category)
-            
-            if related_categories:
-                response_parts.append(f"\n**{need}需求相关**:")
-                for category in related_categories[:3]:  # 最多显示3个相关类别
-                    if category in relevant_relations:
-                        items = relevant_relations[category][:6]
-                        response_parts.append(f"  - {category}: {', '.join(items)}")
-        
-        # === 第二层：基础购买决策因子 ===
-        response_parts.append(f"\n## 📊 核心购买决策因子")
-        
-        core_categories = ["性能评估", "价格考虑", "外观设计", "品牌选择"]
-        for category in core_categories:
-            if category in relevant_relations:
-                items = relevant_relations[category]
-                if items:
-                    response_parts.append(f"\n**{category}**:")
-                    for item in items[:10]:  # 增加显示数量
-                        response_parts.append(f"• {item}")
-        
-        # === 第三层：隐含和周边因子 ===
-        response_parts.append(f"\n## 💡 隐含需求和周边考虑")
-        
-        # 显示其他重要类别
-        other_categories = []
-        shown_categories = set(core_categories + [ug for ug in user_groups if ug in relevant_relations])
-        
-        for category in relevant_relations:
-            if category not in shown_categories and category != "手机":
-                other_categories.append(category)
-        
-        for category in other_categories[:5]:  # 显示更多其他类别
-            items = relevant_relations[category]
-            if items:
-                response_parts.append(f"\n**{category}**:")
-                for item in items[:8]:
-                    response_parts.append(f"• {item}")
-        
-        # === 结构化数据 ===
-        response_parts.append(f"\n## 📋 完整关系数据")
-        response_parts.append("```json")
-        structured_data = {
-            "query": query,
-            "analysis_layers": {
-                "most_relevant": {
-                    "user_groups": user_groups,
-                    "explicit_needs": explicit_needs
-                },
-                "core_factors": core_categories,
-                "implicit_factors": other_categories[:5]
-            },
-            "relevant_aspects": relevant_relations
-        }
-        response_parts.append(json.dumps(structured_data, ensure_ascii=False, indent=2))
-        response_parts.append("```")
+        relevant_relations = await self._prune_relations(query, all_relations, parsed_query,
+                                                         allow_llm=mode < ServiceMode.RULE_PRUNE)
         
-        return '\n'.join(response_parts)
+        # 3. 整理分层数据并按格式输出
+        report = build_report(query, parsed_query, self._resolve_category(parsed_query), relevant_relations,
+                              mode=mode.label)
+        return format_report(report, format)
 
     def _organize_relations_by_category(self, relations: List[GraphRelation]) -> Dict[str, List[str]]:
         """按类别组织关系"""
@@ -598,14 +1559,40 @@ class KnowledgeGraphService:
         return organized
 
     async def _prune_relations(self, query: str, all_relations: Dict[str, List[str]], 
-                             parsed_query: Dict[str, Any]) -> Dict[str, List[str]]:
-        """基于query智能剪枝关系"""
+                             parsed_query: Dict[str, Any], allow_llm: bool = True) -> Dict[str, List[str]]:
+        """基于query智能剪枝关系，allow_llm为False时（过载降级）不调用大模型"""
+        
+        # 种子组合已预计算时直接组合预计算结果
+        composed = self._compose_materialized_pruning(all_relations, parsed_query)
+        if composed:
+            logger.info("使用预计算剪枝结果")
+            return composed
+        return await self._prune_uncomposed(query, all_relations, parsed_query, allow_llm)
+
+    async def _prune_uncomposed(self, query: str, all_relations: Dict[str, List[str]],
+                                parsed_query: Dict[str, Any], allow_llm: bool = True) -> Dict[str, List[str]]:
+        """依次使用缓存、大模型剪枝和规则剪枝，不组合预计算结果（会话按部分剪枝时直接调用）"""
+        # 相同查询和相同待剪枝关系的大模型剪枝结果可以复用
+        category = self._resolve_category(parsed_query)
+        cache_key = hashlib.sha256(json.dumps(
+            [query, all_relations, parsed_query], ensure_ascii=False, sort_keys=True
+        ).encode("utf-8")).hexdigest()
+        partition = f"prune:{category}"
+        cached = self._cached_result(partition, category, cache_key)
+        if cached is not None:
+            logger.info("剪枝结果命中缓存")
+            return cached
+        
+        if not allow_llm:
+            logger.info("过载降级，使用规则剪枝")
+            return self._rule_based_prune(query, all_relations, parsed_query)
         
         # 先尝试使用大模型进行智能剪枝
         try:
             llm_pruned = await self._llm_prune_relations(query, all_relations, parsed_query)
             if llm_pruned:
                 logger.info("使用大模型剪枝成功")
+                self._store_result(partition, category, cache_key, llm_pruned)
                 return llm_pruned
         except Exception as e:
             logger.warning(f"大模型剪枝失败: {e}")
@@ -614,6 +1601,31 @@ class KnowledgeGraphService:
         logger.info("使用规则剪枝")
         return self._rule_based_prune(query, all_relations, parsed_query)
 
+    def _compose_materialized_pruning(self, all_relations: Dict[str, List[str]],
+                                      parsed_query: Dict[str, Any]) -> Optional[Dict[str, List[str]]]:
+        """由预计算的单种子和种子对剪枝结果组合出当前查询的剪枝结果，只保留本次关系中存在的因子"""
+        # 在事件循环中调用：使用已加载的快照，不确认图谱版本
+        snapshot = self._get_category_snapshot(self._resolve_category(parsed_query), revalidate=False)
+        answers = self._get_materialized_answers(snapshot)
+        if answers is None:
+            return None
+        seeds = [(kind, name) for kind, _, name in self._seed_keys(parsed_query, snapshot)]
+        pruned = answers.compose_pruned(seeds)
+        if pruned is None:
+            return None
+        return self._restrict_to_relations(pruned, all_relations)
+    
+    def _restrict_to_relations(self, pruned: Dict[str, List[str]],
+                               all_relations: Dict[str, List[str]]) -> Dict[str, List[str]]:
+        """只保留本次关系中存在的因子"""
+        restricted = {}
+        for category, items in pruned.items():
+            available = all_relations.get(category, [])
+            valid_items = [item for item in items if item in available]
+            if valid_items:
+                restricted[category] = valid_items
+        return restricted
+
     async def _llm_prune_relations(self, query: str, all_relations: Dict[str, List[str]], 
                                  parsed_query: Dict[str, Any]) -> Dict[str, List[str]]:
         """使用大模型进行智能剪枝 - 支持三层需求保留"""
@@ -623,11 +1635,12 @@ class KnowledgeGraphService:
         for category, items in all_relations.items():
             relations_summary[category] = items[:15]  # 增加分析的因子数量
         
+        product_category = self._resolve_category(parsed_query)
         prompt = f"""
-你正在为用户生成手机购买的深度研究报告，需要从事理图谱中收集全面的信息。请基于以下三个层次的需求来筛选因子：
+你正在为用户生成{product_category}购买的深度研究报告，需要从事理图谱中收集全面的信息。请基于以下三个层次的需求来筛选因子：
 
 1. **最相关需求**：与用户明确提到的需求直接匹配
-2. **基础需求**：手机购买决策中的通用重要因子（性能、价格、续航、拍照等）
+2. **基础需求**：{product_category}购买决策中的通用重要因子（性能、价格、续航、拍照等）
 3. **隐含需求**：基于用户群体和使用场景推断的潜在关注点
 
 用户查询：{query}
@@ -645,7 +1658,7 @@ class KnowledgeGraphService:
 筛选原则（宽松保留）：
 ✅ **必须保留**：
 - 与明确需求直接相关的因子
-- 手机购买的核心决策因子（性能、价格、续航、拍照、屏幕、外观、品牌等）
+- {product_category}购买的核心决策因子（性能、价格、续航、拍照、屏幕、外观、品牌等）
 - 用户群体特征相关的因子
 - 使用场景相关的因子
 
@@ -654,7 +1667,7 @@ class KnowledgeGraphService:
 - 可能影响购买决策的周边因子
 
 ❌ **可以移除**：
-- 与手机购买完全无关的因子
+- 与{product_category}购买完全无关的因子
 - 过于细节且不影响决策的技术参数
 
 请返回JSON格式，每个类别保留8-12个因子（比之前更宽松）：
@@ -665,134 +1678,65 @@ class KnowledgeGraphService:
 记住：这是为深度研究报告收集信息，宁可多保留也不要遗漏重要因子。
 """
         
+        return await self.llm_client.complete(
+            prompt, lambda content: self._extract_pruned_relations(content, all_relations),
+            max_tokens=1000, temperature=0.2, timeout=20.0, priority=Priority.PRUNE
+        )
+
+    def _extract_pruned_relations(self, content: str,
+                                  all_relations: Dict[str, List[str]]) -> Optional[Dict[str, List[str]]]:
+        """从大模型输出中提取剪枝结果，只保留原始数据中存在的因子"""
+        # 提取JSON
+        json_start = content.find('{')
+        json_end = content.rfind('}') + 1
+        if json_start < 0 or json_end <= json_start:
+            logger.warning("大模型剪枝返回中未找到有效JSON")
+            return None
+        
         try:
-            async with httpx.AsyncClient(timeout=20.0) as client:
-                headers = {
-                    "Authorization": f"Bearer {self.llm_api_key}",
-                    "Content-Type": "application/json"
-                }
-                
-                data = {
-                    "model": self.llm_model,
-                    "messages": [{"role": "user", "content": prompt}],
-                    "max_tokens": 1000,
-                    "temperature": 0.2
-                }
-                
-                response = await client.post(
-                    f"{self.llm_base_url}/chat/completions",
-                    headers=headers,
-                    json=data
-                )
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    content = result["choices"][0]["message"]["content"].strip()
-                    
-                    # 提取JSON
-                    json_start = content.find('{')
-                    json_end = content.rfind('}') + 1
-                    if json_start >= 0 and json_end > json_start:
-                        json_str = content[json_start:json_end]
-                        pruned_result = json.loads(json_str)
-                        
-                        # 验证和清理结果
-                        cleaned_result = {}
-                        for category, items in pruned_result.items():
-                            if isinstance(items, list) and items:
-                                # 确保项目存在于原始数据中
-                                valid_items = []
-                                for item in items:
-                                    if category in all_relations and item in all_relations[category]:
-                                        valid_items.append(item)
-                                if valid_items:
-                                    cleaned_result[category] = valid_items
-                        
-                        return cleaned_result
-                    else:
-                        logger.warning("大模型剪枝返回中未找到有效JSON")
-                        return None
-                else:
-                    logger.error(f"大模型剪枝API调用失败: {response.status_code}")
-                    return None
-                    
+            pruned_result = json.loads(content[json_start:json_end])
         except json.JSONDecodeError as e:
             logger.error(f"大模型剪枝JSON解析失败: {e}")
             return None
-        except Exception as e:
-            logger.error(f"大模型剪枝调用异常: {e}")
+        if not isinstance(pruned_result, dict):
+            logger.warning("大模型剪枝返回格式不正确")
             return None
+        
+        # 验证和清理结果
+        cleaned_result = {}
+        for category, items in pruned_result.items():
+            if isinstance(items, list) and items:
+                # 确保项目存在于原始数据中
+                valid_items = []
+                for item in items:
+                    if category in all_relations and item in all_relations[category]:
+                        valid_items.append(item)
+                if valid_items:
+                    cleaned_result[category] = valid_items
+        
+        return cleaned_result
 
     def _rule_based_prune(self, query: str, all_relations: Dict[str, List[str]], 
                          parsed_query: Dict[str, Any]) -> Dict[str, List[str]]:
         """基于规则的剪枝（降级方案）- 三层需求保留策略"""
         
-        # 构建三层关键词集合
-        # 第一层：最相关需求
-        high_priority_keywords = set()
-        high_priority_keywords.update(parsed_query.get("explicit_needs", []))
-        
-        # 第二层：基础需求（手机购买核心因子）
-        core_keywords = {
-            "性能", "价格", "续航", "拍照", "屏幕", "电池", "处理器", "内存", "存储", 
-            "外观", "品牌", "系统", "网络", "充电", "散热", "音质", "材质", "尺寸"
-        }
-        
-        # 第三层：隐含需求
-        context_keywords = set()
-        context_keywords.update(parsed_query.get("user_groups", []))
-        context_keywords.update(parsed_query.get("implicit_needs", []))
-        context_keywords.update(parsed_query.get("usage_scenarios", []))
+        # 三层关键词权重和各类别的保留数量（与排序检索的Cypher使用同一套规则，见relevance.py）
+        ranking = RelevanceRanking.from_parsed_query(parsed_query, self._resolve_category(parsed_query))
+        important_categories = ranking.important_categories
         
         pruned_relations = {}
         
-        # 定义重要类别（必须保留）
-        important_categories = [
-            "手机", "性能评估", "价格考虑", "外观设计", "品牌选择", 
-            "购买渠道", "明确需求", "用户体验", "技术参数"
-        ]
-        
         # 处理所有类别，使用更宽松的策略
         for category, items in all_relations.items():
-            pruned_items = []
-            
-            # 对每个项目计算综合相关性分数
-            for item in items:
-                score = 0
-                
-                # 最相关需求匹配（权重最高）
-                for keyword in high_priority_keywords:
-                    if keyword in item or keyword in category:
-                        score += 10
-                
-                # 核心购买因子匹配（权重中等）
-                for keyword in core_keywords:
-                    if keyword in item or keyword in category:
-                        score += 5
-                
-                # 上下文相关匹配（权重较低）
-                for keyword in context_keywords:
-                    if keyword in item or keyword in category:
-                        score += 3
-                
-                # 重要类别自动保留部分项目
-                if category in important_categories:
-                    score += 2
-                
-                # 保留策略：有任何相关性的都考虑保留
-                if score > 0:
-                    pruned_items.append((item, score))
+            # 对每个项目计算综合相关性分数：最相关需求10分、核心购买因子5分、上下文3分、重要类别另加2分；
+            # 有任何相关性的都考虑保留
+            pruned_items = [(item, score) for item in items if (score := ranking.score(item, category)) > 0]
             
             # 按分数排序，保留更多项目
             pruned_items.sort(key=lambda x: x[1], reverse=True)
             
-            # 根据类别重要性决定保留数量
-            if category in important_categories:
-                max_items = 12  # 重要类别保留更多
-            elif category in parsed_query.get("user_groups", []):
-                max_items = 8   # 用户群体相关保留中等数量
-            else:
-                max_items = 6   # 其他类别保留基本数量
+            # 根据类别重要性决定保留数量：重要类别12个，用户群体相关8个，其他6个
+            max_items = ranking.top_k(category)
             
             if pruned_items:
                 # 至少保留3个项目，确保基础信息完整
@@ -810,6 +1754,8 @@ class KnowledgeGraphService:
 
 # 可以作为独立服务使用
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    
     # 简单测试不同度数配置
     async def test():
         query = "适合学生的3000元左右的手机"
@@ -820,14 +1766,13 @@ if __name__ == "__main__":
         
         kg_service = KnowledgeGraphService(max_degree=degree)
         try:
-            parsed = await kg_service.parse_query(query)
-            result = kg_service.query_graph(parsed)
+            parsed, result = await kg_service.parse_and_query_graph(query)
             response = await kg_service.generate_response(query, result, parsed)
             print(f"\n{degree}度关系结果:")
             print(f"节点数: {len(result.nodes)}, 关系数: {len(result.relations)}")
             print(response[:500] + "..." if len(response) > 500 else response)
         finally:
-            kg_service.close()
+            await kg_service.aclose()
             
     
     asyncio.run(test())
\ No newline at end of file
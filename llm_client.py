@@ -0,0 +1,489 @@
+#!/usr/bin/env python3
+"""
+多端点大模型客户端
+支持多个端点/模型配置、按端点统计延迟、基于p95的对冲请求（先返回有效结果者胜出）、
+按近期错误率熔断的断路器，以及边生成边解析JSON字段的流式补全
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Callable, Deque, Dict, List, Optional, TypeVar
+
+from incremental_json import IncrementalJSONParser
+from llm_scheduler import (
+    LLMQueueFullError, LLMScheduler, Priority, get_scheduler, parse_retry_after
+)
+
+if TYPE_CHECKING:
+    import httpx
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+@dataclass(frozen=True)
+class LLMEndpoint:
+    """大模型端点配置"""
+    name: str
+    base_url: str
+    model: str
+    api_key: Optional[str]
+
+
+def load_llm_endpoints() -> List[LLMEndpoint]:
+    """
+    从环境变量读取大模型端点列表
+
+    LLM_ENDPOINTS 格式为 `base_url|model[|api_key环境变量名]`，多个端点用分号分隔，
+    未配置时使用 LLM_BASE_URL / LLM_MODEL / LLM_API_KEY 组成的单个端点
+
+    Returns:
+        按优先级排列的端点列表
+    """
+    default_key = os.getenv("LLM_API_KEY")
+    spec = os.getenv("LLM_ENDPOINTS", "")
+    endpoints = []
+    for index, item in enumerate(spec.split(";")):
+        item = item.strip()
+        if not item:
+            continue
+        parts = [part.strip() for part in item.split("|")]
+        if len(parts) < 2:
+            logger.warning(f"忽略格式错误的大模型端点配置: {item}")
+            continue
+        api_key = os.getenv(parts[2]) if len(parts) > 2 and parts[2] else default_key
+        endpoints.append(LLMEndpoint(
+            name=f"{index}:{parts[1]}",
+            base_url=parts[0].rstrip("/"),
+            model=parts[1],
+            api_key=api_key
+        ))
+
+    if not endpoints:
+        model = os.getenv("LLM_MODEL", "deepseek/deepseek-chat-v3-0324:free")
+        endpoints.append(LLMEndpoint(
+            name=f"0:{model}",
+            base_url=os.getenv("LLM_BASE_URL", "https://openrouter.ai/api/v1").rstrip("/"),
+            model=model,
+            api_key=default_key
+        ))
+    return endpoints
+
+
+class EndpointHealth:
+    """端点健康状态：滑动窗口内的延迟、错误率和断路器"""
+
+    def __init__(self, window: int = 50, error_threshold: float = 0.5,
+                 min_calls: int = 5, cooldown: float = 30.0):
+        self.error_threshold = error_threshold
+        self.min_calls = min_calls
+        self.cooldown = cooldown
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.outcomes: Deque[bool] = deque(maxlen=window)
+        self.opened_at: Optional[float] = None
+        self.half_open = False
+
+    def record_success(self, latency: float):
+        """记录成功调用"""
+        self.latencies.append(latency)
+        self.outcomes.append(True)
+        if self.half_open:
+            # 半开状态下试探成功，关闭断路器
+            self.opened_at = None
+            self.half_open = False
+            self.outcomes.clear()
+            self.outcomes.append(True)
+
+    def record_failure(self):
+        """记录失败调用（错误状态码、异常或无效返回）"""
+        self.outcomes.append(False)
+        if self.half_open or (len(self.outcomes) >= self.min_calls
+                              and self.error_rate() >= self.error_threshold):
+            self.opened_at = time.monotonic()
+            self.half_open = False
+
+    def error_rate(self) -> float:
+        """近期错误率"""
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+    def p95(self) -> Optional[float]:
+        """近期成功调用的p95延迟，样本不足时返回None"""
+        if len(self.latencies) < 5:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+    def can_probe(self) -> bool:
+        """断路器是否允许向该端点发送请求（不改变状态）：断路器关闭，或冷却结束可以放行一次试探"""
+        return self.opened_at is None or time.monotonic() - self.opened_at >= self.cooldown
+
+    def begin_probe(self) -> bool:
+        """
+        请求即将真正发出时调用：冷却结束后占用本周期唯一的一次试探，进入半开状态
+
+        Returns:
+            是否可以发出请求；本周期的试探已被其他请求占用时返回False
+        """
+        if self.opened_at is None:
+            return True
+        now = time.monotonic()
+        if now - self.opened_at < self.cooldown:
+            return False
+        # 试探被取消（如对冲落败）而没有结果时，下一个冷却周期再放行一次试探
+        self.opened_at = now
+        self.half_open = True
+        return True
+
+
+class HedgedLLMClient:
+    """带对冲请求和断路器的多端点大模型客户端"""
+
+    def __init__(self, endpoints: List[LLMEndpoint], default_hedge_delay: float = 2.0,
+                 min_hedge_delay: float = 0.2, max_hedge_delay: float = 8.0,
+                 max_attempts: Optional[int] = None, error_threshold: float = 0.5,
+                 cooldown: float = 30.0, scheduler: Optional[LLMScheduler] = None,
+                 max_connections: int = 20):
+        self.endpoints = endpoints
+        self.scheduler = scheduler or get_scheduler()
+        self.default_hedge_delay = default_hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        self.max_hedge_delay = max_hedge_delay
+        self.max_attempts = max_attempts or max(2, len(endpoints))
+        self.health = {
+            endpoint.name: EndpointHealth(error_threshold=error_threshold, cooldown=cooldown)
+            for endpoint in endpoints
+        }
+        self.hedged_requests = 0
+        self.max_connections = max_connections
+        # HTTP连接池在首次调用时创建
+        self._client: Optional["httpx.AsyncClient"] = None
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @classmethod
+    def from_env(cls) -> "HedgedLLMClient":
+        """根据环境变量创建客户端"""
+        return cls(
+            load_llm_endpoints(),
+            default_hedge_delay=float(os.getenv("LLM_HEDGE_DELAY", "2.0")),
+            max_attempts=int(os.getenv("LLM_MAX_ATTEMPTS", "0")) or None,
+            error_threshold=float(os.getenv("LLM_BREAKER_ERROR_RATE", "0.5")),
+            cooldown=float(os.getenv("LLM_BREAKER_COOLDOWN", "30")),
+            max_connections=int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+        )
+
+    async def complete(self, prompt: str, parse: Callable[[str], Optional[T]],
+                       max_tokens: int = 800, temperature: float = 0.1,
+                       timeout: float = 15.0,
+                       on_field: Optional[Callable[[str, Any], None]] = None,
+                       priority: Priority = Priority.INTERACTIVE) -> Optional[T]:
+        """
+        发送补全请求，返回第一个通过parse校验的结果
+
+        主请求超过该端点p95延迟仍未返回时向下一个端点发出对冲请求；
+        任一请求失败或返回无效内容时立即尝试下一个端点
+
+        Args:
+            prompt: 用户提示词
+            parse: 将模型输出转换为结果的函数，无效时返回None
+            max_tokens: 最大生成长度
+            temperature: 采样温度
+            timeout: 单次请求超时时间（秒）
+            on_field: 提供时使用流式补全，输出中的JSON顶层字段一完成就回调
+            priority: 在进程级调度队列中的优先级
+
+        Returns:
+            第一个有效结果，全部失败时返回None
+        """
+        available = self._ordered_endpoints()
+        if not available:
+            logger.error("所有大模型端点均处于熔断状态")
+            return None
+        # 端点少于尝试次数时轮流复用，单端点也能对冲长尾请求
+        remaining = [available[i % len(available)] for i in range(self.max_attempts)]
+
+        pending = set()
+        # 流式对冲时只转发最先产出字段的请求，避免多路输出交错
+        leader: List[Optional[asyncio.Future]] = [None]
+        tokens = self._estimate_tokens(prompt, max_tokens)
+
+        # 复用连接池中的连接，避免每次调用都重新建立TCP/TLS连接
+        client = self._get_client()
+
+        def launch(acquired: bool = False):
+            endpoint = remaining.pop(0)
+            slot = self._schedule(priority, tokens, acquired)
+            if on_field is None:
+                task = asyncio.ensure_future(
+                    self._attempt(client, endpoint, prompt, parse, max_tokens, temperature,
+                                  timeout, slot)
+                )
+            else:
+                task_ref: List[Optional[asyncio.Future]] = [None]
+
+                def forward(key: str, value: Any):
+                    if leader[0] is None:
+                        leader[0] = task_ref[0]
+                    if leader[0] is task_ref[0]:
+                        on_field(key, value)
+
+                task = asyncio.ensure_future(
+                    self._attempt_stream(client, endpoint, prompt, parse, max_tokens,
+                                         temperature, timeout, slot, forward)
+                )
+                task_ref[0] = task
+            pending.add(task)
+            return endpoint
+
+        current = launch()
+        try:
+            while pending:
+                delay = self._hedge_delay(current) if remaining else None
+                done, _ = await asyncio.wait(pending, timeout=delay,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # 对冲：当前请求超过p95延迟仍未返回；配额紧张时不对冲，避免挤占其他调用
+                    if self.scheduler.try_acquire(priority, tokens):
+                        self.hedged_requests += 1
+                        current = launch(acquired=True)
+                        logger.info(f"发出对冲请求: {current.name}")
+                    continue
+
+                pending.difference_update(done)
+                for task in done:
+                    result = task.result()
+                    if result is not None:
+                        return result
+                    if leader[0] is task:
+                        leader[0] = None
+
+                # 失败的请求立即由下一个端点接替
+                if remaining:
+                    current = launch()
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        return None
+
+    def _get_client(self) -> "httpx.AsyncClient":
+        """获取当前事件循环上的HTTP连接池，首次使用时才导入httpx并创建"""
+        import httpx
+
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._client_loop is not loop:
+            # 连接池绑定事件循环，换了事件循环（如多次asyncio.run）时重新创建
+            self._client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections)
+            )
+            self._client_loop = loop
+        return self._client
+
+    async def warm_up(self, timeout: float = 5.0) -> Dict[str, Optional[float]]:
+        """
+        预先与各端点建立连接
+
+        Returns:
+            各端点建立连接的耗时（毫秒），不可达时为None
+        """
+        client = self._get_client()
+
+        async def connect(endpoint: LLMEndpoint) -> Optional[float]:
+            started = time.monotonic()
+            try:
+                await client.get(f"{endpoint.base_url}/models",
+                                 headers={"Authorization": f"Bearer {endpoint.api_key}"},
+                                 timeout=timeout)
+            except Exception as e:
+                logger.warning(f"大模型端点预热失败: {endpoint.name} {e}")
+                return None
+            return round((time.monotonic() - started) * 1000, 1)
+
+        results = await asyncio.gather(*(connect(endpoint) for endpoint in self.endpoints))
+        return {endpoint.name: result for endpoint, result in zip(self.endpoints, results)}
+
+    async def aclose(self):
+        """关闭HTTP连接池"""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+
+    def _schedule(self, priority: Priority, tokens: float, acquired: bool):
+        """返回等待调度配额的协程工厂，已获得配额时直接放行"""
+        async def wait_for_slot() -> float:
+            if acquired:
+                return 0.0
+            wait = await self.scheduler.acquire(priority, tokens)
+            if wait >= 0.01:
+                logger.info(f"大模型调用排队等待 {wait * 1000:.0f}ms ({priority.name})")
+            return wait
+        return wait_for_slot
+
+    def _estimate_tokens(self, prompt: str, max_tokens: int) -> float:
+        """预估一次调用消耗的token数（中文按每字一个token保守估计）"""
+        return len(prompt) + max_tokens
+
+    def _handle_rate_limit(self, endpoint: LLMEndpoint, response: "httpx.Response"):
+        """429限流：按Retry-After暂停调度，不计入端点错误率"""
+        logger.warning(f"大模型接口限流: {endpoint.name}")
+        self.scheduler.pause(parse_retry_after(response.headers.get("Retry-After")))
+
+    async def _attempt(self, client: "httpx.AsyncClient", endpoint: LLMEndpoint, prompt: str,
+                       parse: Callable[[str], Optional[T]], max_tokens: int,
+                       temperature: float, timeout: float, wait_for_slot: Callable) -> Optional[T]:
+        """向单个端点发出一次请求并记录健康状态"""
+        health = self.health[endpoint.name]
+        try:
+            await wait_for_slot()
+        except LLMQueueFullError as e:
+            logger.warning(f"大模型调用未获得调度配额: {e}")
+            return None
+        if not health.begin_probe():
+            # 排队期间断路器打开，或本周期的试探已被其他请求占用
+            return None
+        started = time.monotonic()
+        try:
+            response = await client.post(
+                f"{endpoint.base_url}/chat/completions",
+                headers={
+                    "Authorization": f"Bearer {endpoint.api_key}",
+                    "Content-Type": "application/json"
+                },
+                json={
+                    "model": endpoint.model,
+                    "messages": [{"role": "user", "content": prompt}],
+                    "max_tokens": max_tokens,
+                    "temperature": temperature
+                },
+                timeout=timeout
+            )
+            if response.status_code == 429:
+                self._handle_rate_limit(endpoint, response)
+                return None
+            if response.status_code != 200:
+                logger.error(f"大模型API调用失败: {endpoint.name} {response.status_code}")
+                health.record_failure()
+                return None
+
+            payload = response.json()
+            usage = payload.get("usage") or {}
+            if usage.get("total_tokens"):
+                self.scheduler.settle(self._estimate_tokens(prompt, max_tokens), usage["total_tokens"])
+            content = payload["choices"][0]["message"]["content"].strip()
+            result = parse(content)
+            if result is None:
+                health.record_failure()
+                return None
+
+            health.record_success(time.monotonic() - started)
+            return result
+        except asyncio.CancelledError:
+            # 对冲竞争中落败的请求不计入健康统计
+            raise
+        except Exception as e:
+            logger.error(f"大模型API调用异常: {endpoint.name} {e}")
+            health.record_failure()
+            return None
+
+    async def _attempt_stream(self, client: "httpx.AsyncClient", endpoint: LLMEndpoint, prompt: str,
+                              parse: Callable[[str], Optional[T]], max_tokens: int,
+                              temperature: float, timeout: float, wait_for_slot: Callable,
+                              on_field: Callable[[str, Any], None]) -> Optional[T]:
+        """向单个端点发出一次流式（SSE）请求，边接收边增量解析JSON字段"""
+        health = self.health[endpoint.name]
+        try:
+            await wait_for_slot()
+        except LLMQueueFullError as e:
+            logger.warning(f"大模型调用未获得调度配额: {e}")
+            return None
+        if not health.begin_probe():
+            # 排队期间断路器打开，或本周期的试探已被其他请求占用
+            return None
+        started = time.monotonic()
+        parser = IncrementalJSONParser()
+        chunks = []
+        try:
+            async with client.stream(
+                "POST",
+                f"{endpoint.base_url}/chat/completions",
+                headers={
+                    "Authorization": f"Bearer {endpoint.api_key}",
+                    "Content-Type": "application/json"
+                },
+                json={
+                    "model": endpoint.model,
+                    "messages": [{"role": "user", "content": prompt}],
+                    "max_tokens": max_tokens,
+                    "temperature": temperature,
+                    "stream": True
+                },
+                timeout=timeout
+            ) as response:
+                if response.status_code == 429:
+                    await response.aread()
+                    self._handle_rate_limit(endpoint, response)
+                    return None
+                if response.status_code != 200:
+                    await response.aread()
+                    logger.error(f"大模型流式API调用失败: {endpoint.name} {response.status_code}")
+                    health.record_failure()
+                    return None
+
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    choices = json.loads(data).get("choices") or [{}]
+                    delta = (choices[0].get("delta") or {}).get("content") or ""
+                    if not delta:
+                        continue
+                    chunks.append(delta)
+                    for key, value in parser.feed(delta):
+                        on_field(key, value)
+
+            result = parse("".join(chunks).strip())
+            if result is None:
+                health.record_failure()
+                return None
+
+            health.record_success(time.monotonic() - started)
+            return result
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"大模型流式API调用异常: {endpoint.name} {e}")
+            health.record_failure()
+            return None
+
+    def _ordered_endpoints(self) -> List[LLMEndpoint]:
+        """断路器放行的端点，按p95延迟从低到高排列"""
+        available = [e for e in self.endpoints if self.health[e.name].can_probe()]
+        return sorted(available, key=lambda e: self.health[e.name].p95() or self.default_hedge_delay)
+
+    def _hedge_delay(self, endpoint: LLMEndpoint) -> float:
+        """对冲等待时间：该端点的p95延迟，样本不足时使用默认值"""
+        p95 = self.health[endpoint.name].p95()
+        delay = p95 if p95 is not None else self.default_hedge_delay
+        return min(self.max_hedge_delay, max(self.min_hedge_delay, delay))
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """各端点的健康统计"""
+        return {
+            name: {
+                "p95": health.p95(),
+                "error_rate": round(health.error_rate(), 3),
+                "calls": len(health.outcomes),
+                "circuit_open": health.opened_at is not None
+            }
+            for name, health in self.health.items()
+        }
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+大模型出站请求调度
+进程内所有大模型调用共享的令牌桶限流（每分钟请求数、每分钟token数）和有界优先级队列：
+交互式解析优先于剪枝，剪枝优先于批处理任务。收到429时按Retry-After暂停发放配额，
+并统计每次调用的排队等待时间
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Any, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    """调用优先级，数值越小越优先"""
+    INTERACTIVE = 0
+    PRUNE = 1
+    BATCH = 2
+
+
+class LLMQueueFullError(Exception):
+    """调度队列已满，或排队请求被更高优先级的请求挤出"""
+
+
+class TokenBucket:
+    """按分钟速率补充的令牌桶，rate为0表示不限制"""
+
+    def __init__(self, rate_per_min: float, capacity: Optional[float] = None):
+        self.rate = rate_per_min / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_min
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        if self.rate > 0:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, amount: float, now: float) -> float:
+        """获得amount个令牌还需等待的秒数"""
+        if self.rate <= 0:
+            return 0.0
+        self._refill(now)
+        # 单次需求超过桶容量时按满桶放行，避免永远无法满足
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float, now: float):
+        """扣除令牌（允许为负，用于按实际用量补扣）"""
+        if self.rate <= 0:
+            return
+        self._refill(now)
+        self.tokens -= amount
+
+
+@dataclass(order=True)
+class _Waiter:
+    """排队中的调用"""
+    priority: int
+    seq: int
+    tokens: float = field(compare=False)
+    loop: asyncio.AbstractEventLoop = field(compare=False)
+    event: asyncio.Event = field(compare=False)
+    rejected: bool = field(default=False, compare=False)
+
+
+class LLMScheduler:
+    """进程级大模型调用调度器"""
+
+    def __init__(self, requests_per_min: float = 0, tokens_per_min: float = 0,
+                 max_queue: int = 100):
+        self.request_bucket = TokenBucket(requests_per_min)
+        self.token_bucket = TokenBucket(tokens_per_min)
+        self.max_queue = max_queue
+        self._queue: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._paused_until = 0.0
+        self._waits: Dict[Priority, Deque[float]] = {p: deque(maxlen=200) for p in Priority}
+        self.rejected = 0
+        self.rate_limited = 0
+
+    async def acquire(self, priority: Priority, tokens: float) -> float:
+        """
+        排队等待发送配额
+
+        Args:
+            priority: 调用优先级
+            tokens: 预估消耗的token数
+
+        Returns:
+            排队等待时间（秒）
+
+        Raises:
+            LLMQueueFullError: 队列已满且没有更低优先级的请求可挤出
+        """
+        started = time.monotonic()
+        waiter = _Waiter(int(priority), next(self._seq), tokens,
+                         asyncio.get_running_loop(), asyncio.Event())
+        with self._lock:
+            if len(self._queue) >= self.max_queue:
+                worst = max(self._queue)
+                if worst < waiter:
+                    self.rejected += 1
+                    raise LLMQueueFullError("大模型调度队列已满")
+                # 挤出优先级最低、最晚到达的请求
+                self._queue.remove(worst)
+                heapq.heapify(self._queue)
+                worst.rejected = True
+                self.rejected += 1
+                self._wake(worst)
+            heapq.heappush(self._queue, waiter)
+
+        try:
+            while True:
+                with self._lock:
+                    waiter.event.clear()
+                    if waiter.rejected:
+                        raise LLMQueueFullError("请求被更高优先级的调用挤出调度队列")
+                    delay = None
+                    if self._queue[0] is waiter:
+                        now = time.monotonic()
+                        delay = max(self._paused_until - now,
+                                    self.request_bucket.delay(1, now),
+                                    self.token_bucket.delay(tokens, now))
+                        if delay <= 0:
+                            heapq.heappop(self._queue)
+                            self.request_bucket.consume(1, now)
+                            self.token_bucket.consume(tokens, now)
+                            if self._queue:
+                                self._wake(self._queue[0])
+                            wait = now - started
+                            self._waits[priority].append(wait)
+                            return wait
+                try:
+                    await asyncio.wait_for(waiter.event.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            with self._lock:
+                if waiter in self._queue:
+                    self._queue.remove(waiter)
+                    heapq.heapify(self._queue)
+                    if self._queue:
+                        self._wake(self._queue[0])
+            raise
+
+    def try_acquire(self, priority: Priority, tokens: float) -> bool:
+        """不排队地尝试获取配额，仅在队列为空且配额充足时成功（用于对冲等可选请求）"""
+        with self._lock:
+            now = time.monotonic()
+            if self._queue or self._paused_until > now:
+                return False
+            if self.request_bucket.delay(1, now) > 0 or self.token_bucket.delay(tokens, now) > 0:
+                return False
+            self.request_bucket.consume(1, now)
+            self.token_bucket.consume(tokens, now)
+            self._waits[priority].append(0.0)
+            return True
+
+    def settle(self, estimated: float, actual: float):
+        """按实际token用量修正预估扣除的配额"""
+        with self._lock:
+            self.token_bucket.consume(actual - estimated, time.monotonic())
+
+    def pause(self, seconds: float):
+        """收到限流响应后暂停发放配额"""
+        with self._lock:
+            self.rate_limited += 1
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            if self._queue:
+                self._wake(self._queue[0])
+        logger.warning(f"大模型接口限流，暂停发送 {seconds:.1f} 秒")
+
+    def _wake(self, waiter: _Waiter):
+        """唤醒等待者（可跨线程/事件循环）"""
+        try:
+            waiter.loop.call_soon_threadsafe(waiter.event.set)
+        except RuntimeError:
+            # 等待者所在事件循环已关闭
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        """各优先级的排队等待统计"""
+        wait_stats = {}
+        for priority, waits in self._waits.items():
+            if not waits:
+                continue
+            ordered = sorted(waits)
+            wait_stats[priority.name] = {
+                "calls": len(ordered),
+                "p50_ms": round(ordered[len(ordered) // 2] * 1000, 1),
+                "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 1)
+            }
+        return {
+            "queued": len(self._queue),
+            "rejected": self.rejected,
+            "rate_limited": self.rate_limited,
+            "waits": wait_stats
+        }
+
+
+def parse_retry_after(value: Optional[str], default: float = 5.0) -> float:
+    """解析Retry-After响应头（秒数），缺失或无法解析时返回默认值"""
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        from email.utils import parsedate_to_datetime
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return default
+
+
+_scheduler: Optional[LLMScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> LLMScheduler:
+    """获取进程级调度器，首次调用时根据环境变量创建"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = LLMScheduler(
+                requests_per_min=float(os.getenv("LLM_REQUESTS_PER_MIN", "0")),
+                tokens_per_min=float(os.getenv("LLM_TOKENS_PER_MIN", "0")),
+                max_queue=int(os.getenv("LLM_QUEUE_SIZE", "100"))
+            )
+        return _scheduler
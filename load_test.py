@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+"""
+并发压测工具
+以开环方式（到达间隔不受响应快慢影响）按指定QPS回放查询语料，对完整流水线
+（流式解析、图谱检索、剪枝、生成报告）施加持续负载；大模型使用本地模拟端点，
+图谱默认使用编译图谱（也可指定本地Neo4j）。
+语料只有少量查询，缓存开启时绝大多数请求命中缓存，因此分两轮发压：
+冷轮关闭种子关系缓存、解析/剪枝结果缓存和共享缓存，每个请求都完整执行；热轮使用正常的缓存配置。
+报告两轮各自的延迟直方图、错误率、事件循环延迟和RSS变化，--check 模式下冷轮超过阈值时以非零状态退出
+
+用法：
+    python load_test.py --qps 20 --duration 60
+    python load_test.py --qps 50 --duration 120 --check --max-p95-ms 800 --max-error-rate 0.01
+    python load_test.py --backend neo4j --corpus queries.txt --cache warm
+"""
+
+import argparse
+import asyncio
+import bisect
+import json
+import logging
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import traceback
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CORPUS = [
+    "适合学生的3000元左右的手机",
+    "老年人用的大屏手机推荐",
+    "拍照好的手机，预算5000",
+    "游戏玩家需要性能强的手机",
+    "续航长的商务手机",
+    "上班族性价比高的手机",
+    "摄影爱好者买什么手机",
+    "2000元以内护眼的手机",
+]
+LATENCY_BUCKETS_MS = [50, 100, 200, 300, 500, 750, 1000, 1500, 2000, 3000, 5000, 10000]
+# 冷轮关闭全部缓存层（与 scaling_benchmark.py 一致），热轮使用正常的缓存配置
+CACHE_PHASES = {"cold": "冷轮（关闭缓存）", "warm": "热轮（开启缓存）"}
+COLD_CACHE_ENV = {"SEED_CACHE_MAX_BYTES": "0", "RESULT_CACHE_MAX_BYTES": "0", "SHARED_CACHE_PATH": None}
+
+
+def current_rss_mb() -> float:
+    """当前进程常驻内存（MB），不支持/proc时退化为峰值RSS"""
+    try:
+        with open("/proc/self/statm") as file:
+            pages = int(file.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError, IndexError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def percentile(values: List[float], q: float) -> float:
+    """分位数（最近秩）"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def histogram(values: List[float]) -> Dict[str, int]:
+    """按固定分桶统计延迟"""
+    counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+    for value in values:
+        counts[bisect.bisect_left(LATENCY_BUCKETS_MS, value)] += 1
+    labels = [f"<={bound}ms" for bound in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}ms"]
+    return dict(zip(labels, counts))
+
+
+class LoadTest:
+    """开环压测"""
+
+    def __init__(self, service, corpus: List[str], qps: float, duration: float,
+                 poisson: bool = True, sample_interval: float = 1.0):
+        self.service = service
+        self.corpus = corpus
+        self.qps = qps
+        self.duration = duration
+        self.poisson = poisson
+        self.sample_interval = sample_interval
+        self.latencies: List[float] = []
+        self.errors: Counter = Counter()
+        self.loop_lags: List[float] = []
+        self.timeline: List[Dict[str, Any]] = []
+        self.in_flight = 0
+        self.sent = 0
+
+    async def _request(self, query: str):
+        """执行一次完整请求"""
+        self.in_flight += 1
+        started = time.perf_counter()
+        try:
+            await self.service.handle_query(query)
+            self.latencies.append((time.perf_counter() - started) * 1000)
+        except Exception as e:
+            self.errors[type(e).__name__] += 1
+            logger.debug(traceback.format_exc())
+        finally:
+            self.in_flight -= 1
+
+    async def _monitor(self, stop: asyncio.Event):
+        """采样事件循环延迟（定时器的实际唤醒偏差）、RSS和并发数"""
+        interval = 0.05
+        last_sample = time.perf_counter()
+        started = last_sample
+        while not stop.is_set():
+            expected = time.perf_counter() + interval
+            await asyncio.sleep(interval)
+            self.loop_lags.append(max(0.0, (time.perf_counter() - expected) * 1000))
+            now = time.perf_counter()
+            if now - last_sample >= self.sample_interval:
+                last_sample = now
+                self.timeline.append({
+                    "t": round(now - started, 1),
+                    "rss_mb": round(current_rss_mb(), 1),
+                    "in_flight": self.in_flight,
+                    "completed": len(self.latencies),
+                    "errors": sum(self.errors.values()),
+                    "loop_lag_ms": round(max(self.loop_lags[-int(self.sample_interval / interval):] or [0]), 1)
+                })
+
+    async def run(self) -> Dict[str, Any]:
+        """按到达过程发出请求，等待全部完成后返回报告"""
+        stop = asyncio.Event()
+        monitor = asyncio.ensure_future(self._monitor(stop))
+        rss_start = current_rss_mb()
+        tasks = set()
+        started = time.perf_counter()
+        next_arrival = started
+        while next_arrival - started < self.duration:
+            delay = next_arrival - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            # 开环：不等待前一个请求完成
+            task = asyncio.ensure_future(self._request(self.corpus[self.sent % len(self.corpus)]))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            self.sent += 1
+            gap = random.expovariate(self.qps) if self.poisson else 1.0 / self.qps
+            next_arrival += gap
+        if tasks:
+            await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await monitor
+
+        rss_samples = [sample["rss_mb"] for sample in self.timeline] or [current_rss_mb()]
+        failed = sum(self.errors.values())
+        return {
+            "sent": self.sent,
+            "completed": len(self.latencies),
+            "achieved_qps": round(len(self.latencies) / elapsed, 2),
+            "error_rate": round(failed / self.sent, 4) if self.sent else 0.0,
+            "errors": dict(self.errors),
+            "latency_ms": {
+                "p50": round(percentile(self.latencies, 0.50), 1),
+                "p95": round(percentile(self.latencies, 0.95), 1),
+                "p99": round(percentile(self.latencies, 0.99), 1),
+                "max": round(max(self.latencies, default=0.0), 1),
+            },
+            "latency_histogram": histogram(self.latencies),
+            "loop_lag_ms": {
+                "p99": round(percentile(self.loop_lags, 0.99), 1),
+                "max": round(max(self.loop_lags, default=0.0), 1),
+            },
+            "rss_mb": {
+                "start": round(rss_start, 1),
+                "end": rss_samples[-1],
+                "max": max(rss_samples),
+                "growth": round(rss_samples[-1] - rss_start, 1),
+            },
+            "admission": self.service.admission.stats(),
+            "parse_batcher": self.service.parse_batcher.stats() if self.service.parse_batcher else None,
+            "seed_cache": self.service.seed_cache.stats(),
+            "result_cache": self.service.result_cache.stats(),
+            "shared_cache": self.service.shared_cache.stats() if self.service.shared_cache else None,
+            "timeline": self.timeline,
+        }
+
+
+def check_thresholds(report: Dict[str, Any], args) -> List[str]:
+    """对比回归阈值，返回未通过的项目"""
+    failures = []
+    if report["latency_ms"]["p95"] > args.max_p95_ms:
+        failures.append(f"p95延迟 {report['latency_ms']['p95']}ms 超过 {args.max_p95_ms}ms")
+    if report["error_rate"] > args.max_error_rate:
+        failures.append(f"错误率 {report['error_rate']} 超过 {args.max_error_rate}")
+    if report["loop_lag_ms"]["p99"] > args.max_loop_lag_ms:
+        failures.append(f"事件循环延迟p99 {report['loop_lag_ms']['p99']}ms 超过 {args.max_loop_lag_ms}ms")
+    if report["rss_mb"]["growth"] > args.max_rss_growth_mb:
+        failures.append(f"RSS增长 {report['rss_mb']['growth']}MB 超过 {args.max_rss_growth_mb}MB")
+    return failures
+
+
+def prepare_artifacts() -> str:
+    """将已配置品类编译到临时目录，作为本地图谱后端"""
+    from category_graph import load_category_configs
+    from graph_artifact import compile_graph, load_graph_file, write_artifact
+
+    directory = tempfile.mkdtemp(prefix="kg_load_test_")
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    for name, config in load_category_configs().items():
+        # data文件可以是Cypher或 `.jsonl` 记录格式（如合成图谱）
+        nodes, edges = load_graph_file(os.path.join(base_dir, config.data_file))
+        write_artifact(os.path.join(directory, f"{name}.graph"),
+                       compile_graph(nodes, edges, {"category": name, "source": config.data_file}))
+    return directory
+
+
+def load_corpus(path: Optional[str]) -> List[str]:
+    """读取查询语料，每行一条"""
+    if not path:
+        return DEFAULT_CORPUS
+    with open(path, encoding="utf-8") as file:
+        return [line.strip() for line in file if line.strip()]
+
+
+def cache_environment(phase: str) -> Dict[str, Optional[str]]:
+    """
+    切换到某一轮的缓存环境变量（服务创建时读取）
+
+    Returns:
+        切换前的取值，传给 restore_environment 恢复
+    """
+    previous = {key: os.environ.get(key) for key in COLD_CACHE_ENV}
+    if phase == "cold":
+        restore_environment(COLD_CACHE_ENV)
+    return previous
+
+
+def restore_environment(values: Dict[str, Optional[str]]):
+    """设置环境变量，取值为None时删除"""
+    for key, value in values.items():
+        if value is None:
+            os.environ.pop(key, None)
+        else:
+            os.environ[key] = value
+
+
+def print_report(report: Dict[str, Any], title: str = ""):
+    """打印压测报告"""
+    if title:
+        print(f"\n===== {title} =====")
+    print(f"\n发出 {report['sent']} 个请求，完成 {report['completed']} 个，"
+          f"实际吞吐 {report['achieved_qps']} QPS，错误率 {report['error_rate']}")
+    if report["errors"]:
+        print(f"错误类型: {report['errors']}")
+    latency = report["latency_ms"]
+    print(f"延迟(ms): p50={latency['p50']} p95={latency['p95']} p99={latency['p99']} max={latency['max']}")
+    total = max(1, report["completed"])
+    for bucket, count in report["latency_histogram"].items():
+        if count:
+            print(f"  {bucket:>10} {count:>6} {'#' * max(1, int(40 * count / total))}")
+    print(f"事件循环延迟(ms): p99={report['loop_lag_ms']['p99']} max={report['loop_lag_ms']['max']}")
+    rss = report["rss_mb"]
+    print(f"RSS(MB): 开始 {rss['start']} 结束 {rss['end']} 峰值 {rss['max']} 增长 {rss['growth']}")
+    admission = report["admission"]
+    print(f"准入控制: 各模式请求数 {admission['admitted']}, 拒绝 {admission['shed']}, 近期p95 {admission['recent_p95_ms']}ms")
+    cache = report["seed_cache"]
+    print(f"种子关系缓存: 命中率 {cache['hit_ratio']} ({cache['hits']}/{cache['hits'] + cache['misses']}), "
+          f"{cache['entries']} 条 {cache['bytes']} 字节, 淘汰 {cache['evictions']}, 失效 {cache['invalidations']}")
+    cache = report["result_cache"]
+    print(f"解析/剪枝结果缓存: 命中率 {cache['hit_ratio']} ({cache['hits']}/{cache['hits'] + cache['misses']})")
+    if report["shared_cache"]:
+        shared = report["shared_cache"]
+        print(f"共享缓存: 命中率 {shared['hit_ratio']} ({shared['hits']}/{shared['hits'] + shared['misses']}), "
+              f"{shared['entries']} 条 {shared['bytes']} 字节, 版本失效/过期 {shared['stale']}")
+    print(f"\n{'时间(s)':>8}{'RSS(MB)':>10}{'并发':>6}{'完成':>8}{'错误':>6}{'循环延迟(ms)':>14}")
+    for sample in report["timeline"]:
+        print(f"{sample['t']:>8}{sample['rss_mb']:>10}{sample['in_flight']:>6}"
+              f"{sample['completed']:>8}{sample['errors']:>6}{sample['loop_lag_ms']:>14}")
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="事理图谱服务并发压测")
+    parser.add_argument("--qps", type=float, default=10.0)
+    parser.add_argument("--duration", type=float, default=30.0, help="发压时长（秒）")
+    parser.add_argument("--corpus", help="查询语料文件，每行一条")
+    parser.add_argument("--degree", type=int, default=2)
+    parser.add_argument("--uniform", action="store_true", help="固定间隔到达（默认泊松到达）")
+    parser.add_argument("--backend", choices=["artifact", "neo4j"], default="artifact")
+    parser.add_argument("--llm-endpoints", help="使用已有的大模型端点（默认启动本地模拟端点）")
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--llm-jitter", type=float, default=0.1)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-rpm", type=float, default=0, help="调度器每分钟请求数，0为不限")
+    parser.add_argument("--cache", choices=["both", "cold", "warm"], default="both",
+                        help="发压的轮次：cold关闭全部缓存，warm使用正常缓存，both依次执行两轮")
+    parser.add_argument("--json", help="将完整报告写入JSON文件")
+    parser.add_argument("--check", action="store_true", help="超过阈值时退出码为1（有冷轮时按冷轮判断）")
+    parser.add_argument("--max-p95-ms", type=float, default=2000)
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--max-loop-lag-ms", type=float, default=100)
+    parser.add_argument("--max-rss-growth-mb", type=float, default=200)
+    parser.add_argument("--seed", type=int, default=0, help="到达过程的随机种子")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    random.seed(args.seed)
+
+    # 调度器和图谱后端都在服务创建前通过环境变量配置
+    os.environ["LLM_REQUESTS_PER_MIN"] = str(args.llm_rpm)
+    # neo4j后端使用空目录，确保不会读到已有的编译图谱
+    artifact_dir = prepare_artifacts() if args.backend == "artifact" else tempfile.mkdtemp(prefix="kg_load_test_")
+    os.environ["GRAPH_ARTIFACT_DIR"] = artifact_dir
+    if args.llm_endpoints:
+        os.environ["LLM_ENDPOINTS"] = args.llm_endpoints
+    else:
+        from mock_llm_server import start_mock_server
+        server = start_mock_server(latency=args.llm_latency, jitter=args.llm_jitter,
+                                   error_rate=args.llm_error_rate, token_delay=0.002)
+        os.environ["LLM_ENDPOINTS"] = f"{server.base_url}|mock"
+
+    from knowledge_graph_service import KnowledgeGraphService
+
+    async def run(phase: str) -> Dict[str, Any]:
+        # 每一轮使用新的服务实例，缓存配置在创建时读取
+        previous = cache_environment(phase)
+        try:
+            service = KnowledgeGraphService(max_degree=args.degree)
+        finally:
+            restore_environment(previous)
+        try:
+            await service.warm_up(list(service.categories))
+            test = LoadTest(service, load_corpus(args.corpus), args.qps, args.duration,
+                            poisson=not args.uniform)
+            return await test.run()
+        finally:
+            await service.aclose()
+
+    phases = ["cold", "warm"] if args.cache == "both" else [args.cache]
+    reports = {}
+    try:
+        for phase in phases:
+            reports[phase] = asyncio.run(run(phase))
+    finally:
+        shutil.rmtree(artifact_dir, ignore_errors=True)
+    for phase, report in reports.items():
+        print_report(report, CACHE_PHASES[phase])
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(reports, file, ensure_ascii=False, indent=2)
+
+    if args.check:
+        checked = "cold" if "cold" in reports else "warm"
+        print(f"\n按{CACHE_PHASES[checked]}检查阈值")
+        failures = check_thresholds(reports[checked], args)
+        for failure in failures:
+            print(f"未通过: {failure}")
+        if failures:
+            sys.exit(1)
+        print("压测通过")
+
+
+if __name__ == "__main__":
+    main()
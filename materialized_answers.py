@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+预计算的种子关系和剪枝结果
+查询的种子来自一个很小的封闭集合（几类用户群体、常见需求和预算档位），绝大多数解析结果都是它们的组合。
+离线任务为每个单种子和每个种子对预先计算：单种子的多度关系，以及单种子、种子对的剪枝结果，
+与编译图谱的版本号一起写入 `{品类}.answers.json`。运行时种子关系直接取用预计算结果，
+剪枝结果优先使用完全匹配的条目，否则对各单种子的结果做并集，不再遍历图谱和调用大模型剪枝；
+图谱重新编译后版本号不一致，预计算结果自动失效
+
+用法：
+    python graph_artifact.py compile               # 先编译图谱
+    python materialized_answers.py                 # 为全部已配置品类预计算
+    python materialized_answers.py 手机 --rule-only  # 只使用规则剪枝（不调用大模型）
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from graph_artifact import write_artifact
+
+logger = logging.getLogger(__name__)
+
+# 查询解析提示词中列出的用户群体和明确需求，即种子的封闭集合
+SEED_VOCABULARY: Dict[str, List[str]] = {
+    "user_group": ["学生", "上班族", "老年人", "游戏玩家", "摄影爱好者", "商务人士"],
+    "need": ["续航", "拍照", "性能", "大屏", "护眼", "轻薄", "性价比"],
+}
+
+Seed = Tuple[str, str]
+
+
+def seed_id(kind: str, name: str) -> str:
+    """单个种子的标识，如 `user_group:学生`"""
+    return f"{kind}:{name}"
+
+
+def answer_key(seeds: Iterable[Seed]) -> str:
+    """种子组合的标识，与顺序无关；没有种子时为空字符串"""
+    return "|".join(sorted({seed_id(kind, name) for kind, name in seeds}))
+
+
+def union_relations(pieces: Iterable[Dict[str, List[str]]]) -> Dict[str, List[str]]:
+    """按类别合并多份剪枝结果，保持首次出现的顺序"""
+    merged: Dict[str, List[str]] = {}
+    for piece in pieces:
+        for category, items in piece.items():
+            existing = merged.setdefault(category, [])
+            existing.extend(item for item in items if item not in existing)
+    return merged
+
+
+@dataclass
+class MaterializedAnswers:
+    """某个品类、某个图谱版本和度数配置下的预计算结果"""
+    category: str
+    graph_version: str
+    max_degree: int
+    # 种子标识 -> 种子关系（节点和关系均为字典形式）
+    seed_relations: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    # 种子组合标识 -> 剪枝后的关系
+    pruned: Dict[str, Dict[str, List[str]]] = field(default_factory=dict)
+    pruning: str = "llm"
+    created_at: float = field(default_factory=time.time)
+
+    def get_seed_relations(self, kind: str, name: str) -> Optional[Dict[str, Any]]:
+        """单个种子的预计算关系，未预计算时返回None"""
+        return self.seed_relations.get(seed_id(kind, name))
+
+    def compose_pruned(self, seeds: List[Seed]) -> Optional[Dict[str, List[str]]]:
+        """
+        组合种子集合的剪枝结果
+
+        完全匹配的组合（单种子、种子对或无种子）直接返回；更大的组合对各单种子的结果做并集。
+        任一种子未预计算时返回None
+        """
+        exact = self.pruned.get(answer_key(seeds))
+        if exact is not None:
+            return exact
+        pieces = []
+        for seed in seeds:
+            piece = self.pruned.get(answer_key([seed]))
+            if piece is None:
+                return None
+            pieces.append(piece)
+        return union_relations(pieces) if pieces else None
+
+    def to_json(self) -> bytes:
+        """序列化为JSON"""
+        return json.dumps({
+            "category": self.category,
+            "graph_version": self.graph_version,
+            "max_degree": self.max_degree,
+            "pruning": self.pruning,
+            "created_at": self.created_at,
+            "seed_relations": self.seed_relations,
+            "pruned": self.pruned
+        }, ensure_ascii=False).encode("utf-8")
+
+    @classmethod
+    def from_json(cls, data: bytes) -> "MaterializedAnswers":
+        """从JSON反序列化"""
+        payload = json.loads(data)
+        return cls(
+            category=payload["category"],
+            graph_version=payload["graph_version"],
+            max_degree=payload["max_degree"],
+            seed_relations=payload["seed_relations"],
+            pruned=payload["pruned"],
+            pruning=payload.get("pruning", "llm"),
+            created_at=payload.get("created_at", 0.0)
+        )
+
+
+class MaterializedAnswerStore:
+    """按品类懒加载预计算结果，文件与编译图谱放在同一目录；文件被重新生成后加载新文件"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        # 品类 -> (文件标识, 预计算结果)，文件标识为 (inode, 修改时间, 大小)，加载失败时结果为None
+        self._answers: Dict[str, Tuple[Tuple[int, int, int], Optional[MaterializedAnswers]]] = {}
+        self._lock = threading.Lock()
+
+    def path_for(self, category: str) -> str:
+        """品类对应的预计算结果文件路径"""
+        return os.path.join(self.directory, f"{category}.answers.json")
+
+    def get(self, category: str) -> Optional[MaterializedAnswers]:
+        """
+        获取品类的预计算结果，文件不存在或损坏时返回None
+
+        每次都比对文件标识，重新预计算后加载新文件；文件不存在的结果不缓存，之后生成的文件会被发现
+        """
+        path = self.path_for(category)
+        try:
+            stat = os.stat(path)
+            identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            identity = None
+
+        with self._lock:
+            cached = self._answers.get(category)
+            if cached is not None and cached[0] == identity:
+                return cached[1]
+            self._answers.pop(category, None)
+            if identity is None:
+                return None
+
+            answers = None
+            try:
+                with open(path, "rb") as file:
+                    answers = MaterializedAnswers.from_json(file.read())
+                logger.info(f"已加载预计算结果: {path} (图谱版本 {answers.graph_version}, "
+                            f"{len(answers.seed_relations)} 个种子, {len(answers.pruned)} 个组合)")
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"加载预计算结果失败，忽略: {e}")
+            # 加载失败的文件按文件标识记住，替换后再重新加载
+            self._answers[category] = (identity, answers)
+            return answers
+
+
+def category_seeds(band_names: Iterable[str]) -> List[Seed]:
+    """品类的全部种子：固定词表加上品类图谱中的预算档位"""
+    seeds = [(kind, name) for kind, names in SEED_VOCABULARY.items() for name in names]
+    return seeds + [("price_band", name) for name in band_names]
+
+
+def seed_combinations(seeds: List[Seed], include_pairs: bool = True) -> List[List[Seed]]:
+    """
+    需要预计算剪枝结果的种子组合：无种子、每个单种子，以及每个种子对
+
+    一个查询只有一个价格范围，两个预算档位组成的种子对不单独预计算（运行时由单档位结果取并集）
+    """
+    combinations: List[List[Seed]] = [[]] + [[seed] for seed in seeds]
+    if include_pairs:
+        combinations.extend(
+            list(pair) for pair in itertools.combinations(seeds, 2)
+            if not (pair[0][0] == pair[1][0] == "price_band")
+        )
+    return combinations
+
+
+def combination_query(seeds: List[Seed], category: str) -> Dict[str, Any]:
+    """种子组合对应的解析结果"""
+    bands = [name for kind, name in seeds if kind == "price_band"]
+    return {
+        "product_category": category,
+        # 档位名称本身就是可解析的价格表达，解析后恰好覆盖该档位
+        "price_range": bands[0] if bands else "",
+        "user_groups": [name for kind, name in seeds if kind == "user_group"],
+        "explicit_needs": [name for kind, name in seeds if kind == "need"],
+        "implicit_needs": [],
+        "usage_scenarios": []
+    }
+
+
+async def materialize(service, category: str, include_pairs: bool = True,
+                      rule_only: bool = False) -> MaterializedAnswers:
+    """
+    为一个品类预计算种子关系和剪枝结果
+
+    Args:
+        service: 使用编译图谱的 KnowledgeGraphService，预计算期间不读取已有的预计算结果
+        category: 品类名称
+        include_pairs: 是否预计算全部种子对
+        rule_only: 只使用规则剪枝；否则先用大模型剪枝，失败时降级到规则剪枝
+
+    Raises:
+        ValueError: 品类没有编译图谱（预计算结果必须绑定图谱版本）
+    """
+    graph = service.graph_artifacts.get(category)
+    if graph is None:
+        raise ValueError(f"品类 {category} 没有编译图谱，请先运行 python graph_artifact.py compile")
+    snapshot = service._get_category_snapshot(category)
+    answers = MaterializedAnswers(
+        category=category,
+        graph_version=graph.version,
+        max_degree=service.max_degree,
+        pruning="rule" if rule_only else "llm"
+    )
+
+    seeds_in_category = category_seeds(band.name for band in snapshot.price_index().bands)
+    for kind, name in seeds_in_category:
+        relations = service._get_seed_relations(None, snapshot, kind, category, name)
+        answers.seed_relations[seed_id(kind, name)] = service._seed_relations_to_dict(relations)
+
+    for seeds in seed_combinations(seeds_in_category, include_pairs):
+        parsed_query = combination_query(seeds, category)
+        query = " ".join([name for _, name in seeds] + [category])
+        result = service.query_graph(parsed_query)
+        all_relations = service._organize_relations_by_category(result.relations)
+        pruned = None
+        if not rule_only:
+            try:
+                pruned = await service._llm_prune_relations(query, all_relations, parsed_query)
+            except Exception as e:
+                logger.warning(f"大模型剪枝失败，使用规则剪枝: {answer_key(seeds) or '无种子'} {e}")
+        if not pruned:
+            pruned = service._rule_based_prune(query, all_relations, parsed_query)
+        answers.pruned[answer_key(seeds)] = pruned
+
+    logger.info(f"{category}: 预计算了 {len(answers.seed_relations)} 个种子, {len(answers.pruned)} 个组合 "
+                f"(图谱版本 {answers.graph_version}, {answers.max_degree} 度)")
+    return answers
+
+
+def main():
+    """主函数"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="预计算种子关系和剪枝结果")
+    parser.add_argument("categories", nargs="*", help="要预计算的品类，默认全部已配置品类")
+    parser.add_argument("--degree", type=int, default=2, help="关系度数，需与服务的max_degree一致")
+    parser.add_argument("--no-pairs", action="store_true", help="只预计算单种子")
+    parser.add_argument("--rule-only", action="store_true", help="只使用规则剪枝，不调用大模型")
+    args = parser.parse_args()
+
+    from knowledge_graph_service import KnowledgeGraphService
+
+    async def run():
+        service = KnowledgeGraphService(max_degree=args.degree)
+        # 预计算必须从图谱重新计算，不能读取旧的预计算结果
+        service.materialized_answers = None
+        try:
+            for category in args.categories or list(service.categories.keys()):
+                if category not in service.categories:
+                    logger.error(f"未配置的品类: {category}")
+                    sys.exit(1)
+                try:
+                    answers = await materialize(service, category, include_pairs=not args.no_pairs,
+                                                rule_only=args.rule_only)
+                except ValueError as e:
+                    logger.error(str(e))
+                    sys.exit(1)
+                path = MaterializedAnswerStore(service.graph_artifacts.directory).path_for(category)
+                data = answers.to_json()
+                write_artifact(path, data)
+                logger.info(f"已写入 {path} ({len(data)} 字节)")
+        finally:
+            await service.aclose()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+本地模拟大模型服务
+实现OpenAI兼容的 /chat/completions 接口（含SSE流式输出），可配置延迟、抖动、错误率和限流，
+用于在没有真实大模型的情况下验证对冲请求、熔断和负载表现
+
+用法：
+    python mock_llm_server.py --port 8001 --latency 0.5 --jitter 0.3 --error-rate 0.1
+"""
+
+import argparse
+import json
+import logging
+import random
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict
+
+logger = logging.getLogger(__name__)
+
+USER_GROUP_KEYWORDS = {
+    "学生": "学生", "老人": "老年人", "老年": "老年人", "游戏": "游戏玩家",
+    "摄影": "摄影爱好者", "上班": "上班族", "商务": "商务人士"
+}
+NEED_KEYWORDS = ["续航", "拍照", "性能", "大屏", "护眼", "轻薄", "性价比"]
+REMOVAL_WORDS = ("不要", "不用", "不需要", "去掉", "不考虑")
+# 会话追问提示词中上一轮解析结果的引导语
+CONTEXT_MARKER = "上一轮的解析结果："
+
+
+def mock_parse_content(prompt: str) -> str:
+    """
+    根据查询中的关键词生成解析结果；批量解析的提示词（带查询列表）返回按顺序排列的JSON数组，
+    会话追问的提示词带有上一轮的解析结果，返回合并后的完整结果
+    """
+    if "查询列表：" in prompt:
+        section = prompt.split("查询列表：", 1)[-1].strip().split("\n\n", 1)[0]
+        queries = [line.split(". ", 1)[-1] for line in section.splitlines() if line.strip()]
+        return json.dumps([mock_parse_query(query) for query in queries], ensure_ascii=False)
+    query = prompt.split("查询：", 1)[-1].split("\n", 1)[0]
+    result = mock_parse_query(query)
+    if CONTEXT_MARKER in prompt:
+        context = json.loads(prompt.split(CONTEXT_MARKER, 1)[-1].strip().split("\n", 1)[0])
+        result = merge_context(context, result, query)
+    return json.dumps(result, ensure_ascii=False)
+
+
+def mock_parse_query(query: str) -> Dict[str, Any]:
+    """单条查询的解析结果"""
+    result = {
+        "product_category": "手机",
+        "price_range": "",
+        "user_groups": sorted({group for keyword, group in USER_GROUP_KEYWORDS.items() if keyword in query}),
+        "explicit_needs": [need for need in NEED_KEYWORDS if need in query],
+        "implicit_needs": ["性价比"] if "学生" in query else [],
+        "usage_scenarios": []
+    }
+    digits = "".join(ch if ch.isdigit() else " " for ch in query).split()
+    if digits:
+        result["price_range"] = f"{digits[0]}元左右"
+    return result
+
+
+def merge_context(context: Dict[str, Any], result: Dict[str, Any], query: str) -> Dict[str, Any]:
+    """把追问的解析结果合并到上一轮的结果中：新条件加入，`不要拍照` 这类说法删除对应条件，价格提到时覆盖"""
+    merged = dict(context)
+    merged["price_range"] = result["price_range"] or context.get("price_range", "")
+    for key in ("user_groups", "explicit_needs", "implicit_needs", "usage_scenarios"):
+        items = list(dict.fromkeys(list(context.get(key, [])) + result[key]))
+        merged[key] = [item for item in items
+                       if not any(f"{word}{item}" in query for word in REMOVAL_WORDS)]
+    return merged
+
+
+def mock_prune_content(prompt: str) -> str:
+    """原样保留提示词中的因子，每个类别最多10个"""
+    section = prompt.split("所有相关因子：", 1)[-1].split("筛选原则", 1)[0]
+    try:
+        relations = json.loads(section[section.find("{"):section.rfind("}") + 1])
+    except json.JSONDecodeError:
+        relations = {}
+    return json.dumps({category: items[:10] for category, items in relations.items()}, ensure_ascii=False)
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    """模拟大模型请求处理"""
+
+    server_version = "MockLLM/1.0"
+    # 保持长连接，客户端连接池可以复用
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        # 客户端预热时请求模型列表
+        self._send_json(200, {"object": "list", "data": [{"id": "mock", "object": "model"}]})
+
+    def do_POST(self):
+        config = self.server.config
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        self.server.request_count += 1
+
+        retry_after = self._check_rate_limit(config["rate_limit"])
+        if retry_after is not None:
+            self._send_json(429, {"error": {"message": "rate limited"}},
+                            {"Retry-After": f"{retry_after:.1f}"})
+            return
+
+        time.sleep(max(0.0, config["latency"] + random.uniform(0, config["jitter"])))
+
+        if random.random() < config["error_rate"]:
+            self._send_json(config["error_status"], {"error": {"message": "mock error"}})
+            return
+
+        prompt = body.get("messages", [{}])[-1].get("content", "")
+        content = mock_parse_content(prompt) if '"product_category"' in prompt else mock_prune_content(prompt)
+        if body.get("stream"):
+            self._send_stream(content, config["token_delay"])
+            return
+        self._send_json(200, {
+            "id": f"mock-{self.server.request_count}",
+            "model": body.get("model", "mock"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}}]
+        })
+
+    def _check_rate_limit(self, rate_limit: int):
+        """滑动窗口限流，超限时返回建议的重试等待秒数"""
+        if rate_limit <= 0:
+            return None
+        now = time.monotonic()
+        with self.server.rate_lock:
+            window = self.server.request_times
+            while window and now - window[0] >= 60:
+                window.popleft()
+            if len(window) >= rate_limit:
+                return 60 - (now - window[0])
+            window.append(now)
+        return None
+
+    def _send_json(self, status: int, payload: Dict[str, Any], headers: Dict[str, str] = None):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        try:
+            self.send_response(status)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            # 对冲竞争中落败的请求会被客户端提前断开
+            pass
+
+    def _send_stream(self, content: str, token_delay: float, chunk_size: int = 4):
+        """以SSE格式逐段发送内容，模拟逐token生成"""
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            # 流式响应没有Content-Length，发送完毕后关闭连接
+            self.send_header("Connection", "close")
+            self.close_connection = True
+            self.end_headers()
+            for start in range(0, len(content), chunk_size):
+                chunk = {"choices": [{"index": 0, "delta": {"content": content[start:start + chunk_size]}}]}
+                self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+                time.sleep(token_delay)
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+def start_mock_server(port: int = 0, latency: float = 0.2, jitter: float = 0.0,
+                      error_rate: float = 0.0, error_status: int = 500,
+                      token_delay: float = 0.01, rate_limit: int = 0) -> ThreadingHTTPServer:
+    """
+    在后台线程中启动模拟服务
+
+    Args:
+        port: 监听端口，0表示自动分配
+        latency: 基础延迟（秒）
+        jitter: 额外随机延迟上限（秒）
+        error_rate: 返回错误的概率
+        error_status: 错误时返回的状态码
+        token_delay: 流式输出时每段之间的间隔（秒）
+        rate_limit: 每分钟允许的请求数，超出时返回429和Retry-After，0表示不限流
+
+    Returns:
+        服务实例，base_url 属性为可直接配置到 LLM_ENDPOINTS 的地址
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), MockLLMHandler)
+    server.daemon_threads = True
+    server.config = {
+        "latency": latency, "jitter": jitter,
+        "error_rate": error_rate, "error_status": error_status,
+        "token_delay": token_delay, "rate_limit": rate_limit
+    }
+    server.request_count = 0
+    server.request_times = deque()
+    server.rate_lock = threading.Lock()
+    server.base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    """主函数"""
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="本地模拟大模型服务")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--token-delay", type=float, default=0.01)
+    parser.add_argument("--rate-limit", type=int, default=0)
+    args = parser.parse_args()
+
+    server = start_mock_server(args.port, args.latency, args.jitter, args.error_rate,
+                               args.error_status, args.token_delay, args.rate_limit)
+    logger.info(f"模拟大模型服务已启动: {server.base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Neo4j连接配置
+服务和导入工具共用的驱动与会话参数，全部来自环境变量：
+- NEO4J_URI 使用 `neo4j://`（或 `neo4j+s://`）时驱动按路由表访问集群，读事务分散到各个只读成员；
+  `bolt://` 直连单个实例
+- NEO4J_DATABASE 数据库名称，不设置时使用服务端默认数据库（显式指定可省去每次解析默认库的往返）
+- NEO4J_MAX_POOL_SIZE、NEO4J_ACQUISITION_TIMEOUT 驱动连接池大小和获取连接的超时（秒）
+- NEO4J_FETCH_SIZE 每批从服务端拉取的行数
+- NEO4J_MAX_RETRY_TIME 托管事务遇到瞬时错误（死锁、切主、成员不可用）时的最长重试时间（秒）
+- NEO4J_BOOKMARKS_FILE 导入工具写入的因果书签文件，服务的读事务从这些书签开始，
+  保证在集群任一成员上都能读到导入的数据
+"""
+
+import json
+import logging
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Neo4jSettings:
+    """Neo4j驱动和会话配置"""
+    uri: str = "bolt://localhost:7687"
+    username: str = "neo4j"
+    password: str = "password"
+    database: Optional[str] = None
+    max_connection_pool_size: int = 100
+    connection_acquisition_timeout: float = 60.0
+    fetch_size: int = 1000
+    max_transaction_retry_time: float = 30.0
+    bookmarks_file: Optional[str] = None
+
+    @classmethod
+    def from_env(cls) -> "Neo4jSettings":
+        """根据环境变量创建配置"""
+        return cls(
+            uri=os.getenv("NEO4J_URI", "bolt://localhost:7687"),
+            username=os.getenv("NEO4J_USERNAME", "neo4j"),
+            password=os.getenv("NEO4J_PASSWORD", "password"),
+            database=os.getenv("NEO4J_DATABASE") or None,
+            max_connection_pool_size=int(os.getenv("NEO4J_MAX_POOL_SIZE", "100")),
+            connection_acquisition_timeout=float(os.getenv("NEO4J_ACQUISITION_TIMEOUT", "60")),
+            fetch_size=int(os.getenv("NEO4J_FETCH_SIZE", "1000")),
+            max_transaction_retry_time=float(os.getenv("NEO4J_MAX_RETRY_TIME", "30")),
+            bookmarks_file=os.getenv("NEO4J_BOOKMARKS_FILE") or None
+        )
+
+    @property
+    def auth(self) -> Tuple[str, str]:
+        """认证信息"""
+        return self.username, self.password
+
+    def create_driver(self):
+        """创建驱动（调用时才导入neo4j）"""
+        from neo4j import GraphDatabase
+        return GraphDatabase.driver(
+            self.uri,
+            auth=self.auth,
+            max_connection_pool_size=self.max_connection_pool_size,
+            connection_acquisition_timeout=self.connection_acquisition_timeout,
+            max_transaction_retry_time=self.max_transaction_retry_time
+        )
+
+    def create_bookmark_manager(self, bookmarks: Optional[Iterable[str]] = None):
+        """
+        创建书签管理器，使用同一个管理器的会话之间保持因果一致
+
+        Args:
+            bookmarks: 初始书签，默认读取书签文件（没有配置或文件不存在时为空）
+        """
+        from neo4j import Bookmarks, GraphDatabase
+        if bookmarks is None:
+            bookmarks = load_bookmarks(self.bookmarks_file) if self.bookmarks_file else []
+        return GraphDatabase.bookmark_manager(initial_bookmarks=Bookmarks.from_raw_values(list(bookmarks)))
+
+    def read_session_kwargs(self, bookmark_manager=None) -> Dict[str, Any]:
+        """只读会话的参数：路由到只读成员，按配置的批量拉取"""
+        from neo4j import READ_ACCESS
+        kwargs: Dict[str, Any] = {"default_access_mode": READ_ACCESS, "fetch_size": self.fetch_size}
+        if self.database:
+            kwargs["database"] = self.database
+        if bookmark_manager is not None:
+            kwargs["bookmark_manager"] = bookmark_manager
+        return kwargs
+
+    def write_session_kwargs(self, bookmark_manager=None) -> Dict[str, Any]:
+        """写会话的参数（导入工具和PROFILE检查使用），路由到集群的主成员"""
+        kwargs: Dict[str, Any] = {}
+        if self.database:
+            kwargs["database"] = self.database
+        if bookmark_manager is not None:
+            kwargs["bookmark_manager"] = bookmark_manager
+        return kwargs
+
+
+def load_bookmarks(path: str) -> List[str]:
+    """读取书签文件，文件不存在或损坏时返回空列表"""
+    if not os.path.exists(path):
+        return []
+    try:
+        with open(path, encoding="utf-8") as file:
+            bookmarks = json.load(file)
+    except (OSError, ValueError) as e:
+        logger.warning(f"读取书签文件失败，忽略: {e}")
+        return []
+    return [bookmark for bookmark in bookmarks if isinstance(bookmark, str)]
+
+
+def save_bookmarks(path: str, bookmarks: Iterable[str]):
+    """原子写入书签文件"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(sorted(bookmarks), file)
+    os.replace(tmp_path, path)
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+大模型解析请求的动态微批
+并发请求各自发送约800 token的解析提示词，每次调用的固定开销和服务商的请求数配额都被浪费。
+微批器在一个很短的窗口内（默认20毫秒，或攒满N条查询时立即发出）收集解析请求，合并为一个提示词，
+要求模型按顺序返回JSON数组，再把各元素分发回各自的调用方：
+- 窗口内只有一条查询时直接按单条解析（保留流式逐字段回调）
+- 同一窗口内的相同查询只发送一次
+- 数组整体无效或某个元素校验失败时，该元素单独重新解析，不影响同批的其他查询
+"""
+
+import asyncio
+import logging
+import os
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+FieldCallback = Callable[[str, Any], None]
+# 批量解析：查询列表 -> 与查询一一对应的结果（元素无效时为None），整批失败时返回None
+BatchParser = Callable[[List[str]], Awaitable[Optional[List[Optional[Dict[str, Any]]]]]]
+# 单条解析：(查询, 逐字段回调) -> 结果，失败时返回None
+SingleParser = Callable[[str, Optional[FieldCallback]], Awaitable[Optional[Dict[str, Any]]]]
+
+
+@dataclass
+class ParseBatchConfig:
+    """微批配置"""
+    # 收集窗口（毫秒），0表示不启用微批
+    window_ms: float = 0.0
+    # 攒满该数量的不同查询时立即发出
+    max_size: int = 8
+
+    @classmethod
+    def from_env(cls) -> "ParseBatchConfig":
+        """根据环境变量创建配置"""
+        return cls(
+            window_ms=float(os.getenv("PARSE_BATCH_WINDOW_MS", "0")),
+            max_size=int(os.getenv("PARSE_BATCH_MAX_SIZE", "8"))
+        )
+
+    @property
+    def enabled(self) -> bool:
+        """是否启用微批"""
+        return self.window_ms > 0 and self.max_size > 1
+
+
+class ParseBatcher:
+    """收集并发的解析请求，按窗口合并为批量调用（在事件循环内使用）"""
+
+    def __init__(self, parse_batch: BatchParser, parse_single: SingleParser, config: ParseBatchConfig):
+        self.parse_batch = parse_batch
+        self.parse_single = parse_single
+        self.config = config
+        # 查询 -> 等待该查询结果的 (逐字段回调, Future) 列表
+        self._pending: "OrderedDict[str, List[Tuple[Optional[FieldCallback], asyncio.Future]]]" = OrderedDict()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self.batches = 0
+        self.batched_queries = 0
+        self.single_calls = 0
+        self.fallbacks = 0
+        self.deduplicated = 0
+
+    async def submit(self, query: str, on_field: Optional[FieldCallback] = None) -> Optional[Dict[str, Any]]:
+        """
+        提交一条解析请求，等待所在批次完成
+
+        Args:
+            query: 用户查询
+            on_field: 逐字段回调；批量解析的结果到达后依次回调各字段
+
+        Returns:
+            解析结果，批量和单条解析都失败时返回None
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        waiters = self._pending.get(query)
+        if waiters is None:
+            self._pending[query] = [(on_field, future)]
+        else:
+            self.deduplicated += 1
+            waiters.append((on_field, future))
+
+        if len(self._pending) >= self.config.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.config.window_ms / 1000, self._flush)
+        return await future
+
+    def _flush(self):
+        """发出当前窗口内收集的请求"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, OrderedDict()
+        task = asyncio.ensure_future(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: "OrderedDict[str, List[Tuple[Optional[FieldCallback], asyncio.Future]]]"):
+        """执行一个批次并把结果分发给各调用方"""
+        queries = list(batch)
+        try:
+            if len(queries) == 1:
+                results = [await self._parse_single(queries[0], batch[queries[0]])]
+            else:
+                results = await self._parse_batch(queries, batch)
+        except Exception as e:
+            logger.error(f"批量解析失败: {e}")
+            for waiters in batch.values():
+                for _, future in waiters:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+
+        for query, result in zip(queries, results):
+            for _, future in batch[query]:
+                if not future.done():
+                    future.set_result(result)
+
+    async def _parse_single(self, query: str,
+                            waiters: List[Tuple[Optional[FieldCallback], asyncio.Future]]) -> Optional[Dict[str, Any]]:
+        """单条解析，逐字段回调转发给等待同一查询的全部调用方"""
+        self.single_calls += 1
+        callbacks = [on_field for on_field, _ in waiters if on_field is not None]
+
+        def forward(key: str, value: Any):
+            for on_field in callbacks:
+                on_field(key, value)
+
+        return await self.parse_single(query, forward if callbacks else None)
+
+    async def _parse_batch(self, queries: List[str],
+                           batch: "OrderedDict[str, List[Tuple[Optional[FieldCallback], asyncio.Future]]]"
+                           ) -> List[Optional[Dict[str, Any]]]:
+        """批量解析，失败的元素单独重新解析"""
+        self.batches += 1
+        self.batched_queries += len(queries)
+        try:
+            results = await self.parse_batch(queries)
+        except Exception as e:
+            logger.error(f"批量解析调用异常: {e}")
+            results = None
+        if results is None:
+            logger.warning(f"批量解析 {len(queries)} 条查询失败，逐条重新解析")
+            results = [None] * len(queries)
+        results = list(results)
+
+        for query, result in zip(queries, results):
+            if result is None:
+                continue
+            for on_field, _ in batch[query]:
+                if on_field is not None:
+                    for key, value in result.items():
+                        on_field(key, value)
+
+        failed = [index for index, result in enumerate(results) if result is None]
+        if failed:
+            self.fallbacks += len(failed)
+            retried = await asyncio.gather(*(self._parse_single(queries[index], batch[queries[index]])
+                                             for index in failed))
+            for index, result in zip(failed, retried):
+                results[index] = result
+        logger.info(f"批量解析 {len(queries)} 条查询，单独重新解析 {len(failed)} 条")
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        """微批统计"""
+        return {
+            "window_ms": self.config.window_ms,
+            "max_size": self.config.max_size,
+            "batches": self.batches,
+            "batched_queries": self.batched_queries,
+            "mean_batch_size": round(self.batched_queries / self.batches, 2) if self.batches else 0.0,
+            "single_calls": self.single_calls,
+            "fallbacks": self.fallbacks,
+            "deduplicated": self.deduplicated
+        }
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+请求流水线
+将一次查询拆成带依赖关系的阶段（DAG），没有依赖的阶段在时刻0同时启动，
+每个阶段在其依赖全部完成后立即开始，关键路径只由真正有依赖的阶段决定
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PipelineStage:
+    """流水线阶段：func以关键字参数接收各依赖阶段的结果"""
+    name: str
+    func: Callable[..., Awaitable[Any]]
+    deps: Tuple[str, ...] = ()
+
+
+class PipelineDAG:
+    """按依赖关系并发执行的阶段图"""
+
+    def __init__(self, stages: List[PipelineStage]):
+        self.stages = {stage.name: stage for stage in stages}
+        self.timings: Dict[str, Tuple[float, float]] = {}
+        self._order = self._topological_order()
+
+    def _topological_order(self) -> List[str]:
+        """校验依赖并返回拓扑序，依赖缺失或有环时抛出ValueError"""
+        order = []
+        visiting = set()
+
+        def visit(name: str):
+            if name in order:
+                return
+            if name in visiting:
+                raise ValueError(f"流水线存在循环依赖: {name}")
+            if name not in self.stages:
+                raise ValueError(f"流水线缺少阶段: {name}")
+            visiting.add(name)
+            for dep in self.stages[name].deps:
+                visit(dep)
+            visiting.discard(name)
+            order.append(name)
+
+        for name in self.stages:
+            visit(name)
+        return order
+
+    async def run(self) -> Dict[str, Any]:
+        """
+        执行所有阶段
+
+        Returns:
+            阶段名到阶段结果的映射；任一阶段失败时取消其余阶段并抛出异常
+        """
+        origin = time.monotonic()
+        tasks: Dict[str, asyncio.Future] = {}
+
+        async def run_stage(stage: PipelineStage) -> Any:
+            dep_results = await asyncio.gather(*(tasks[dep] for dep in stage.deps))
+            started = time.monotonic() - origin
+            result = await stage.func(**dict(zip(stage.deps, dep_results)))
+            self.timings[stage.name] = (started, time.monotonic() - origin)
+            return result
+
+        for name in self._order:
+            tasks[name] = asyncio.ensure_future(run_stage(self.stages[name]))
+
+        try:
+            results = await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+        return dict(zip(tasks.keys(), results))
+
+    def timing_summary(self) -> str:
+        """各阶段起止时间（毫秒），按开始时间排列"""
+        return ", ".join(
+            f"{name}: {start * 1000:.0f}-{end * 1000:.0f}ms"
+            for name, (start, end) in sorted(self.timings.items(), key=lambda item: item[1][0])
+        )
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+价格区间索引
+图谱中的预算档位因子（`1000元以下`、`2000-3000元`、`6000元以上`……）按数值区间建立索引，
+解析出的价格表达（`3000元左右`、`2000元以内`、`2000-3000元`、`5千以上`）同样换算为区间，
+与之重叠的档位作为带权重的种子参与检索，不重叠的档位从关系集合中排除
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# 价格附近（左右、大概、预算）按上下浮动的比例换算为区间
+APPROXIMATE_MARGIN = 0.15
+
+UNITS = {"万": 10000, "千": 1000, "k": 1000, "K": 1000}
+NUMBER = r"(\d+(?:\.\d+)?)\s*(万|千|k|K)?"
+RANGE_PATTERN = re.compile(NUMBER + r"\s*(?:元|块)?\s*(?:-|~|～|—|到|至)\s*" + NUMBER)
+NUMBER_PATTERN = re.compile(NUMBER)
+UPPER_BOUND_WORDS = ("以内", "以下", "之内", "不超过", "不到", "低于", "最多", "封顶")
+LOWER_BOUND_WORDS = ("以上", "起步", "不低于", "至少", "超过", "高于")
+
+BAND_RANGE = re.compile(r"^(\d+)-(\d+)元$")
+BAND_BELOW = re.compile(r"^(\d+)元以下$")
+BAND_ABOVE = re.compile(r"^(\d+)元以上$")
+
+Interval = Tuple[float, float]
+
+
+def _amount(number: str, unit: Optional[str]) -> float:
+    """数字和单位换算为元"""
+    return float(number) * UNITS.get(unit or "", 1)
+
+
+def parse_price_range(text: str) -> Optional[Interval]:
+    """
+    将价格表达换算为数值区间
+
+    Args:
+        text: 解析结果中的price_range，如 `3000元左右`、`2000-3000元`、`2000元以内`、`5千以上`
+
+    Returns:
+        (下限, 上限)，上限可以为inf；无法识别时返回None
+    """
+    if not text:
+        return None
+    match = RANGE_PATTERN.search(text)
+    if match:
+        low = _amount(match.group(1), match.group(2) or match.group(4))
+        high = _amount(match.group(3), match.group(4))
+        return (min(low, high), max(low, high))
+
+    match = NUMBER_PATTERN.search(text)
+    if not match:
+        return None
+    value = _amount(match.group(1), match.group(2))
+    if any(word in text for word in UPPER_BOUND_WORDS):
+        return (0.0, value)
+    if any(word in text for word in LOWER_BOUND_WORDS):
+        return (value, float("inf"))
+    return (value * (1 - APPROXIMATE_MARGIN), value * (1 + APPROXIMATE_MARGIN))
+
+
+def parse_band_name(name: str) -> Optional[Interval]:
+    """预算档位因子名称对应的区间，不是档位名称时返回None"""
+    match = BAND_RANGE.match(name)
+    if match:
+        return (float(match.group(1)), float(match.group(2)))
+    match = BAND_BELOW.match(name)
+    if match:
+        return (0.0, float(match.group(1)))
+    match = BAND_ABOVE.match(name)
+    if match:
+        return (float(match.group(1)), float("inf"))
+    return None
+
+
+@dataclass(frozen=True)
+class PriceBand:
+    """预算档位"""
+    name: str
+    low: float
+    high: float
+
+
+class PriceIndex:
+    """品类内预算档位的区间索引"""
+
+    def __init__(self, factor_names: Iterable[str]):
+        bands = []
+        for name in factor_names:
+            interval = parse_band_name(name)
+            if interval is not None:
+                bands.append(PriceBand(name, *interval))
+        self.bands: List[PriceBand] = sorted(bands, key=lambda band: (band.low, band.high))
+        self.band_names = {band.name for band in self.bands}
+
+    def weights(self, interval: Interval) -> Dict[str, float]:
+        """
+        与价格区间重叠的档位及其权重，按权重由高到低排列（权重相同时按价格由低到高）
+
+        - 有限区间：权重为档位与价格区间的重叠长度占价格区间长度的比例，只在边界上相接的档位不算重叠
+        - 无上限区间（如 `3000元以上`）：完全落在区间内的档位（包括无上限档位）权重相同，
+          部分落在区间内的有限档位按被覆盖的比例折算，权重归一化后总和为1
+        - 单个价格（如 `3000-3000元`）：包含该价格的档位，边界价格归入以它为下限的档位
+
+        Returns:
+            {档位名称: 权重}
+        """
+        low, high = interval
+        if high == float("inf"):
+            weights = self._open_ended_weights(low)
+        elif high == low:
+            weights = {band.name: 1.0 for band in self.bands if band.low <= low < band.high}
+        else:
+            weights = {}
+            for band in self.bands:
+                overlap = min(high, band.high) - max(low, band.low)
+                if overlap > 0:
+                    weights[band.name] = round(overlap / (high - low), 4)
+        return dict(sorted(weights.items(), key=lambda item: item[1], reverse=True))
+
+    def _open_ended_weights(self, low: float) -> Dict[str, float]:
+        """无上限区间的档位权重：各档位被区间覆盖的比例归一化"""
+        coverage = {}
+        for band in self.bands:
+            if band.high == float("inf"):
+                coverage[band.name] = 1.0
+            elif band.high > low:
+                coverage[band.name] = (band.high - max(low, band.low)) / (band.high - band.low)
+        total = sum(coverage.values())
+        return {name: round(value / total, 4) for name, value in coverage.items()} if total else {}
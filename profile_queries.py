@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Cypher查询PROFILE回归检查
+对 cypher_queries.QUERIES 中登记的每条查询，用示例参数在本地库的专用分区（`手机__profile`，导入data.txt）上执行PROFILE，
+记录db hits、返回行数和算子类型，并与基线对比：
+任何查询的执行计划退化为全表/全标签扫描，或db hits明显高于基线时以非零状态退出。
+另外不带PROFILE再执行一次，记录取回并按位置解码全部行的耗时和结果数据量（JSON编码后的字节数，近似Bolt传输量），
+数据量明显高于基线（例如又改回返回完整的节点和关系对象）同样视为回归。
+导入和清理只涉及专用分区，不影响服务使用的品类分区
+
+用法：
+    python profile_queries.py --update-baseline   # 导入专用分区并记录基线
+    python profile_queries.py --check             # 与基线对比，回归时退出码为1
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from typing import Any, Dict, List
+
+from dotenv import load_dotenv
+
+from category_graph import load_category_configs
+from cypher_queries import QUERIES, CypherQuery
+from import_data_to_neo4j import Neo4jImporter
+from neo4j_settings import Neo4jSettings
+
+load_dotenv()
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), "query_profiles.json")
+
+# PROFILE使用的专用分区，导入默认品类的数据文件；查询示例参数中的品类替换为该分区
+PROFILE_CATEGORY = "手机__profile"
+
+# 说明查询没有走索引的算子
+FULL_SCAN_OPERATORS = {
+    "AllNodesScan", "NodeByLabelScan",
+    "DirectedAllRelationshipsScan", "UndirectedAllRelationshipsScan"
+}
+
+
+def _walk_plan(plan: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """展开执行计划树"""
+    operators = [plan]
+    for child in plan.get("children", []):
+        operators.extend(_walk_plan(child))
+    return operators
+
+
+def profile_query(session, query: CypherQuery, category: str = PROFILE_CATEGORY) -> Dict[str, Any]:
+    """
+    对单条查询执行PROFILE
+
+    Args:
+        session: Neo4j会话
+        query: 登记的查询
+        category: 执行查询的品类分区，替换示例参数中的品类
+
+    Returns:
+        包含db_hits、rows、operators、fetch_ms和payload_bytes的统计
+    """
+    params = {**query.sample_params, "category": category} if "category" in query.sample_params else query.sample_params
+    result = session.run(f"PROFILE {query.text}", params)
+    rows = len(list(result))
+    plan = result.consume().profile or {}
+
+    operators = []
+    db_hits = 0
+    for operator in _walk_plan(plan):
+        operators.append(operator.get("operatorType", "").split("@")[0])
+        db_hits += operator.get("dbHits", operator.get("db_hits", 0)) or 0
+
+    started = time.perf_counter()
+    values = session.run(query.text, params).values()
+    fetch_ms = (time.perf_counter() - started) * 1000
+    payload = json.dumps(values, ensure_ascii=False, default=str).encode("utf-8")
+
+    return {
+        "db_hits": db_hits,
+        "rows": rows,
+        "operators": operators,
+        "full_scans": sorted(set(operators) & FULL_SCAN_OPERATORS),
+        "fetch_ms": round(fetch_ms, 2),
+        "payload_bytes": len(payload)
+    }
+
+
+def profile_all(session, category: str = PROFILE_CATEGORY) -> Dict[str, Dict[str, Any]]:
+    """对注册表中参与回归检查的全部查询在指定分区上执行PROFILE"""
+    return {name: profile_query(session, query, category) for name, query in QUERIES.items() if query.profiled}
+
+
+def load_baseline(path: str = BASELINE_FILE) -> Dict[str, Dict[str, Any]]:
+    """读取基线文件，不存在时返回空字典"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
+
+
+def check_regressions(profiles: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]],
+                      tolerance: float) -> List[str]:
+    """
+    与基线对比，返回回归问题列表
+
+    Args:
+        profiles: 本次PROFILE结果
+        baseline: 基线PROFILE结果
+        tolerance: db hits和结果数据量允许相对基线增长的倍数
+    """
+    problems = []
+    for name, profile in profiles.items():
+        if profile["full_scans"]:
+            problems.append(f"{name}: 执行计划包含全表扫描 {profile['full_scans']}")
+        expected = baseline.get(name)
+        if expected is None:
+            problems.append(f"{name}: 没有基线记录，请用 --update-baseline 重新生成基线并提交")
+            continue
+        if expected["db_hits"] and profile["db_hits"] > expected["db_hits"] * tolerance:
+            problems.append(
+                f"{name}: db hits {profile['db_hits']} 超过基线 {expected['db_hits']} 的 {tolerance} 倍"
+            )
+        expected_bytes = expected.get("payload_bytes")
+        if expected_bytes and profile["payload_bytes"] > expected_bytes * tolerance:
+            problems.append(
+                f"{name}: 结果数据量 {profile['payload_bytes']} 字节超过基线 {expected_bytes} 的 {tolerance} 倍"
+            )
+    return problems
+
+
+def seed_profile_partition(importer: Neo4jImporter, category: str = PROFILE_CATEGORY) -> bool:
+    """重新导入PROFILE专用分区（默认品类的数据文件），只清空该分区"""
+    config = next(iter(load_category_configs().values()))
+    statements = importer.read_cypher_file(os.path.join(os.path.dirname(__file__), config.data_file))
+    if not (importer.clear_category(category) and importer.create_category_indexes()):
+        return False
+    if not importer.import_statements(importer.tag_category(statements, category)):
+        return False
+    return importer.stamp_graph_version(category) is not None
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="Cypher查询PROFILE回归检查")
+    parser.add_argument("--update-baseline", action="store_true", help="将本次结果写入基线文件")
+    parser.add_argument("--check", action="store_true", help="与基线对比，出现回归时退出码为1")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--tolerance", type=float, default=2.0)
+    args = parser.parse_args()
+
+    settings = Neo4jSettings.from_env()
+    importer = Neo4jImporter(settings.uri, settings.username, settings.password, settings.database)
+    if not importer.connect():
+        logger.error("无法连接到Neo4j数据库")
+        sys.exit(1)
+    try:
+        if not seed_profile_partition(importer):
+            logger.error(f"导入PROFILE分区 {PROFILE_CATEGORY} 失败")
+            sys.exit(1)
+        with importer._session() as session:
+            profiles = profile_all(session)
+    finally:
+        importer.clear_category(PROFILE_CATEGORY)
+        importer.close()
+
+    print(f"\n{'查询':<32}{'db hits':>10}{'rows':>8}{'fetch ms':>10}{'bytes':>10}  全表扫描")
+    for name, profile in profiles.items():
+        print(f"{name:<32}{profile['db_hits']:>10}{profile['rows']:>8}{profile['fetch_ms']:>10}"
+              f"{profile['payload_bytes']:>10}  {', '.join(profile['full_scans']) or '-'}")
+
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as file:
+            json.dump(profiles, file, ensure_ascii=False, indent=2)
+        logger.info(f"已写入基线: {args.baseline}")
+
+    if args.check:
+        problems = check_regressions(profiles, load_baseline(args.baseline), args.tolerance)
+        for problem in problems:
+            logger.error(problem)
+        if problems:
+            sys.exit(1)
+        logger.info("所有查询的执行计划均未回归")
+
+
+if __name__ == "__main__":
+    main()
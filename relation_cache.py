@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+种子关系缓存
+种子节点的多度关系只取决于 (品类, 节点名称, 度数配置, 图谱版本)，而学生群体、续航这类种子在请求中反复出现。
+缓存以读穿透方式挡在图谱查询之前：按条目估算的字节数计入容量，超出容量时按LRU淘汰；
+某个品类的图谱版本变化时，该品类的全部条目立即失效。
+
+同一台机器上的多个工作进程还可以共享一层 SharedCache（SQLite WAL），进程内缓存作为L1挡在前面：
+一个进程算出的解析、种子关系和剪枝结果对其他进程立即可见，命中率随整机流量而不是单进程流量增长
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CacheEntry:
+    """缓存条目"""
+    value: Any
+    size: int
+
+
+class RelationCache:
+    """按字节容量LRU淘汰、按品类图谱版本失效的读穿透缓存"""
+
+    def __init__(self, max_bytes: int = 16 * 1024 * 1024, sizeof: Callable[[Any], int] = lambda value: 1):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._entries: "OrderedDict[Tuple[str, Hashable], CacheEntry]" = OrderedDict()
+        # 每个品类当前的图谱版本
+        self._versions: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, category: str, version: str, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """
+        读取缓存，未命中时调用loader加载并写入
+
+        Args:
+            category: 品类名称
+            version: 品类当前的图谱版本，与已缓存的版本不同时先清空该品类
+            key: 品类内的缓存键
+            loader: 加载函数
+
+        Returns:
+            缓存值或loader的返回值
+        """
+        value = self.lookup(category, version, key)
+        if value is not None:
+            return value
+
+        # 在锁外加载，慢查询不阻塞其他种子
+        value = loader()
+        self.put(category, version, key, value)
+        return value
+
+    def lookup(self, category: str, version: str, key: Hashable) -> Optional[Any]:
+        """只读取缓存，未命中时返回None（计入命中率统计）"""
+        cache_key = (category, key)
+        with self._lock:
+            self._check_version(category, version)
+            entry = self._entries.get(cache_key)
+            if entry is not None:
+                self._entries.move_to_end(cache_key)
+                self.hits += 1
+                return entry.value
+            self.misses += 1
+            return None
+
+    def put(self, category: str, version: str, key: Hashable, value: Any):
+        """写入缓存，超出容量时按LRU淘汰"""
+        size = self.sizeof(value)
+        cache_key = (category, key)
+        with self._lock:
+            # 加载期间图谱版本已变化时不写入旧版本的结果
+            if self._versions.get(category) != version or size > self.max_bytes:
+                return
+            existing = self._entries.pop(cache_key, None)
+            if existing is not None:
+                self.bytes -= existing.size
+            self._entries[cache_key] = CacheEntry(value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self.bytes -= evicted.size
+                self.evictions += 1
+
+    def invalidate(self, category: Optional[str] = None):
+        """使某个品类（或全部品类）的条目失效"""
+        with self._lock:
+            if category is None:
+                removed = len(self._entries)
+                self._entries.clear()
+                self._versions.clear()
+                self.bytes = 0
+            else:
+                removed = self._drop_category(category)
+                self._versions.pop(category, None)
+            self.invalidations += removed
+
+    def stats(self) -> Dict[str, Any]:
+        """命中率、容量占用和淘汰统计"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations
+            }
+
+    def _check_version(self, category: str, version: str):
+        """品类图谱版本变化时清空该品类的条目（调用方持有锁）"""
+        current = self._versions.get(category)
+        if current == version:
+            return
+        if current is not None:
+            removed = self._drop_category(category)
+            self.invalidations += removed
+            logger.info(f"品类 {category} 图谱版本变化 ({current} -> {version})，种子关系缓存失效 {removed} 条")
+        self._versions[category] = version
+
+    def _drop_category(self, category: str) -> int:
+        """删除某个品类的全部条目（调用方持有锁）"""
+        keys = [cache_key for cache_key in self._entries if cache_key[0] == category]
+        for cache_key in keys:
+            self.bytes -= self._entries.pop(cache_key).size
+        return len(keys)
+
+
+class SharedCache:
+    """
+    同机多进程共享的缓存层，基于SQLite WAL
+
+    WAL模式下读写互不阻塞，读取走共享内存映射；每次写入都是一个独立事务，其他进程不会读到写了一半的条目。
+    条目带有版本号（通常是图谱版本），读取时版本不一致即视为未命中并删除；
+    没有内容版本号的数据（如Neo4j后端的结果）写入时可以指定存活时间
+    """
+
+    def __init__(self, path: str, max_bytes: int = 256 * 1024 * 1024, trim_interval: int = 200):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.trim_interval = trim_interval
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._puts = 0
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.writes = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "namespace TEXT NOT NULL, key TEXT NOT NULL, version TEXT NOT NULL, "
+                "value BLOB NOT NULL, size INTEGER NOT NULL, created REAL NOT NULL, expires REAL, "
+                "PRIMARY KEY (namespace, key))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_created ON entries (created)")
+
+    def _connection(self) -> sqlite3.Connection:
+        """每个线程一个连接（sqlite3连接不能跨线程使用）"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA mmap_size=268435456")
+            self._local.conn = conn
+        return conn
+
+    def get(self, namespace: str, version: str, key: str) -> Optional[Any]:
+        """
+        读取条目
+
+        Returns:
+            JSON解码后的值；不存在、版本不一致或已过期时返回None
+        """
+        try:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT version, value, expires FROM entries WHERE namespace = ? AND key = ?",
+                (namespace, key)
+            ).fetchone()
+            if row is not None and (row[0] != version or (row[2] is not None and row[2] < time.time())):
+                conn.execute("DELETE FROM entries WHERE namespace = ? AND key = ? AND version = ?",
+                             (namespace, key, row[0]))
+                with self._lock:
+                    self.stale += 1
+                row = None
+        except sqlite3.Error as e:
+            logger.warning(f"共享缓存读取失败: {e}")
+            row = None
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[1])
+
+    def put(self, namespace: str, version: str, key: str, value: Any, ttl: Optional[float] = None):
+        """写入条目（单个事务，原子替换同键的旧条目）"""
+        data = json.dumps(value, ensure_ascii=False).encode("utf-8")
+        now = time.time()
+        try:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO entries (namespace, key, version, value, size, created, expires) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (namespace, key, version, data, len(data), now, now + ttl if ttl else None)
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"共享缓存写入失败: {e}")
+            return
+        with self._lock:
+            self.writes += 1
+            self._puts += 1
+            should_trim = self._puts >= self.trim_interval
+            if should_trim:
+                self._puts = 0
+        if should_trim:
+            self.trim()
+
+    def trim(self):
+        """删除过期条目，总大小超出容量时从最早写入的条目开始删除"""
+        try:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("DELETE FROM entries WHERE expires IS NOT NULL AND expires < ?", (time.time(),))
+                total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+                if total > self.max_bytes:
+                    excess = total - self.max_bytes
+                    conn.execute(
+                        "DELETE FROM entries WHERE rowid IN ("
+                        "SELECT rowid FROM (SELECT rowid, size, SUM(size) OVER (ORDER BY created, rowid) AS running "
+                        "FROM entries) WHERE running - size < ?)",
+                        (excess,)
+                    )
+                conn.execute("COMMIT")
+            except sqlite3.Error:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            logger.warning(f"共享缓存清理失败: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """本进程的共享缓存命中统计和整个缓存文件的占用"""
+        try:
+            entries, size = self._connection().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+        except sqlite3.Error:
+            entries, size = 0, 0
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "path": self.path,
+                "entries": entries,
+                "bytes": size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "stale": self.stale,
+                "writes": self.writes
+            }
+
+    def close(self):
+        """关闭当前线程的连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+分层关键词相关性打分
+规则剪枝按三层关键词给每个因子打分：明确需求（10分）、品类购买核心因子（5分）、用户群体/隐含需求/使用场景（3分），
+因子名称或所属类别包含关键词即得分，重要类别再加2分，每个类别按分数保留前N个。
+同一套权重也作为参数传给Cypher（node_relations_ranked），由数据库计算分数并按类别只返回前N行，
+传输的行数与报告实际展示的内容成正比
+"""
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Tuple
+
+HIGH_PRIORITY_WEIGHT = 10
+CORE_WEIGHT = 5
+CONTEXT_WEIGHT = 3
+IMPORTANT_CATEGORY_BONUS = 2
+
+# 第二层：基础需求（品类购买核心因子）
+CORE_KEYWORDS: Tuple[str, ...] = (
+    "性能", "价格", "续航", "拍照", "屏幕", "电池", "处理器", "内存", "存储",
+    "外观", "品牌", "系统", "网络", "充电", "散热", "音质", "材质", "尺寸"
+)
+
+# 重要类别（必须保留），另加上查询所属的品类名称
+IMPORTANT_CATEGORIES: Tuple[str, ...] = (
+    "性能评估", "价格考虑", "外观设计", "品牌选择",
+    "购买渠道", "明确需求", "用户体验", "技术参数"
+)
+
+
+@dataclass(frozen=True)
+class RelevanceRanking:
+    """由解析结果得到的关键词权重和各类别的保留数量（可哈希，用作缓存键的一部分）"""
+    # (关键词, 权重)，同一关键词出现在多层时分别计分
+    keywords: Tuple[Tuple[str, int], ...]
+    important_categories: Tuple[str, ...]
+    user_groups: Tuple[str, ...]
+
+    @classmethod
+    def from_parsed_query(cls, parsed_query: Dict[str, Any], product_category: str) -> "RelevanceRanking":
+        """根据解析结果构建打分规则"""
+        high_priority = set(parsed_query.get("explicit_needs", []))
+        context = set(parsed_query.get("user_groups", []))
+        context.update(parsed_query.get("implicit_needs", []))
+        context.update(parsed_query.get("usage_scenarios", []))
+        keywords = (
+            [(keyword, HIGH_PRIORITY_WEIGHT) for keyword in sorted(high_priority)]
+            + [(keyword, CORE_WEIGHT) for keyword in CORE_KEYWORDS]
+            + [(keyword, CONTEXT_WEIGHT) for keyword in sorted(context)]
+        )
+        return cls(
+            keywords=tuple(keywords),
+            important_categories=(product_category,) + IMPORTANT_CATEGORIES,
+            user_groups=tuple(parsed_query.get("user_groups", []))
+        )
+
+    def score(self, item: str, category: str) -> int:
+        """因子的相关性分数，0表示不相关"""
+        score = sum(weight for keyword, weight in self.keywords if keyword in item or keyword in category)
+        if category in self.important_categories:
+            score += IMPORTANT_CATEGORY_BONUS
+        return score
+
+    def top_k(self, category: str) -> int:
+        """类别保留的因子数量：重要类别12个，用户群体相关8个，其他6个"""
+        if category in self.important_categories:
+            return 12
+        if category in self.user_groups:
+            return 8
+        return 6
+
+    def cypher_params(self, category: str) -> Dict[str, Any]:
+        """
+        以类别（种子节点名称）为中心的排序查询参数
+
+        类别名称命中的关键词对该类别下所有因子都相同，预先计入base_score；
+        数据库只需对剩余关键词检查邻居名称
+        """
+        base_score = sum(weight for keyword, weight in self.keywords if keyword in category)
+        if category in self.important_categories:
+            base_score += IMPORTANT_CATEGORY_BONUS
+        keywords: List[Dict[str, Any]] = [
+            {"word": keyword, "weight": weight} for keyword, weight in self.keywords if keyword not in category
+        ]
+        return {"base_score": base_score, "keywords": keywords, "top_k": self.top_k(category)}
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+研究报告输出格式
+剪枝后的三层需求数据先整理为 ResearchReport，再由不同的格式化函数输出：
+Markdown（面向人阅读，内嵌一份完整关系数据）、dict、紧凑JSON和MessagePack（面向下游程序）。
+紧凑JSON在安装了orjson时使用orjson编码，MessagePack需要安装msgpack
+"""
+
+import json
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 第二层展示的核心购买决策类别
+CORE_CATEGORIES = ["性能评估", "价格考虑", "外观设计", "品牌选择"]
+
+ReportOutput = Union[str, bytes, Dict[str, Any]]
+
+
+@dataclass
+class ResearchReport:
+    """剪枝后的分层报告数据"""
+    query: str
+    product_category: str
+    user_groups: List[str]
+    explicit_needs: List[str]
+    relevant_relations: Dict[str, List[str]]
+    core_categories: List[str]
+    other_categories: List[str]
+    # 准入控制选择的处理模式（full、rule_prune、reduced_degree、rule_parse）
+    mode: str = "full"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """结构化数据（与Markdown报告中的完整关系数据一致）"""
+        return {
+            "query": self.query,
+            "analysis_layers": {
+                "most_relevant": {
+                    "user_groups": self.user_groups,
+                    "explicit_needs": self.explicit_needs
+                },
+                "core_factors": self.core_categories,
+                "implicit_factors": self.other_categories[:5]
+            },
+            "relevant_aspects": self.relevant_relations,
+            "mode": self.mode
+        }
+
+
+def build_report(query: str, parsed_query: Dict[str, Any], product_category: str,
+                 relevant_relations: Dict[str, List[str]], mode: str = "full") -> ResearchReport:
+    """根据解析结果和剪枝后的关系整理报告数据"""
+    user_groups = parsed_query.get("user_groups", [])
+    shown_categories = set(CORE_CATEGORIES + [ug for ug in user_groups if ug in relevant_relations])
+    other_categories = [
+        category for category in relevant_relations
+        if category not in shown_categories and category != product_category
+    ]
+    return ResearchReport(
+        query=query,
+        product_category=product_category,
+        user_groups=user_groups,
+        explicit_needs=parsed_query.get("explicit_needs", []),
+        relevant_relations=relevant_relations,
+        core_categories=CORE_CATEGORIES,
+        other_categories=other_categories,
+        mode=mode
+    )
+
+
+def format_markdown(report: ResearchReport) -> str:
+    """三层需求的深度研究报告（Markdown）"""
+    relevant_relations = report.relevant_relations
+    response_parts = []
+    response_parts.append(f"# {report.product_category}购买深度研究报告")
+    response_parts.append(f"**查询**: {report.query}")
+
+    # === 第一层：最相关需求 ===
+    response_parts.append(f"\n## 🎯 最相关需求匹配")
+
+    # 用户群体特别关注
+    for user_group in report.user_groups:
+        if user_group in relevant_relations:
+            group_concerns = relevant_relations[user_group]
+            if group_concerns:
+                response_parts.append(f"\n**{user_group}群体关注点**:")
+                for concern in group_concerns[:8]:  # 增加显示数量
+                    response_parts.append(f"• {concern}")
+
+    # 明确需求匹配
+    for need in report.explicit_needs:
+        # 寻找相关类别
+        related_categories = []
+        for category, items in relevant_relations.items():
+            if need in category or any(need in item for item in items):
+                related_categories.append(category)
+
+        if related_categories:
+            response_parts.append(f"\n**{need}需求相关**:")
+            for category in related_categories[:3]:  # 最多显示3个相关类别
+                if category in relevant_relations:
+                    items = relevant_relations[category][:6]
+                    response_parts.append(f"  - {category}: {', '.join(items)}")
+
+    # === 第二层：基础购买决策因子 ===
+    response_parts.append(f"\n## 📊 核心购买决策因子")
+
+    for category in report.core_categories:
+        if category in relevant_relations:
+            items = relevant_relations[category]
+            if items:
+                response_parts.append(f"\n**{category}**:")
+                for item in items[:10]:  # 增加显示数量
+                    response_parts.append(f"• {item}")
+
+    # === 第三层：隐含和周边因子 ===
+    response_parts.append(f"\n## 💡 隐含需求和周边考虑")
+
+    for category in report.other_categories[:5]:  # 显示更多其他类别
+        items = relevant_relations[category]
+        if items:
+            response_parts.append(f"\n**{category}**:")
+            for item in items[:8]:
+                response_parts.append(f"• {item}")
+
+    # === 结构化数据 ===
+    response_parts.append(f"\n## 📋 完整关系数据")
+    response_parts.append("```json")
+    response_parts.append(json.dumps(report.to_dict(), ensure_ascii=False, indent=2))
+    response_parts.append("```")
+
+    return '\n'.join(response_parts)
+
+
+def format_dict(report: ResearchReport) -> Dict[str, Any]:
+    """结构化数据，供进程内调用方直接使用"""
+    return report.to_dict()
+
+
+def format_json(report: ResearchReport) -> str:
+    """紧凑JSON（无缩进和多余空白），安装了orjson时使用orjson编码"""
+    if orjson is None:
+        return json.dumps(report.to_dict(), ensure_ascii=False, separators=(",", ":"))
+    return orjson.dumps(report.to_dict()).decode("utf-8")
+
+
+def format_msgpack(report: ResearchReport) -> bytes:
+    """MessagePack二进制编码"""
+    try:
+        import msgpack
+    except ImportError as e:
+        raise RuntimeError("msgpack格式需要安装msgpack: pip install msgpack") from e
+    return msgpack.packb(report.to_dict(), use_bin_type=True)
+
+
+FORMATTERS: Dict[str, Callable[[ResearchReport], ReportOutput]] = {
+    "markdown": format_markdown,
+    "dict": format_dict,
+    "json": format_json,
+    "msgpack": format_msgpack,
+}
+
+
+def format_report(report: ResearchReport, format: str = "markdown") -> ReportOutput:
+    """
+    按指定格式输出报告
+
+    Args:
+        report: 报告数据
+        format: markdown、dict、json 或 msgpack
+
+    Raises:
+        ValueError: 不支持的格式
+    """
+    formatter = FORMATTERS.get(format)
+    if formatter is None:
+        raise ValueError(f"不支持的输出格式: {format}，可选: {', '.join(FORMATTERS)}")
+    return formatter(report)
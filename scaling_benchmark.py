@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+规模基准测试
+按多个规模生成合成图谱（synthetic_graph.py），每个规模在全新的子进程中测量：
+生成耗时、构建耗时（编译图谱后端为编译和写入，Neo4j后端为并行导入的吞吐和重试次数）、
+品类快照加载耗时、各度数 query_graph 的延迟分位数和返回的关系数量，以及各阶段的进程RSS和峰值RSS。
+相邻规模之间计算增长指数（log(指标比) / log(规模比)）：约0为与规模无关，约1为线性增长。
+种子关系缓存在测量时关闭，每次查询都真正访问图谱
+
+用法：
+    python scaling_benchmark.py --sizes 1000,10000,100000,1000000
+    python scaling_benchmark.py --sizes 10000,100000 --backend neo4j --parallel 8
+    python scaling_benchmark.py --sizes 1000,10000 --output scaling_report.json
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import math
+import os
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from load_test import current_rss_mb, percentile
+from synthetic_graph import DEFAULT_SYNTHETIC_CATEGORY, SyntheticGraphSpec, generate_graph, graph_summary
+
+DEFAULT_SIZES = "1000,10000,100000"
+# 解析后的查询（品类在运行时填入），覆盖用户群体、明确需求、价格档位和使用场景几类种子
+SCALING_QUERIES = [
+    {"price_range": "3000元左右", "user_groups": ["学生"], "explicit_needs": ["续航", "拍照"],
+     "implicit_needs": [], "usage_scenarios": []},
+    {"price_range": "", "user_groups": ["商务人士"], "explicit_needs": ["性能"],
+     "implicit_needs": ["散热"], "usage_scenarios": []},
+    {"price_range": "2000元以内", "user_groups": ["老年人"], "explicit_needs": ["屏幕"],
+     "implicit_needs": [], "usage_scenarios": ["户外活动"]},
+]
+# 计算增长指数的指标
+SCALING_METRICS = ["generate_s", "build_s", "rss_after_build_mb", "snapshot_ms"]
+
+
+def peak_rss_mb() -> float:
+    """进程峰值RSS（MB）"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def build_artifact(nodes, edges, category: str, directory: str) -> Dict[str, Any]:
+    """编译并写入合成图谱"""
+    from graph_artifact import compile_graph, write_artifact
+
+    started = time.perf_counter()
+    data = compile_graph(nodes, edges, {"category": category, "source": "synthetic"})
+    write_artifact(os.path.join(directory, f"{category}.graph"), data)
+    return {"build_s": round(time.perf_counter() - started, 2), "artifact_bytes": len(data)}
+
+
+def build_neo4j(nodes, edges, category: str, workers: int, batch_size: int) -> Dict[str, Any]:
+    """清空合成品类分区后并行导入，返回导入统计和写入的因果书签"""
+    from import_data_to_neo4j import Neo4jImporter
+    from neo4j_settings import Neo4jSettings
+
+    settings = Neo4jSettings.from_env()
+    importer = Neo4jImporter(settings.uri, settings.username, settings.password, settings.database)
+    if not importer.connect():
+        raise RuntimeError("无法连接到Neo4j数据库")
+    try:
+        importer.clear_category(category)
+        importer.create_category_indexes()
+        started = time.perf_counter()
+        stats = importer.import_graph(nodes, edges, category, workers=workers, batch_size=batch_size)
+        importer.stamp_graph_version(category)
+        return {
+            "build_s": round(time.perf_counter() - started, 2),
+            "nodes_per_second": stats["nodes"]["rows_per_second"],
+            "relationships_per_second": stats["relationships"]["rows_per_second"],
+            "retries": stats["nodes"]["retries"] + stats["relationships"]["retries"],
+            "bookmarks": importer.bookmarks()
+        }
+    finally:
+        importer.close()
+
+
+def measure_queries(category: str, degree: int, repeats: int, bookmarks: List[str]) -> Dict[str, Any]:
+    """某个度数下的快照加载耗时和 query_graph 延迟"""
+    from knowledge_graph_service import KnowledgeGraphService
+
+    service = KnowledgeGraphService(max_degree=degree, default_category=category)
+    service.materialized_answers = None
+    if bookmarks:
+        service.use_bookmarks(bookmarks)
+    try:
+        started = time.perf_counter()
+        service._get_category_snapshot(category)
+        snapshot_ms = (time.perf_counter() - started) * 1000
+
+        latencies = []
+        relations = []
+        for _ in range(repeats):
+            for query in SCALING_QUERIES:
+                started = time.perf_counter()
+                result = service.query_graph({**query, "product_category": category})
+                latencies.append((time.perf_counter() - started) * 1000)
+                relations.append(len(result.relations))
+    finally:
+        asyncio.run(service.aclose())
+    return {
+        "snapshot_ms": round(snapshot_ms, 1),
+        "p50_ms": round(percentile(latencies, 0.50), 2),
+        "p95_ms": round(percentile(latencies, 0.95), 2),
+        "mean_relations": round(statistics.mean(relations), 1)
+    }
+
+
+def run_child(args):
+    """子进程：生成、构建并查询一个规模的合成图谱，结果以JSON输出到最后一行"""
+    result: Dict[str, Any] = {"factors": args.factors, "backend": args.backend}
+    result["rss_start_mb"] = round(current_rss_mb(), 1)
+
+    started = time.perf_counter()
+    nodes, edges = generate_graph(SyntheticGraphSpec(factors=args.factors, category=args.category, seed=args.seed))
+    result["generate_s"] = round(time.perf_counter() - started, 2)
+    summary = graph_summary(nodes, edges)
+    result.update({key: summary[key] for key in ("nodes", "edges", "max_cross_degree")})
+    result["rss_after_generate_mb"] = round(current_rss_mb(), 1)
+
+    # 编译图谱后端写入临时目录；Neo4j后端使用空目录，读路径只能访问Neo4j
+    artifact_dir = tempfile.mkdtemp(prefix="eg_scaling_")
+    os.environ["GRAPH_ARTIFACT_DIR"] = artifact_dir
+    os.environ["GRAPH_CATEGORIES"] = f"{args.category}:synthetic.jsonl"
+    os.environ["SEED_CACHE_MAX_BYTES"] = "0"
+    os.environ.pop("SHARED_CACHE_PATH", None)
+    try:
+        if args.backend == "neo4j":
+            build = build_neo4j(nodes, edges, args.category, args.parallel, args.batch_size)
+        else:
+            build = build_artifact(nodes, edges, args.category, artifact_dir)
+        bookmarks = build.pop("bookmarks", [])
+        result.update(build)
+        del nodes, edges
+        gc.collect()
+        result["rss_after_build_mb"] = round(current_rss_mb(), 1)
+
+        result["degrees"] = {}
+        for degree in args.degrees:
+            result["degrees"][str(degree)] = measure_queries(args.category, degree, args.repeats, bookmarks)
+        result["snapshot_ms"] = result["degrees"][str(args.degrees[0])]["snapshot_ms"]
+        result["rss_end_mb"] = round(current_rss_mb(), 1)
+        result["peak_rss_mb"] = round(peak_rss_mb(), 1)
+    finally:
+        shutil.rmtree(artifact_dir, ignore_errors=True)
+    print(json.dumps(result, ensure_ascii=False))
+
+
+def growth_exponents(results: List[Dict[str, Any]], degrees: List[int]) -> List[Dict[str, Any]]:
+    """相邻规模之间各指标的增长指数"""
+    def metrics(result: Dict[str, Any]) -> Dict[str, float]:
+        values = {metric: result.get(metric) for metric in SCALING_METRICS}
+        for degree in degrees:
+            values[f"degree{degree}_p50_ms"] = result["degrees"][str(degree)]["p50_ms"]
+        return values
+
+    exponents = []
+    for smaller, larger in zip(results, results[1:]):
+        scale = math.log(larger["factors"] / smaller["factors"])
+        before, after = metrics(smaller), metrics(larger)
+        row: Dict[str, Any] = {"from": smaller["factors"], "to": larger["factors"]}
+        for metric, value in after.items():
+            if value and before.get(metric):
+                row[metric] = round(math.log(value / before[metric]) / scale, 2)
+        exponents.append(row)
+    return exponents
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="合成图谱规模基准测试")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="逗号分隔的Factor数量")
+    parser.add_argument("--degrees", default="1,2,3", help="逗号分隔的关系度数")
+    parser.add_argument("--backend", choices=["artifact", "neo4j"], default="artifact")
+    parser.add_argument("--parallel", type=int, default=8, help="Neo4j后端的并发导入会话数")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--repeats", type=int, default=5, help="每条查询的重复次数")
+    parser.add_argument("--category", default=DEFAULT_SYNTHETIC_CATEGORY)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="写入JSON格式的规模报告")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--factors", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    args.degrees = [int(value) for value in args.degrees.split(",")]
+
+    if args.child:
+        run_child(args)
+        return
+
+    results = []
+    for factors in sorted(int(value) for value in args.sizes.split(",")):
+        command = [sys.executable, os.path.abspath(__file__), "--child", "--factors", str(factors),
+                   "--degrees", ",".join(map(str, args.degrees)), "--backend", args.backend,
+                   "--parallel", str(args.parallel), "--batch-size", str(args.batch_size),
+                   "--repeats", str(args.repeats), "--category", args.category, "--seed", str(args.seed)]
+        output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+        print(f"已完成规模 {factors}", file=sys.stderr)
+
+    header = f"{'因子数':>9}{'节点':>10}{'关系':>10}{'生成s':>8}{'构建s':>8}{'RSS MB':>9}{'峰值MB':>9}{'快照ms':>9}"
+    for degree in args.degrees:
+        header += f"{f'{degree}度p50':>10}{f'{degree}度p95':>10}"
+    print(f"\n后端: {args.backend}\n{header}")
+    for result in results:
+        line = (f"{result['factors']:>9}{result['nodes']:>10}{result['edges']:>10}{result['generate_s']:>8}"
+                f"{result['build_s']:>8}{result['rss_after_build_mb']:>9}{result['peak_rss_mb']:>9}"
+                f"{result['snapshot_ms']:>9}")
+        for degree in args.degrees:
+            stats = result["degrees"][str(degree)]
+            line += f"{stats['p50_ms']:>10}{stats['p95_ms']:>10}"
+        print(line)
+
+    exponents = growth_exponents(results, args.degrees)
+    if exponents:
+        print("\n增长指数（约0为与规模无关，约1为线性）:")
+        for row in exponents:
+            values = ", ".join(f"{key}={value}" for key, value in row.items() if key not in ("from", "to"))
+            print(f"  {row['from']} -> {row['to']}: {values}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump({"backend": args.backend, "results": results, "growth_exponents": exponents},
+                      file, ensure_ascii=False, indent=2)
+        print(f"规模报告已写入: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+冷启动基准测试
+每轮在全新的子进程中测量：导入服务模块、创建服务实例、（可选）预热、首个请求和第二个请求的耗时，
+分别统计不预热和调用 warm_up() 两种模式，用于评估CLI批处理任务和弹性扩容实例的启动开销
+
+用法：
+    python startup_benchmark.py --runs 5
+    python startup_benchmark.py --runs 5 --mock-llm      # 使用本地模拟大模型服务
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+DEFAULT_QUERY = "适合学生的3000元左右的手机"
+METRICS = ["import_ms", "init_ms", "warm_up_ms", "first_request_ms", "second_request_ms"]
+
+
+def run_child(query: str, warm: bool, degree: int):
+    """子进程：按启动顺序逐步计时，结果以JSON输出到最后一行"""
+    started = time.perf_counter()
+    import asyncio
+    from knowledge_graph_service import KnowledgeGraphService
+    timings = {"import_ms": (time.perf_counter() - started) * 1000}
+    timings["eager_modules"] = [name for name in ("neo4j", "httpx", "dotenv") if name in sys.modules]
+
+    async def main():
+        started = time.perf_counter()
+        service = KnowledgeGraphService(max_degree=degree)
+        timings["init_ms"] = (time.perf_counter() - started) * 1000
+        try:
+            if warm:
+                started = time.perf_counter()
+                await service.warm_up()
+                timings["warm_up_ms"] = (time.perf_counter() - started) * 1000
+            for key in ("first_request_ms", "second_request_ms"):
+                started = time.perf_counter()
+                parsed, result = await service.parse_and_query_graph(query)
+                await service.generate_response(query, result, parsed)
+                timings[key] = (time.perf_counter() - started) * 1000
+        finally:
+            await service.aclose()
+
+    asyncio.run(main())
+    print(json.dumps(timings))
+
+
+def run_rounds(args, warm: bool, env: dict) -> dict:
+    """启动多个子进程，返回各指标的中位数"""
+    samples = {metric: [] for metric in METRICS}
+    eager = set()
+    for _ in range(args.runs):
+        command = [sys.executable, os.path.abspath(__file__), "--child",
+                   "--query", args.query, "--degree", str(args.degree)]
+        if warm:
+            command.append("--warm")
+        output = subprocess.run(command, env=env, capture_output=True, text=True, check=True).stdout
+        timings = json.loads(output.strip().splitlines()[-1])
+        eager.update(timings.pop("eager_modules"))
+        for metric, value in timings.items():
+            samples[metric].append(value)
+    summary = {metric: round(statistics.median(values), 1) for metric, values in samples.items() if values}
+    summary["eager_modules"] = sorted(eager)
+    return summary
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="冷启动基准测试")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--query", default=DEFAULT_QUERY)
+    parser.add_argument("--degree", type=int, default=2)
+    parser.add_argument("--mock-llm", action="store_true", help="启动本地模拟大模型服务")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--warm", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.query, args.warm, args.degree)
+        return
+
+    env = dict(os.environ)
+    if args.mock_llm:
+        from mock_llm_server import start_mock_server
+        server = start_mock_server(latency=0.05, token_delay=0.001)
+        env["LLM_ENDPOINTS"] = f"{server.base_url}|mock"
+
+    results = {"cold": run_rounds(args, False, env), "warm_up": run_rounds(args, True, env)}
+
+    print(f"\n{'指标(ms, 中位数)':<24}{'不预热':>12}{'预热':>12}")
+    for metric in METRICS:
+        cold = results["cold"].get(metric, "-")
+        warm = results["warm_up"].get(metric, "-")
+        print(f"{metric:<24}{cold:>12}{warm:>12}")
+    eager = sorted(set(results["cold"]["eager_modules"]) | set(results["warm_up"]["eager_modules"]))
+    print(f"导入时即加载的重量级模块: {', '.join(eager) or '无'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+合成图谱生成器
+data.txt只有约140个节点，无法反映导入和检索在1万、10万、100万因子规模下的表现。
+生成器以data.txt为模板按比例放大：根节点下重复多份阶段子树（Stage→Factor的CONTAINS/INCLUDES层级，
+副本中的节点名称带 `·序号` 后缀，第0份保留原名），每份副本保留模板中的交叉关系
+（RELATES_TO、REQUIRES、KNOWN_FOR、TYPICALLY_INCLUDES），其中一部分改为指向其他副本中的同名因子，
+目标副本按Zipf分布选择，靠前的副本成为入度很高的枢纽节点。
+每个因子的层级分支数和交叉关系数量与模板一致，查询关键词（学生、拍照……）在任何规模下都能命中种子
+
+用法：
+    python synthetic_graph.py 100000 --output data_synthetic.txt
+    python synthetic_graph.py 1000000 --output data_synthetic.jsonl     # 记录格式
+    GRAPH_CATEGORIES="合成手机:data_synthetic.jsonl" uv run python import_data_to_neo4j.py 合成手机 --parallel 8
+"""
+
+import argparse
+import bisect
+import itertools
+import json
+import logging
+import os
+import random
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from graph_artifact import Edge, load_graph_file, write_graph_records
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data.txt")
+DEFAULT_SYNTHETIC_CATEGORY = "合成手机"
+
+# 层级关系（根→阶段→因子→子因子），其余关系类型为交叉关系
+HIERARCHY_TYPES = ("INCLUDES", "CONTAINS")
+REPLICA_SEPARATOR = "·"
+
+
+@dataclass
+class SyntheticGraphSpec:
+    """合成图谱参数"""
+    # 目标Factor节点数量
+    factors: int
+    category: str = DEFAULT_SYNTHETIC_CATEGORY
+    # 交叉关系改为指向其他副本的比例
+    cross_replica_ratio: float = 0.3
+    # 目标副本的Zipf指数，越大枢纽越集中
+    hub_skew: float = 1.2
+    seed: int = 42
+
+
+@dataclass
+class TemplateGraph:
+    """从模板中提取的结构：阶段子树（按层级顺序）和交叉关系"""
+    root_label: str
+    # (阶段名, [(节点名, 标签, 父节点名, 层级关系类型)]，第一项为阶段本身)
+    stage_trees: List[Tuple[str, List[Tuple[str, str, str, str]]]]
+    cross_edges: List[Edge]
+
+    @property
+    def factor_count(self) -> int:
+        """模板中阶段子树包含的因子数量"""
+        return sum(len(tree) - 1 for _, tree in self.stage_trees)
+
+
+def load_template(path: str = TEMPLATE_FILE) -> TemplateGraph:
+    """
+    解析模板图谱，拆分为根节点下的各阶段子树和交叉关系
+
+    Args:
+        path: data.txt风格的Cypher文件或 `.jsonl` 记录文件
+    """
+    nodes, edges = load_graph_file(path)
+    labels = dict(nodes)
+    children: Dict[str, List[Tuple[str, str]]] = defaultdict(list)
+    parents: Dict[str, str] = {}
+    cross_edges: List[Edge] = []
+    for source, rel_type, target in edges:
+        if rel_type in HIERARCHY_TYPES and target not in parents:
+            parents[target] = source
+            children[source].append((target, rel_type))
+        else:
+            cross_edges.append((source, rel_type, target))
+
+    roots = [name for name, label in nodes if label == "Decision"]
+    if len(roots) != 1:
+        raise ValueError(f"模板应只有一个Decision根节点，实际 {len(roots)} 个")
+    root = roots[0]
+
+    stage_trees = []
+    for stage, rel_type in children[root]:
+        # 按层级（广度优先）顺序展开，任意前缀都是连通的子树
+        tree = [(stage, labels[stage], root, rel_type)]
+        queue = deque([stage])
+        while queue:
+            parent = queue.popleft()
+            for child, child_type in children[parent]:
+                tree.append((child, labels[child], parent, child_type))
+                queue.append(child)
+        stage_trees.append((stage, tree))
+
+    in_trees = {name for _, tree in stage_trees for name, _, _, _ in tree}
+    cross_edges = [edge for edge in cross_edges if edge[0] in in_trees and edge[2] in in_trees]
+    return TemplateGraph(root_label=labels[root], stage_trees=stage_trees, cross_edges=cross_edges)
+
+
+def replica_name(name: str, replica: int) -> str:
+    """副本中的节点名称，第0份保留原名"""
+    return name if replica == 0 else f"{name}{REPLICA_SEPARATOR}{replica}"
+
+
+def generate_graph(spec: SyntheticGraphSpec,
+                   template: Optional[TemplateGraph] = None) -> Tuple[List[Tuple[str, str]], List[Edge]]:
+    """
+    按模板生成指定规模的合成图谱（相同参数生成的结果完全一致）
+
+    Args:
+        spec: 合成图谱参数
+        template: 模板结构，默认解析data.txt
+
+    Returns:
+        ([(节点名, 标签)], [(起点名, 关系类型, 终点名)])，根节点名称为 `{品类}购物决策`
+    """
+    template = template or load_template()
+    rng = random.Random(spec.seed)
+    root = f"{spec.category}购物决策"
+    nodes: List[Tuple[str, str]] = [(root, template.root_label)]
+    edges: List[Edge] = []
+
+    # 1. 层级：逐份复制阶段子树，直到因子数量达到目标（最后一棵子树只取广度优先的前缀）
+    # 每份副本中已生成的模板节点名
+    present: List[set] = []
+    remaining = spec.factors
+    for replica in itertools.count():
+        if remaining <= 0:
+            break
+        generated = set()
+        for _, tree in template.stage_trees:
+            if remaining <= 0:
+                break
+            for index, (name, label, parent, rel_type) in enumerate(tree):
+                if index > 0:
+                    if remaining <= 0:
+                        break
+                    remaining -= 1
+                source = root if index == 0 else replica_name(parent, replica)
+                nodes.append((replica_name(name, replica), label))
+                edges.append((source, rel_type, replica_name(name, replica)))
+                generated.add(name)
+        present.append(generated)
+
+    # 2. 交叉关系：每份副本保留模板的交叉关系，按比例改为指向Zipf分布选出的其他副本
+    replicas = len(present)
+    cumulative = list(itertools.accumulate(1.0 / (rank + 1) ** spec.hub_skew for rank in range(replicas)))
+    for replica, generated in enumerate(present):
+        for source, rel_type, target in template.cross_edges:
+            if source not in generated or target not in generated:
+                continue
+            target_replica = replica
+            if replicas > 1 and rng.random() < spec.cross_replica_ratio:
+                candidate = bisect.bisect_left(cumulative, rng.random() * cumulative[-1])
+                if target in present[candidate]:
+                    target_replica = candidate
+            edges.append((replica_name(source, replica), rel_type, replica_name(target, target_replica)))
+
+    return nodes, list(dict.fromkeys(edges))
+
+
+def write_cypher(path: str, nodes: List[Tuple[str, str]], edges: List[Edge]):
+    """按data.txt的格式写入MERGE语句（整个文件是一条语句，大规模图谱请使用 --parallel 导入）"""
+    variables = {name: f"n{index}" for index, (name, _) in enumerate(nodes)}
+    with open(path, "w", encoding="utf-8") as file:
+        for name, label in nodes:
+            file.write(f"MERGE ({variables[name]}:{label} {{name: {json.dumps(name, ensure_ascii=False)}}})\n")
+        file.write("\n")
+        for source, rel_type, target in edges:
+            file.write(f"MERGE ({variables[source]})-[:{rel_type}]->({variables[target]})\n")
+
+
+def graph_summary(nodes: List[Tuple[str, str]], edges: List[Edge]) -> Dict[str, object]:
+    """合成图谱的规模和度数分布摘要"""
+    label_counts: Dict[str, int] = defaultdict(int)
+    for _, label in nodes:
+        label_counts[label] += 1
+    type_counts: Dict[str, int] = defaultdict(int)
+    degrees: Dict[str, int] = defaultdict(int)
+    for source, rel_type, target in edges:
+        type_counts[rel_type] += 1
+        if rel_type not in HIERARCHY_TYPES:
+            degrees[source] += 1
+            degrees[target] += 1
+    return {
+        "nodes": len(nodes),
+        "edges": len(edges),
+        "labels": dict(label_counts),
+        "relation_types": dict(type_counts),
+        "max_cross_degree": max(degrees.values(), default=0)
+    }
+
+
+def main():
+    """主函数"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="按data.txt的结构生成指定规模的合成图谱")
+    parser.add_argument("factors", type=int, help="Factor节点数量")
+    parser.add_argument("--output", required=True, help="输出文件，`.jsonl` 为记录格式，其余为Cypher")
+    parser.add_argument("--category", default=DEFAULT_SYNTHETIC_CATEGORY)
+    parser.add_argument("--template", default=TEMPLATE_FILE)
+    parser.add_argument("--cross-replica-ratio", type=float, default=0.3)
+    parser.add_argument("--hub-skew", type=float, default=1.2)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    spec = SyntheticGraphSpec(factors=args.factors, category=args.category,
+                              cross_replica_ratio=args.cross_replica_ratio,
+                              hub_skew=args.hub_skew, seed=args.seed)
+    nodes, edges = generate_graph(spec, load_template(args.template))
+    if args.output.endswith(".jsonl"):
+        write_graph_records(args.output, nodes, edges)
+    else:
+        write_cypher(args.output, nodes, edges)
+    logger.info(f"已生成合成图谱 -> {args.output}: {json.dumps(graph_summary(nodes, edges), ensure_ascii=False)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,7 @@
 """
 
 import asyncio
+import logging
 from knowledge_graph_service import KnowledgeGraphService
 
 async def test_query(query: str, degree: int):
@@ -74,10 +75,12 @@ async def test_query(query: str, degree: int):
         import traceback
         traceback.print_exc()
     finally:
-        kg_service.close()
+        await kg_service.aclose()
         print("\n🔒 数据库连接已关闭")
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    
     # ========== 配置区域 ==========
     # 在这里修改你想测试的查询和深度
     TEST_QUERY = "适合学生的3000元左右护眼的手机"
@@ -0,0 +1,70 @@
+"""
+测试公共夹具
+服务的读路径使用由data.txt编译的临时图谱文件，不需要Neo4j；需要Neo4j的测试在连接失败时跳过
+"""
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture
+def artifact_dir(tmp_path, monkeypatch):
+    """编译data.txt到临时目录，并关闭共享缓存"""
+    from graph_artifact import compile_graph, load_graph_file, write_artifact
+
+    nodes, edges = load_graph_file(os.path.join(ROOT, "data.txt"))
+    write_artifact(str(tmp_path / "手机.graph"), compile_graph(nodes, edges, {"category": "手机", "source": "data.txt"}))
+    monkeypatch.setenv("GRAPH_ARTIFACT_DIR", str(tmp_path))
+    monkeypatch.setenv("GRAPH_CATEGORIES", "手机:data.txt")
+    monkeypatch.delenv("SHARED_CACHE_PATH", raising=False)
+    return tmp_path
+
+
+@pytest.fixture
+def make_service(artifact_dir):
+    """创建使用编译图谱的服务实例（不使用预计算结果），测试结束时关闭"""
+    from knowledge_graph_service import KnowledgeGraphService
+
+    services = []
+
+    def factory(**kwargs):
+        service = KnowledgeGraphService(**kwargs)
+        service.materialized_answers = None
+        services.append(service)
+        return service
+
+    yield factory
+    for service in services:
+        service.close()
+
+
+@pytest.fixture
+def neo4j_importer():
+    """连接本地Neo4j的导入器，连接失败时跳过"""
+    from import_data_to_neo4j import Neo4jImporter
+    from neo4j_settings import Neo4jSettings
+
+    settings = Neo4jSettings.from_env()
+    importer = Neo4jImporter(settings.uri, settings.username, settings.password, settings.database)
+    if not importer.connect():
+        importer.close()
+        pytest.skip("Neo4j不可用")
+    yield importer
+    importer.close()
+
+
+@pytest.fixture
+def mock_llm(monkeypatch):
+    """启动本地模拟大模型端点并配置到 LLM_ENDPOINTS，返回模拟服务"""
+    from mock_llm_server import start_mock_server
+
+    server = start_mock_server(latency=0.0, token_delay=0.0)
+    monkeypatch.setenv("LLM_ENDPOINTS", f"{server.base_url}|mock")
+    yield server
+    server.shutdown()
+    server.server_close()
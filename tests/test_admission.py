@@ -0,0 +1,41 @@
+"""
+准入控制：近期延迟只在已有负载时加速降级
+"""
+
+import time
+from contextlib import ExitStack
+
+from admission import AdmissionConfig, AdmissionController, ServiceMode
+
+
+def _controller_with_slow_history(p95_seconds: float) -> AdmissionController:
+    """最近请求的延迟都是 p95_seconds 的控制器（目标延迟1秒，降级阈值 2,4,6）"""
+    controller = AdmissionController(AdmissionConfig(max_in_flight=0, degrade_in_flight=[2, 4, 6],
+                                                     latency_target_ms=1000))
+    now = time.monotonic()
+    controller._latencies.extend((now, p95_seconds) for _ in range(10))
+    return controller
+
+
+def test_slow_history_does_not_degrade_idle_service():
+    controller = _controller_with_slow_history(5.0)
+    with controller.admit() as mode:
+        assert mode == ServiceMode.FULL
+    with controller.admit():
+        with controller.admit() as second:
+            assert second == ServiceMode.FULL
+
+
+def test_slow_history_accelerates_degradation_under_load():
+    controller = _controller_with_slow_history(2.5)
+    with ExitStack() as stack:
+        modes = [stack.enter_context(controller.admit()) for _ in range(3)]
+    assert modes == [ServiceMode.FULL, ServiceMode.FULL, ServiceMode.RULE_PARSE]
+
+
+def test_fast_history_degrades_by_in_flight_only():
+    controller = _controller_with_slow_history(0.1)
+    with ExitStack() as stack:
+        modes = [stack.enter_context(controller.admit()) for _ in range(5)]
+    assert modes == [ServiceMode.FULL, ServiceMode.FULL, ServiceMode.RULE_PRUNE,
+                     ServiceMode.RULE_PRUNE, ServiceMode.REDUCED_DEGREE]
@@ -0,0 +1,110 @@
+"""
+多轮对话：追问只检索变化的种子，失败的一轮不记入会话
+大模型使用本地模拟服务，追问时按提示词中上一轮的解析结果合并条件
+"""
+
+import asyncio
+
+import pytest
+
+FIRST_TURN = "适合学生的3000元左右的手机"
+BUDGET_TURN = "预算改成5000元左右"
+
+
+def _count_seed_fetches(service):
+    """记录检索过关系的种子"""
+    fetched = []
+    original = service._fetch_seed_relations
+
+    def wrapped(kind, category, name, ranking=None):
+        fetched.append((kind, category, name))
+        return original(kind, category, name, ranking)
+
+    service._fetch_seed_relations = wrapped
+    return fetched
+
+
+def test_budget_follow_up_refetches_only_price_bands(make_service, mock_llm):
+    service = make_service(max_degree=2)
+    fetched = _count_seed_fetches(service)
+
+    async def run():
+        try:
+            session = service.start_session()
+            await service.session_turn(session, FIRST_TURN, format="dict")
+            first_seeds = list(session.seed_results)
+            fetched.clear()
+            await service.session_turn(session, BUDGET_TURN, format="dict")
+            return session, first_seeds
+        finally:
+            await service.aclose()
+
+    session, first_seeds = asyncio.run(run())
+    diff = session.last_diff
+    assert session.turns == [FIRST_TURN, BUDGET_TURN]
+    assert session.parsed_query["user_groups"] == ["学生"]
+    assert ("user_group", "手机", "学生") in diff.kept
+    assert diff.added and all(kind == "price_band" for kind, _, _ in diff.added)
+    assert all(kind == "price_band" for kind, _, _ in diff.removed)
+    assert sorted(fetched) == sorted(diff.added)
+    assert not set(fetched) & set(first_seeds)
+
+
+def test_failed_turn_is_not_recorded(make_service, mock_llm):
+    service = make_service(max_degree=2)
+
+    async def failing_prune(*args, **kwargs):
+        raise RuntimeError("剪枝失败")
+
+    async def run():
+        try:
+            session = service.start_session()
+            await service.session_turn(session, FIRST_TURN, format="dict")
+            parsed_query = session.parsed_query
+            original = service._prune_session
+            service._prune_session = failing_prune
+            with pytest.raises(RuntimeError):
+                await service.session_turn(session, BUDGET_TURN, format="dict")
+            assert session.turns == [FIRST_TURN]
+            assert session.parsed_query is parsed_query
+            service._prune_session = original
+            await service.session_turn(session, "再加上拍照好", format="dict")
+            return session
+        finally:
+            await service.aclose()
+
+    session = asyncio.run(run())
+    assert session.turns == [FIRST_TURN, "再加上拍照好"]
+    assert session.parsed_query["price_range"] == "3000元左右"
+    assert "拍照" in session.parsed_query["explicit_needs"]
+
+
+def test_three_turn_session_keeps_earlier_conditions(make_service, mock_llm):
+    service = make_service(max_degree=2)
+    fetched = _count_seed_fetches(service)
+
+    async def run():
+        try:
+            session = service.start_session()
+            turns = []
+            for query in (FIRST_TURN, "再加上拍照好", "不要拍照，预算改成5000元左右"):
+                fetched.clear()
+                await service.session_turn(session, query, format="dict")
+                turns.append((dict(session.parsed_query), session.last_diff, list(fetched)))
+            return session, turns
+        finally:
+            await service.aclose()
+
+    session, turns = asyncio.run(run())
+    _, (second, second_diff, second_fetched), (third, third_diff, third_fetched) = turns
+    assert second["user_groups"] == ["学生"] and second["explicit_needs"] == ["拍照"]
+    assert second["price_range"] == "3000元左右"
+    assert second_diff.added == [("need", "手机", "拍照")] and second_fetched == second_diff.added
+
+    assert third["user_groups"] == ["学生"] and third["explicit_needs"] == []
+    assert third["price_range"] == "5000元左右"
+    assert ("need", "手机", "拍照") in third_diff.removed
+    assert ("user_group", "手机", "学生") in third_diff.kept
+    assert all(kind == "price_band" for kind, _, _ in third_diff.added)
+    assert sorted(third_fetched) == sorted(third_diff.added)
+    assert len(session.turns) == 3
@@ -0,0 +1,26 @@
+"""多度数视图与单独按度数查询的一致性"""
+
+import pytest
+
+QUERIES = [
+    {"product_category": "手机", "price_range": "", "user_groups": ["学生"],
+     "explicit_needs": ["续航", "拍照"], "implicit_needs": [], "usage_scenarios": []},
+    {"product_category": "手机", "price_range": "3000元左右", "user_groups": ["学生"],
+     "explicit_needs": ["续航", "拍照"], "implicit_needs": [], "usage_scenarios": []},
+    {"product_category": "手机", "price_range": "2000元以内", "user_groups": ["老年人"],
+     "explicit_needs": ["大屏"], "implicit_needs": [], "usage_scenarios": []},
+]
+
+
+def _signature(result):
+    relations = [(r.from_node, r.to_node, r.relation_type, r.degree, r.via) for r in result.relations]
+    return sorted(node.id for node in result.nodes), relations
+
+
+@pytest.mark.parametrize("parsed_query", QUERIES, ids=["no_price", "price_about", "price_upper"])
+@pytest.mark.parametrize("max_degree", [1, 2, 3])
+def test_degree_views_match_single_queries(make_service, parsed_query, max_degree):
+    views = make_service(max_degree=max_degree).query_graph(parsed_query, degrees=range(1, max_degree + 1))
+    for degree in range(1, max_degree + 1):
+        single = make_service(max_degree=degree).query_graph(parsed_query)
+        assert _signature(views[degree]) == _signature(single), f"{degree}度视图与单独查询不一致"
@@ -0,0 +1,61 @@
+"""
+异步入口不在事件循环线程中访问图谱：品类快照的加载和图谱版本确认都在线程中执行
+"""
+
+import asyncio
+
+QUERY = "适合学生的3000元左右的手机"
+
+
+def _record_loop_snapshot_access(service):
+    """记录在事件循环线程中需要访问图谱的快照获取"""
+    on_loop = []
+    original = service._get_category_snapshot
+
+    def wrapped(category, revalidate=True):
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        else:
+            if revalidate:
+                on_loop.append(category)
+        return original(category, revalidate)
+
+    service._get_category_snapshot = wrapped
+    return on_loop
+
+
+def test_parse_and_query_graph_loads_snapshot_off_loop(make_service, mock_llm, monkeypatch):
+    monkeypatch.setenv("GRAPH_VERSION_CHECK_INTERVAL", "0")
+    service = make_service(max_degree=2)
+    on_loop = _record_loop_snapshot_access(service)
+
+    async def run():
+        try:
+            parsed, result = await service.parse_and_query_graph(QUERY)
+            report = await service.generate_response(QUERY, result, parsed, format="dict")
+            return parsed, result, report
+        finally:
+            await service.aclose()
+
+    parsed, result, _ = asyncio.run(run())
+    assert parsed["price_range"] and result.relations
+    assert on_loop == []
+
+
+def test_session_turn_loads_snapshot_off_loop(make_service, mock_llm, monkeypatch):
+    monkeypatch.setenv("GRAPH_VERSION_CHECK_INTERVAL", "0")
+    service = make_service(max_degree=2)
+    on_loop = _record_loop_snapshot_access(service)
+
+    async def run():
+        try:
+            session = service.start_session()
+            await service.session_turn(session, QUERY, format="dict")
+            await service.session_turn(session, "预算改成5000元左右", format="dict")
+        finally:
+            await service.aclose()
+
+    asyncio.run(run())
+    assert on_loop == []
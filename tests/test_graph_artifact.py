@@ -0,0 +1,33 @@
+"""
+读取data.txt风格的图谱文件不依赖Neo4j导入脚本
+"""
+
+import os
+import subprocess
+import sys
+
+from graph_artifact import read_cypher_statements
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_read_cypher_statements_strips_comments(tmp_path):
+    path = tmp_path / "graph.txt"
+    path.write_text('// 注释\nMERGE (a:Factor {name: "学生//群体"})\n-[:X]->(b); // 行尾注释\n'
+                    'MERGE (b:Factor {name: "拍照"})', encoding="utf-8")
+    assert read_cypher_statements(str(path)) == [
+        'MERGE (a:Factor {name: "学生//群体"}) -[:X]->(b)',
+        'MERGE (b:Factor {name: "拍照"})'
+    ]
+
+
+def test_load_graph_file_has_no_import_side_effects():
+    script = (
+        "import logging, sys\n"
+        "from graph_artifact import load_graph_file\n"
+        "nodes, edges = load_graph_file('data.txt')\n"
+        "assert nodes and edges\n"
+        "assert 'neo4j' not in sys.modules and 'import_data_to_neo4j' not in sys.modules\n"
+        "assert not logging.getLogger().handlers\n"
+    )
+    subprocess.run([sys.executable, "-c", script], cwd=ROOT, check=True)
@@ -0,0 +1,52 @@
+"""
+GraphArtifactStore：重新编译后加载新文件，不缓存不存在的文件，旧图谱在宽限期后关闭
+"""
+
+import os
+
+from graph_artifact import GraphArtifactStore, compile_graph, write_artifact
+
+NODES = [("手机购物决策", "Decision"), ("预算", "Stage"), ("学生群体", "Factor")]
+EDGES = [("手机购物决策", "INCLUDES", "预算"), ("预算", "CONTAINS", "学生群体")]
+
+
+def _write(store, nodes, edges):
+    write_artifact(store.path_for("手机"), compile_graph(nodes, edges, {"category": "手机"}))
+
+
+def test_missing_file_is_not_cached(tmp_path):
+    store = GraphArtifactStore(str(tmp_path))
+    assert store.get("手机") is None
+    _write(store, NODES, EDGES)
+    graph = store.get("手机")
+    assert graph is not None and graph.find("学生群体") is not None
+    assert store.get("手机") is graph
+    store.close()
+
+
+def test_replaced_file_is_reloaded_and_old_graph_closed(tmp_path):
+    store = GraphArtifactStore(str(tmp_path))
+    _write(store, NODES, EDGES)
+    old = store.get("手机")
+
+    _write(store, NODES + [("拍照需求", "Factor")], EDGES + [("预算", "CONTAINS", "拍照需求")])
+    new = store.get("手机")
+    assert new is not old
+    assert new.version != old.version
+    assert new.find("拍照需求") is not None
+    # 宽限期内旧图谱仍可读取
+    assert old.find("学生群体") is not None
+
+    store.retire_grace = 0
+    assert store.get("手机") is new
+    assert old._mm.closed
+    store.close()
+
+
+def test_deleted_file_falls_back(tmp_path):
+    store = GraphArtifactStore(str(tmp_path))
+    _write(store, NODES, EDGES)
+    assert store.get("手机") is not None
+    os.remove(store.path_for("手机"))
+    assert store.get("手机") is None
+    store.close()
@@ -0,0 +1,89 @@
+"""
+Neo4j后端的图谱版本：导入器写在根节点上的导入版本变化后，快照重新加载，各级缓存随版本失效
+"""
+
+import contextlib
+
+import pytest
+
+TEST_CATEGORY = "版本测试"
+
+
+class FakeNeo4j:
+    """按查询名称返回固定行的Neo4j替身，import_version 模拟根节点上的导入版本"""
+
+    def __init__(self):
+        self.import_version = "v1"
+        self.calls = []
+
+    def run_query(self, session, query_name, **params):
+        self.calls.append(query_name)
+        if query_name == "category_graph_version":
+            return [[self.import_version]]
+        if query_name == "category_factor_names":
+            return [["学生群体"], ["拍照需求"]]
+        if query_name == "node_relations_degree1":
+            return [["c", f"n-{self.import_version}", "拍照需求", "Factor", "RELATES_TO", 1, "学生群体"]]
+        return []
+
+
+@pytest.fixture
+def neo4j_service(make_service, tmp_path, monkeypatch):
+    """没有编译图谱、读路径由FakeNeo4j提供的服务，每次取快照都确认版本"""
+    monkeypatch.setenv("GRAPH_ARTIFACT_DIR", str(tmp_path / "empty"))
+    monkeypatch.setenv("GRAPH_VERSION_CHECK_INTERVAL", "0")
+    fake = FakeNeo4j()
+    service = make_service(max_degree=1)
+    service._read_session = contextlib.nullcontext
+    service._run_query = fake.run_query
+    return service, fake
+
+
+def test_reimport_changes_graph_version(neo4j_service):
+    service, fake = neo4j_service
+    before = service._graph_version("手机")
+    assert before == "neo4j:v1"
+    assert service._graph_version("手机") == before
+
+    fake.import_version = "v2"
+    assert service._graph_version("手机") == "neo4j:v2"
+    assert service.snapshot_cache.loads == 2
+
+
+def test_reimport_invalidates_seed_cache(neo4j_service):
+    service, fake = neo4j_service
+    first = service._get_node_relations(None, "学生群体", "手机")
+    assert service._get_node_relations(None, "学生群体", "手机") is first
+    assert fake.calls.count("node_relations_degree1") == 1
+
+    fake.import_version = "v2"
+    second = service._get_node_relations(None, "学生群体", "手机")
+    assert fake.calls.count("node_relations_degree1") == 2
+    assert [relation.to_node for relation in second["relations"]] == ["拍照需求"]
+
+
+def test_importer_stamps_new_version(neo4j_importer, make_service, tmp_path, monkeypatch):
+    from synthetic_graph import SyntheticGraphSpec, generate_graph
+
+    monkeypatch.setenv("GRAPH_ARTIFACT_DIR", str(tmp_path / "empty"))
+    monkeypatch.setenv("GRAPH_CATEGORIES", f"{TEST_CATEGORY}:synthetic.jsonl")
+    monkeypatch.setenv("GRAPH_VERSION_CHECK_INTERVAL", "0")
+    nodes, edges = generate_graph(SyntheticGraphSpec(factors=50, category=TEST_CATEGORY))
+
+    def reimport():
+        neo4j_importer.clear_category(TEST_CATEGORY)
+        neo4j_importer.import_graph(nodes, edges, TEST_CATEGORY, workers=2)
+        assert neo4j_importer.stamp_graph_version(TEST_CATEGORY)
+
+    try:
+        reimport()
+        service = make_service(default_category=TEST_CATEGORY)
+        service.use_bookmarks(neo4j_importer.bookmarks())
+        before = service._graph_version(TEST_CATEGORY)
+        assert before.startswith("neo4j:")
+
+        reimport()
+        service.use_bookmarks(neo4j_importer.bookmarks())
+        assert service._graph_version(TEST_CATEGORY) != before
+    finally:
+        neo4j_importer.clear_category(TEST_CATEGORY)
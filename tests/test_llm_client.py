@@ -0,0 +1,125 @@
+"""
+多端点大模型客户端：对冲请求、断路器打开和半开恢复（使用 mock_llm_server.py 的本地模拟端点）
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from llm_client import HedgedLLMClient, LLMEndpoint
+from llm_scheduler import LLMScheduler
+from mock_llm_server import start_mock_server
+
+
+def _parse(content):
+    return content or None
+
+
+@pytest.fixture
+def servers():
+    started = []
+
+    def factory(**kwargs):
+        server = start_mock_server(**kwargs)
+        started.append(server)
+        return server
+
+    yield factory
+    for server in started:
+        server.shutdown()
+        server.server_close()
+
+
+def _client(*servers, **kwargs) -> HedgedLLMClient:
+    endpoints = [LLMEndpoint(name=f"{index}:mock", base_url=server.base_url, model="mock", api_key=None)
+                 for index, server in enumerate(servers)]
+    return HedgedLLMClient(endpoints, scheduler=LLMScheduler(requests_per_min=0), **kwargs)
+
+
+async def _complete(client: HedgedLLMClient, times: int = 1):
+    try:
+        return [await client.complete("测试", _parse, timeout=5.0) for _ in range(times)]
+    finally:
+        await client.aclose()
+
+
+def test_hedge_fires_when_primary_is_slow(servers):
+    slow, fast = servers(latency=1.5), servers(latency=0.0)
+    client = _client(slow, fast, default_hedge_delay=0.1, min_hedge_delay=0.05)
+
+    started = time.monotonic()
+    [result] = asyncio.run(_complete(client))
+    assert result is not None
+    assert client.hedged_requests == 1
+    assert time.monotonic() - started < 1.0
+
+
+def test_breaker_opens_after_repeated_failures(servers):
+    failing = servers(latency=0.0, error_rate=1.0)
+    client = _client(failing, cooldown=60.0)
+
+    assert asyncio.run(_complete(client, times=3)) == [None, None, None]
+    assert client.stats()["0:mock"]["circuit_open"]
+    sent = failing.request_count
+    # 熔断后不再向该端点发送请求
+    assert asyncio.run(_complete(client)) == [None]
+    assert failing.request_count == sent
+
+
+def test_half_open_probe_recovers(servers):
+    server = servers(latency=0.0, error_rate=1.0)
+    client = _client(server, cooldown=0.2)
+    asyncio.run(_complete(client, times=3))
+    health = client.health["0:mock"]
+    assert health.opened_at is not None and not health.can_probe()
+
+    time.sleep(0.25)
+    # 排序端点只检查状态，不消耗试探
+    for _ in range(5):
+        assert client._ordered_endpoints()
+    assert not health.half_open and health.can_probe()
+
+    server.config["error_rate"] = 0.0
+    [result] = asyncio.run(_complete(client))
+    assert result is not None
+    assert health.opened_at is None and not health.half_open
+    assert not client.stats()["0:mock"]["circuit_open"]
+
+
+def test_failed_probe_reopens_breaker(servers):
+    server = servers(latency=0.0, error_rate=1.0)
+    client = _client(server, cooldown=0.2)
+    asyncio.run(_complete(client, times=3))
+    time.sleep(0.25)
+
+    assert asyncio.run(_complete(client)) == [None]
+    health = client.health["0:mock"]
+    # 一个冷却周期只放行一次试探，试探失败后重新熔断
+    assert health.opened_at is not None and not health.half_open
+    assert not health.can_probe()
+
+
+def test_begin_probe_admits_one_request_per_cooldown():
+    from llm_client import EndpointHealth
+
+    health = EndpointHealth(min_calls=1, cooldown=0.1)
+    health.record_failure()
+    assert not health.begin_probe()
+    time.sleep(0.15)
+    assert health.can_probe() and health.can_probe()
+    assert health.begin_probe()
+    assert not health.begin_probe()
+    assert not health.can_probe()
+
+
+def test_service_aclose_closes_llm_client(make_service):
+    service = make_service()
+
+    async def run():
+        client = service.llm_client._get_client()
+        await service.aclose()
+        return client
+
+    assert asyncio.run(run()).is_closed
+    assert service.llm_client._client is None
@@ -0,0 +1,37 @@
+"""
+MaterializedAnswerStore：重新预计算后加载新文件，不缓存不存在的文件
+"""
+
+from graph_artifact import write_artifact
+from materialized_answers import MaterializedAnswers, MaterializedAnswerStore
+
+
+def _write(store, graph_version):
+    answers = MaterializedAnswers(category="手机", graph_version=graph_version, max_degree=2,
+                                  pruned={"": {"预算": ["学生群体"]}})
+    write_artifact(store.path_for("手机"), answers.to_json())
+
+
+def test_missing_file_is_not_cached(tmp_path):
+    store = MaterializedAnswerStore(str(tmp_path))
+    assert store.get("手机") is None
+    _write(store, "v1")
+    answers = store.get("手机")
+    assert answers is not None and answers.graph_version == "v1"
+    assert store.get("手机") is answers
+
+
+def test_rewritten_file_is_reloaded(tmp_path):
+    store = MaterializedAnswerStore(str(tmp_path))
+    _write(store, "v1")
+    assert store.get("手机").graph_version == "v1"
+    _write(store, "v2")
+    assert store.get("手机").graph_version == "v2"
+
+
+def test_corrupt_file_is_retried_after_replacement(tmp_path):
+    store = MaterializedAnswerStore(str(tmp_path))
+    write_artifact(store.path_for("手机"), b"{not json")
+    assert store.get("手机") is None
+    _write(store, "v1")
+    assert store.get("手机").graph_version == "v1"
@@ -0,0 +1,54 @@
+"""
+价格区间到预算档位权重的换算
+"""
+
+import pytest
+
+from price_index import PriceIndex, parse_price_range
+
+BANDS = ["1000元以下", "1000-2000元", "2000-3000元", "3000-4000元",
+         "4000-5000元", "5000-6000元", "6000元以上", "学生群体"]
+
+
+@pytest.fixture
+def index():
+    return PriceIndex(BANDS)
+
+
+def test_open_ended_range_weights_contained_bands_equally(index):
+    assert index.weights(parse_price_range("3000元以上")) == {
+        "3000-4000元": 0.25, "4000-5000元": 0.25, "5000-6000元": 0.25, "6000元以上": 0.25
+    }
+
+
+def test_open_ended_range_partially_covers_boundary_band(index):
+    weights = index.weights(parse_price_range("2500元以上"))
+    assert weights["2000-3000元"] == pytest.approx(weights["6000元以上"] / 2, abs=1e-4)
+    assert weights["3000-4000元"] == weights["6000元以上"]
+    assert sum(weights.values()) == pytest.approx(1.0, abs=1e-3)
+
+
+def test_open_ended_range_above_highest_bound(index):
+    assert index.weights(parse_price_range("8000元以上")) == {"6000元以上": 1.0}
+
+
+def test_finite_range_overlapping_open_band(index):
+    # 5950-8050元：无上限档位按实际重叠长度计算，不再按人为的上限截断
+    assert index.weights(parse_price_range("7000元左右")) == {"6000元以上": 0.9762, "5000-6000元": 0.0238}
+
+
+def test_below_minimum_range(index):
+    assert index.weights(parse_price_range("500元以内")) == {"1000元以下": 1.0}
+    assert PriceIndex(["2000-3000元", "3000-4000元"]).weights(parse_price_range("1000元以内")) == {}
+
+
+def test_single_point_range(index):
+    assert index.weights(parse_price_range("2500-2500元")) == {"2000-3000元": 1.0}
+    # 边界价格归入以它为下限的档位
+    assert index.weights(parse_price_range("3000-3000元")) == {"3000-4000元": 1.0}
+    assert index.weights((9000.0, 9000.0)) == {"6000元以上": 1.0}
+
+
+def test_finite_range_weights_are_overlap_ratio(index):
+    assert index.weights(parse_price_range("2000-4000元")) == {"2000-3000元": 0.5, "3000-4000元": 0.5}
+    assert index.weights(parse_price_range("2000-3000元")) == {"2000-3000元": 1.0}
@@ -0,0 +1,78 @@
+"""
+Cypher查询PROFILE回归检查：门禁逻辑离线测试；连接Neo4j时在专用分区（导入data.txt）上与提交的基线对比
+"""
+
+import pytest
+
+from profile_queries import (BASELINE_FILE, PROFILE_CATEGORY, check_regressions, load_baseline, profile_all,
+                             seed_profile_partition)
+
+
+def _profile(db_hits=100, payload_bytes=1000, full_scans=()):
+    return {"db_hits": db_hits, "rows": 10, "operators": [], "full_scans": list(full_scans),
+            "fetch_ms": 1.0, "payload_bytes": payload_bytes}
+
+
+def test_gate_accepts_profile_within_baseline():
+    assert check_regressions({"q": _profile(150)}, {"q": _profile(100)}, 2.0) == []
+
+
+def test_gate_rejects_full_scans():
+    problems = check_regressions({"q": _profile(full_scans=["NodeByLabelScan"])}, {"q": _profile()}, 2.0)
+    assert len(problems) == 1 and "NodeByLabelScan" in problems[0]
+    problems = check_regressions({"q": _profile(full_scans=["AllNodesScan"])}, {"q": _profile()}, 2.0)
+    assert "AllNodesScan" in problems[0]
+
+
+def test_gate_rejects_db_hits_and_payload_growth():
+    problems = check_regressions({"q": _profile(db_hits=201, payload_bytes=2001)}, {"q": _profile()}, 2.0)
+    assert len(problems) == 2
+
+
+def test_gate_rejects_missing_baseline_entry():
+    assert check_regressions({"q": _profile()}, {}, 2.0)
+
+
+class _RecordingSession:
+    """记录查询参数的假会话，所有查询都返回空结果"""
+
+    def __init__(self):
+        self.params = []
+
+    def run(self, text, params):
+        self.params.append(params)
+        return self
+
+    def __iter__(self):
+        return iter([])
+
+    def consume(self):
+        return type("Summary", (), {"profile": {}})()
+
+    def values(self):
+        return []
+
+
+def test_profiles_run_against_dedicated_partition():
+    session = _RecordingSession()
+    profile_all(session)
+    categories = {params["category"] for params in session.params if "category" in params}
+    assert categories == {PROFILE_CATEGORY}
+
+
+def test_queries_match_baseline(neo4j_importer):
+    """
+    重新导入PROFILE专用分区，所有登记的查询不得出现全表扫描，db hits和数据量不得超过基线2倍；
+    只清空和导入专用分区，服务使用的 `手机` 分区不受影响
+    """
+    baseline = load_baseline()
+    if not baseline:
+        pytest.fail(f"缺少基线 {BASELINE_FILE}，请运行 python profile_queries.py --update-baseline 并提交")
+
+    try:
+        assert seed_profile_partition(neo4j_importer)
+        with neo4j_importer._session() as session:
+            problems = check_regressions(profile_all(session), baseline, 2.0)
+    finally:
+        neo4j_importer.clear_category(PROFILE_CATEGORY)
+    assert problems == []